@@ -1,5 +1,46 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import os
+import threading
+from contextlib import contextmanager
+
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+
+### Connection Pool
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    conninfo=(
+                        f"postgresql://{os.getenv('TOOLS_DB_USER', 'langraph_user')}:{os.getenv('TOOLS_DB_PASSWORD', 'langraph_password')}"
+                        f"@{os.getenv('TOOLS_DB_HOST', 'localhost')}:{os.getenv('TOOLS_DB_PORT', '5433')}/{os.getenv('TOOLS_DB_NAME', 'tools_database')}"
+                    ),
+                    min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "5")),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "5")),
+                    max_idle=float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300")),
+                    check=ConnectionPool.check_connection,
+                    kwargs={"row_factory": dict_row},
+                    name="tools_database",
+                    open=True,
+                )
+    return _pool
+
+
+@contextmanager
+def _get_connection():
+    """Borrow a pooled connection for one transaction, committed on exit and rolled back on error."""
+
+    with _get_pool().connection() as conn:
+        yield conn
 
 
 ### Warehouse Manager Agent Tools
@@ -21,16 +62,8 @@ def check_warehouse_availability(items: list[dict]) -> dict:
         - details: detailed breakdown per warehouse with availability for each item
     """
     
-    conn = psycopg2.connect(
-        host="localhost",
-        port=5433,
-        database="tools_database",
-        user="langraph_user",
-        password="langraph_password"
-    )
-    
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+    with _get_connection() as conn:
+        with conn.cursor() as cursor:
             result = {
                 "can_fulfill_completely": False,
                 "warehouses_full_fulfillment": [],
@@ -138,9 +171,6 @@ def check_warehouse_availability(items: list[dict]) -> dict:
             result["can_fulfill_completely"] = len(result["warehouses_full_fulfillment"]) > 0 and len(result["unavailable_items"]) == 0
             
             return result
-            
-    finally:
-        conn.close()
 
 
 def reserve_warehouse_items(reservations: list[dict]) -> dict:
@@ -160,17 +190,9 @@ def reserve_warehouse_items(reservations: list[dict]) -> dict:
         - failed_items: list of items that could not be reserved
     """
     
-    conn = psycopg2.connect(
-        host="localhost",
-        port=5433,
-        database="tools_database",
-        user="langraph_user",
-        password="langraph_password"
-    )
-    conn.autocommit = False  # Use transaction
-    
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+    # The pooled connection runs everything below in one transaction
+    with _get_connection() as conn:
+        with conn.cursor() as cursor:
             result = {
                 "success": False,
                 "reserved_items": [],
@@ -226,10 +248,4 @@ def reserve_warehouse_items(reservations: list[dict]) -> dict:
                 conn.rollback()
                 result["success"] = False
             
-            return result
-            
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
\ No newline at end of file
+            return result
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""Import-time budget and cold start of the API, MCP and A2A services.
+
+Imports each service's entry module in a fresh interpreter under
+`python -X importtime`, several times, and reports the best run: the wall
+time from process start to the module being imported, the cumulative
+import time of the module and the third-party packages that cost the most.
+With --check, exits non-zero when a service goes over its budget, so CI
+can catch an eager heavy import before it reaches the replicas.
+
+    make run-benchmark-import-time
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+# service: (import path, entry module, import budget in seconds or None)
+SERVICES = {
+    "api": ("apps/api/src", "api.app", 3.0),
+    "items_mcp_server": ("apps/items_mcp_server/src", "items_mcp_server.main", 3.0),
+    "reviews_mcp_server": ("apps/reviews_mcp_server/src", "reviews_mcp_server.main", 3.0),
+    "a2a_warehouse_management_agent": ("apps/a2a_warehouse_management_agent/warehouse_management_agent", "app", None),
+    "adk_warehouse_management_agent": ("apps/adk_warehouse_management_agent", "warehouse_management_agent.agent", None),
+}
+
+
+#### Parsing
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """(depth, cumulative us, module) rows of `-X importtime` output, in the order Python printed them."""
+
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, int(cumulative_us), name.strip()))
+    return rows
+
+
+def package_costs(rows: list[tuple[int, int, str]]) -> Counter:
+    """Cumulative import time per top-level package, counted where another package first imports it."""
+
+    # Children are printed before their parent, so walk backwards keeping the open parents per depth
+    parents = {}
+    costs = Counter()
+    for depth, cumulative_us, name in reversed(rows):
+        parent = parents.get(depth - 1)
+        package = name.split(".")[0]
+        if parent is None or parent.split(".")[0] != package:
+            costs[package] += cumulative_us
+        parents[depth] = name
+        for deeper in [d for d in parents if d > depth]:
+            del parents[deeper]
+    return costs
+
+
+#### Measurement
+
+def measure(path: str, module: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT / path), os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT / path,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}"}
+
+    rows = parse_importtime(result.stderr)
+    module_us = next((cumulative_us for depth, cumulative_us, name in rows if depth == 0 and name == module), 0)
+    return {"wall": wall, "import": module_us / 1e6, "packages": package_costs(rows)}
+
+
+def run(services: list[str], runs: int, top: int, check: bool) -> int:
+    over_budget = []
+
+    for service in services:
+        path, module, budget = SERVICES[service]
+        results = [measure(path, module) for _ in range(runs)]
+        failed = [result for result in results if "error" in result]
+        if failed:
+            print(f"{service:<32} import failed: {failed[0]['error']}")
+            over_budget.append(service)
+            continue
+
+        best = min(results, key=lambda result: result["import"])
+        verdict = ""
+        if budget is not None:
+            verdict = "ok" if best["import"] <= budget else "OVER BUDGET"
+            if best["import"] > budget:
+                over_budget.append(service)
+
+        print(
+            f"{service:<32} cold start {min(result['wall'] for result in results):6.2f}s"
+            f"   import {best['import']:6.2f}s"
+            f"   budget {f'{budget:.1f}s' if budget is not None else '-':>6}  {verdict}"
+        )
+        internal = module.split(".")[0]
+        heaviest = [(package, us) for package, us in best["packages"].most_common() if package != internal][:top]
+        print("    " + ", ".join(f"{package} {us / 1e6:.2f}s" for package, us in heaviest))
+
+    if check and over_budget:
+        print(f"Over budget or not importable: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and cold start of each service.")
+    parser.add_argument("--services", nargs="+", choices=list(SERVICES), default=list(SERVICES), help="Services to measure")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per service, the best run is reported")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest third-party packages to list per service")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when a service exceeds its import budget")
+    args = parser.parse_args()
+
+    sys.exit(run(args.services, args.runs, args.top, args.check))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Per-query latency of the tool queries, unprepared vs server-side prepared.
+
+Seeds a small BENCH- inventory and cart, then runs every statement from
+api.agents.queries `--iterations` times on one connection that never
+prepares (plain text queries, parsed and planned on every call) and on one
+that prepares them, as the tools pool does. Each execution commits
+like a tool call does (psycopg drops its prepared statements on ROLLBACK),
+and writes are undone outside the timed section so both runs see the same
+data.
+
+    make run-benchmark-prepared-statements
+"""
+import argparse
+import random
+import statistics
+import time
+
+import psycopg
+from psycopg.rows import dict_row
+
+from api.agents.queries import (
+    CART_SELECT_QUERY, CART_UPSERT_QUERY, CART_DELETE_QUERY,
+    INVENTORY_AVAILABILITY_QUERY, INVENTORY_LOCK_QUERY, INVENTORY_RESERVE_QUERY
+)
+from api.core.config import config
+
+
+BENCH_PREFIX = "BENCH-"
+BENCH_USER = f"{BENCH_PREFIX}user"
+
+
+#### Synthetic Data
+
+def seed(conn, warehouses: int, skus: int, cart_items: int, seed: int) -> None:
+    rng = random.Random(seed)
+
+    with conn.transaction(), conn.cursor() as cursor:
+        cursor.execute("DELETE FROM warehouses.inventory WHERE warehouse_id LIKE %s", (f"{BENCH_PREFIX}%",))
+        cursor.execute("DELETE FROM shopping_carts.shopping_cart_items WHERE user_id = %s", (BENCH_USER,))
+        with cursor.copy(
+            "COPY warehouses.inventory (warehouse_id, product_id, total_quantity, reserved_quantity, warehouse_name, warehouse_location) FROM STDIN"
+        ) as copy:
+            for w in range(warehouses):
+                for s in range(skus):
+                    copy.write_row((
+                        f"{BENCH_PREFIX}WH-{w:03d}", f"{BENCH_PREFIX}SKU-{s:05d}",
+                        rng.randint(100, 500), 0, f"Bench warehouse {w}", f"Bench city {w % 17}"
+                    ))
+        with cursor.copy(
+            "COPY shopping_carts.shopping_cart_items (user_id, shopping_cart_id, product_id, price, quantity, currency) FROM STDIN"
+        ) as copy:
+            for s in range(cart_items):
+                copy.write_row((BENCH_USER, BENCH_USER, f"{BENCH_PREFIX}SKU-{s:05d}", rng.randint(100, 9999) / 100, rng.randint(1, 5), "USD"))
+    conn.execute("ANALYZE warehouses.inventory")
+    conn.execute("ANALYZE shopping_carts.shopping_cart_items")
+
+
+def delete_data(conn) -> None:
+    with conn.transaction():
+        conn.execute("DELETE FROM warehouses.inventory WHERE warehouse_id LIKE %s", (f"{BENCH_PREFIX}%",))
+        conn.execute("DELETE FROM shopping_carts.shopping_cart_items WHERE user_id = %s", (BENCH_USER,))
+
+
+#### Benchmark
+
+def _workload(warehouses: int, skus: int, items: int, seed: int) -> dict:
+    """Per statement: the query, the parameters of a typical tool call, and an untimed statement restoring the data."""
+
+    rng = random.Random(seed)
+    product_ids = [f"{BENCH_PREFIX}SKU-{s:05d}" for s in rng.sample(range(skus), items)]
+    keys = sorted({(f"{BENCH_PREFIX}WH-{rng.randrange(warehouses):03d}", product_id) for product_id in product_ids})
+
+    warehouse_ids, key_product_ids = [key[0] for key in keys], [key[1] for key in keys]
+    cart_row = (BENCH_USER, BENCH_USER, product_ids[0], 9.99, 1, "USD")
+
+    return {
+        "cart_select": (CART_SELECT_QUERY, (BENCH_USER, BENCH_USER), None),
+        "cart_item_upsert": (
+            CART_UPSERT_QUERY,
+            (BENCH_USER, BENCH_USER, "USD", product_ids, [9.99] * len(product_ids), [1] * len(product_ids), [None] * len(product_ids)),
+            ("DELETE FROM shopping_carts.shopping_cart_items WHERE user_id = %s AND product_id = ANY(%s)", (BENCH_USER, product_ids))
+        ),
+        "cart_item_delete": (
+            CART_DELETE_QUERY,
+            (BENCH_USER, BENCH_USER, product_ids[0]),
+            ("INSERT INTO shopping_carts.shopping_cart_items (user_id, shopping_cart_id, product_id, price, quantity, currency) VALUES (%s, %s, %s, %s, %s, %s)", cart_row)
+        ),
+        "inventory_availability_matrix": (INVENTORY_AVAILABILITY_QUERY, (product_ids,), None),
+        "inventory_lock": (INVENTORY_LOCK_QUERY, (warehouse_ids, key_product_ids), None),
+        "inventory_reserve": (
+            INVENTORY_RESERVE_QUERY,
+            (warehouse_ids, key_product_ids, [1] * len(keys)),
+            (INVENTORY_RESERVE_QUERY, (warehouse_ids, key_product_ids, [-1] * len(keys)))
+        ),
+    }
+
+
+def _time(conn, query: str, params: tuple, restore: tuple, iterations: int) -> list[float]:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            if cursor.description:
+                cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+        conn.commit()
+
+        if restore:
+            conn.execute(*restore)
+            conn.commit()
+    return timings
+
+
+def _summary(timings: list[float]) -> tuple[float, float]:
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings) * 1000, p95 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tool queries with and without server-side prepared statements.")
+    parser.add_argument("--warehouses", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=2_000)
+    parser.add_argument("--cart-items", type=int, default=20)
+    parser.add_argument("--items", type=int, default=5, help="Items per cart/inventory request")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep-data", action="store_true", help="Leave the synthetic rows in place")
+    args = parser.parse_args()
+
+    workload = _workload(args.warehouses, args.skus, args.items, args.seed)
+
+    with psycopg.connect(config.tools_db_conn_string, autocommit=True) as admin:
+        start = time.perf_counter()
+        seed(admin, args.warehouses, args.skus, args.cart_items, args.seed)
+        print(f"Seeded {args.warehouses * args.skus} inventory rows and {args.cart_items} cart items in {time.perf_counter() - start:.1f}s")
+
+        try:
+            results = {}
+            for mode, prepare_threshold in (("unprepared", None), ("prepared", config.DB_PREPARE_THRESHOLD)):
+                with psycopg.connect(config.tools_db_conn_string, row_factory=dict_row, prepare_threshold=prepare_threshold) as conn:
+                    for name, (query, params, restore) in workload.items():
+                        _time(conn, query, params, restore, 10)
+                        results[name, mode] = _summary(_time(conn, query, params, restore, args.iterations))
+
+            print(f"{'query':<32}{'unprepared median/p95 ms':>28}{'prepared median/p95 ms':>28}{'speedup':>10}")
+            for name in workload:
+                unprepared, prepared = results[name, "unprepared"], results[name, "prepared"]
+                print(
+                    f"{name:<32}{unprepared[0]:>17.3f} / {unprepared[1]:<8.3f}{prepared[0]:>17.3f} / {prepared[1]:<8.3f}"
+                    f"{unprepared[0] / prepared[0]:>9.2f}x"
+                )
+        finally:
+            if not args.keep_data:
+                delete_data(admin)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Per-request overhead of the request-ID middleware.
+
+Calls a minimal FastAPI app straight through ASGI (no sockets, no server)
+with no middleware, with the previous BaseHTTPMiddleware implementation and
+with the pure ASGI RequestIDMiddleware, for a JSON endpoint and for a
+streaming endpoint shaped like the /agent SSE response. Request logging is
+silenced so only the middleware itself is measured.
+
+    make run-benchmark-request-middleware
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from api.api.middleware import RequestIDMiddleware
+
+
+#### Previous Implementation
+
+class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware version RequestIDMiddleware replaced."""
+
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+#### Apps
+
+def build_app(middleware, chunks: int) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+
+    @app.get("/json")
+    async def json_endpoint(request: Request):
+        return {"status": "ok"}
+
+    @app.get("/stream")
+    def stream_endpoint():
+        return StreamingResponse((f"data: chunk {n}\n\n" for n in range(chunks)), media_type="text/event-stream")
+
+    return app
+
+
+async def _call(app, path: str) -> int:
+    """Run one GET request through the ASGI app, returns the number of response messages."""
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    request_sent = False
+    messages = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal messages
+        messages += 1
+
+    await app(scope, receive, send)
+    return messages
+
+
+async def _time(app, path: str, requests: int) -> list[float]:
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await _call(app, path)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def run(requests: int, chunks: int, rounds: int) -> None:
+    apps = {
+        "none": build_app(None, chunks),
+        "base_http": build_app(LegacyRequestIDMiddleware, chunks),
+        "pure_asgi": build_app(RequestIDMiddleware, chunks),
+    }
+
+    for path in ("/json", "/stream"):
+        for app in apps.values():
+            await _time(app, path, 50)
+
+        # Interleave the variants so drift on the machine hits all of them alike
+        timings = {name: [] for name in apps}
+        for _ in range(rounds):
+            for name, app in apps.items():
+                timings[name].extend(await _time(app, path, requests // rounds))
+
+        medians = {}
+        for name in apps:
+            samples = sorted(timings[name])
+            medians[name] = statistics.median(samples)
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            print(f"{path:<8} {name:<10} median {medians[name] * 1e6:8.1f} us   p95 {p95 * 1e6:8.1f} us")
+        for name in ("base_http", "pure_asgi"):
+            print(f"{path:<8} {name:<10} overhead {(medians[name] - medians['none']) * 1e6:8.1f} us per request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-request overhead of the request-ID middleware.")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks sent by the streaming endpoint")
+    parser.add_argument("--rounds", type=int, default=20, help="Interleaved rounds the requests are split into")
+    args = parser.parse_args()
+
+    logging.getLogger("api.api.middleware").setLevel(logging.WARNING)
+    asyncio.run(run(args.requests, args.chunks, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Per-request overhead of LangSmith tracing, with and without sampling.
+
+Runs a synthetic /agent turn built from @traceable functions with the
+names, run types and payload sizes of the real ones (coordinator, product
+QA agent, retrieval, embedding, context formatting) but no work of their
+own, so what is measured is tracing. Traces are sent to a local sink
+standing in for LangSmith, nothing leaves the machine. Variants:
+
+- off: tracing disabled.
+- langsmith: the stock client, every run exported.
+- sampled-N: SamplingClient keeping N of the traces.
+- no-prompts: SamplingClient keeping every trace but not its prompt runs.
+
+Reported per variant: wall time of a turn in the request thread, CPU time
+per turn with the export threads and the final flush included, and the
+bytes that reached the sink.
+
+    make run-benchmark-tracing-overhead
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from langsmith import Client, traceable, tracing_context
+
+from api.core.tracing import SamplingClient, SamplingPolicy
+
+
+#### LangSmith Sink
+
+class Sink(BaseHTTPRequestHandler):
+    received = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        # A single export thread per client. LangSmith's extra threads make the
+        # main one think the client was let go of once the turns stop, and a
+        # client reused across rounds would then never be flushed.
+        self._reply({"batch_ingest_config": {
+            "use_multipart_endpoint": True,
+            "size_limit": 100,
+            "size_limit_bytes": None,
+            "scale_up_nthreads_limit": 0,
+            "scale_up_qsize_trigger": 200,
+            "scale_down_nempty_trigger": 4,
+        }})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("content-length", 0)))
+        with Sink.lock:
+            Sink.received += len(body)
+        self._reply({})
+
+    def do_PATCH(self):
+        self.do_POST()
+
+    def _reply(self, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_sink() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Sink)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+#### Synthetic Turn
+
+ITEMS = [
+    {"id": f"B0{i:08d}", "description": "Wireless over-ear headphones with active noise cancelling " * 6, "average_rating": 4.4, "price": 59.99}
+    for i in range(5)
+]
+
+
+@traceable(name="embed query", run_type="embedding")
+def get_embedding(text):
+    return [0.01] * 1536
+
+
+@traceable(name="retrieve_items_data", run_type="retriever")
+def retrieve_items_data(query, k=5):
+    get_embedding(query)
+    return ITEMS[:k]
+
+
+@traceable(name="format_retrieve_items_context", run_type="prompt")
+def process_items_context(context):
+    return "\n".join(f"- ID: {item['id']}, rating: {item['average_rating']}, description: {item['description']}" for item in context)
+
+
+@traceable(name="get_formatted_items_context", run_type="tool")
+def get_formatted_items_context(query, top_k=5):
+    return process_items_context(retrieve_items_data(query, top_k))
+
+
+@traceable(name="product_qa_agent", run_type="llm")
+def product_qa_agent(messages):
+    return {"answer": "These headphones are a good fit. " * 10, "final_answer": True}
+
+
+@traceable(name="coordinator_agent", run_type="llm")
+def coordinator_agent(messages):
+    return {"next_agent": "product_qa_agent", "plan": [{"agent": "product_qa_agent", "task": messages[-1]["content"]}]}
+
+
+@traceable(name="LangGraph", run_type="chain")
+def agent_turn(query):
+    messages = [{"role": "system", "content": "You are a shopping assistant. " * 40}, {"role": "user", "content": query}]
+    coordinator_agent(messages)
+    context = get_formatted_items_context(query)
+    messages.append({"role": "tool", "content": context})
+    answer = product_qa_agent(messages)
+    coordinator_agent(messages + [{"role": "assistant", "content": answer["answer"]}])
+    return answer
+
+
+#### Measurement
+
+def variants(sink_url: str) -> dict:
+    def stock():
+        return Client(api_url=sink_url, api_key="bench")
+
+    def sampled(rate: float, run_type_rates: dict = None):
+        return lambda: SamplingClient(SamplingPolicy(default_rate=rate, run_type_rates=run_type_rates, slow_seconds=20.0), api_url=sink_url, api_key="bench")
+
+    return {
+        "off": None,
+        "langsmith": stock,
+        "sampled-1.0": sampled(1.0),
+        "sampled-0.1": sampled(0.1),
+        "sampled-0.0": sampled(0.0),
+        "no-prompts": sampled(1.0, {"prompt": 0.0}),
+    }
+
+
+def measure(client, requests: int, result: dict) -> None:
+    """Run `requests` turns through `client` and add their timings, CPU time and bytes sent to `result`."""
+
+    received = Sink.received
+    cpu_start = time.process_time()
+    with tracing_context(enabled=client is not None, client=client, metadata={"route": "/agent/"}):
+        for i in range(requests):
+            start = time.perf_counter()
+            agent_turn(f"Which headphones under 100 dollars? ({i})")
+            result["timings"].append(time.perf_counter() - start)
+    if client is not None:
+        client.flush()
+    result["cpu"] += time.process_time() - cpu_start
+    result["bytes"] += Sink.received - received
+
+
+def run(requests: int, rounds: int) -> None:
+    sink_url = start_sink()
+    clients = {name: make_client() if make_client else None for name, make_client in variants(sink_url).items()}
+    results = {name: {"timings": [], "cpu": 0.0, "bytes": 0} for name in clients}
+
+    # One untimed pass, so imports and connections are not counted
+    for client in clients.values():
+        measure(client, 20, {"timings": [], "cpu": 0.0, "bytes": 0})
+
+    # Interleave the variants so drift on the machine hits all of them alike
+    for _ in range(rounds):
+        for name, client in clients.items():
+            measure(client, requests // rounds, results[name])
+
+    for name, result in results.items():
+        timings = sorted(result["timings"])
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(
+            f"{name:<12} median {statistics.median(timings) * 1e6:8.1f} us   p95 {p95 * 1e6:8.1f} us"
+            f"   cpu {result['cpu'] / len(timings) * 1e6:8.1f} us   sent {result['bytes'] / len(timings) / 1024:6.1f} KiB per turn"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-request overhead of LangSmith tracing.")
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--rounds", type=int, default=10, help="Interleaved rounds the requests are split into")
+    args = parser.parse_args()
+
+    # The sink has no compressed ingestion, LangSmith warns about it per client
+    logging.getLogger("langsmith.client").setLevel(logging.ERROR)
+    run(args.requests, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Benchmark check_warehouse_availability against a synthetic inventory.
+
+Seeds `--warehouses` x `--skus` rows into warehouses.inventory under a BENCH-
+prefix, times the set-based tool against the previous per-warehouse,
+per-item implementation, checks both return the same result, and removes
+the synthetic rows again (unless --keep-data).
+
+    make run-benchmark-warehouse-availability
+"""
+import argparse
+import random
+import statistics
+import time
+
+from api.agents.tools import check_warehouse_availability
+from api.core.db import get_connection, close_pool
+
+
+BENCH_PREFIX = "BENCH-"
+
+
+#### Synthetic Inventory
+
+def seed_inventory(warehouses: int, skus: int, seed: int) -> None:
+    rng = random.Random(seed)
+
+    with get_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM warehouses.inventory WHERE warehouse_id LIKE %s", (f"{BENCH_PREFIX}%",))
+        with cursor.copy(
+            "COPY warehouses.inventory (warehouse_id, product_id, total_quantity, reserved_quantity, warehouse_name, warehouse_location) FROM STDIN"
+        ) as copy:
+            for w in range(warehouses):
+                for s in range(skus):
+                    total = rng.choice((0, 0, rng.randint(1, 50), rng.randint(1, 500)))
+                    reserved = rng.randint(0, total) if total else 0
+                    copy.write_row((
+                        f"{BENCH_PREFIX}WH-{w:03d}", f"{BENCH_PREFIX}SKU-{s:05d}",
+                        total, reserved, f"Bench warehouse {w}", f"Bench city {w % 17}"
+                    ))
+        cursor.execute("ANALYZE warehouses.inventory")
+
+
+def delete_inventory() -> None:
+    with get_connection() as conn:
+        conn.execute("DELETE FROM warehouses.inventory WHERE warehouse_id LIKE %s", (f"{BENCH_PREFIX}%",))
+
+
+#### Previous Implementation
+
+def legacy_check_warehouse_availability(items: list[dict]) -> tuple[dict, int]:
+    """The per-warehouse, per-item version the tool replaced, returns (result, queries run)."""
+
+    queries = 0
+    with get_connection() as conn, conn.cursor() as cursor:
+        result = {
+            "can_fulfill_completely": False,
+            "warehouses_full_fulfillment": [],
+            "warehouses_partial_fulfillment": [],
+            "unavailable_items": [],
+            "details": []
+        }
+
+        cursor.execute("SELECT DISTINCT warehouse_id, warehouse_name, warehouse_location FROM warehouses.inventory")
+        warehouses = cursor.fetchall()
+        queries += 1
+
+        for warehouse in warehouses:
+            warehouse_can_fulfill_all = True
+            has_any_availability = False
+            warehouse_details = {
+                "warehouse_id": warehouse['warehouse_id'],
+                "warehouse_name": warehouse['warehouse_name'],
+                "warehouse_location": warehouse['warehouse_location'],
+                "items": [],
+                "can_fulfill_all": False,
+                "has_partial": False
+            }
+
+            for item in items:
+                cursor.execute(
+                    """
+                    SELECT product_id, total_quantity, reserved_quantity, available_quantity
+                    FROM warehouses.inventory
+                    WHERE warehouse_id = %s AND product_id = %s
+                    """,
+                    (warehouse['warehouse_id'], item['product_id'])
+                )
+                inventory = cursor.fetchone()
+                queries += 1
+
+                available_qty = inventory['available_quantity'] if inventory else 0
+                warehouse_details["items"].append({
+                    "product_id": item['product_id'],
+                    "requested": item['quantity'],
+                    "available": available_qty,
+                    "can_fulfill_completely": available_qty >= item['quantity'],
+                    "can_fulfill_partially": available_qty > 0 and available_qty < item['quantity']
+                })
+                if available_qty < item['quantity']:
+                    warehouse_can_fulfill_all = False
+                if available_qty > 0:
+                    has_any_availability = True
+
+            summary = {
+                "warehouse_id": warehouse['warehouse_id'],
+                "warehouse_name": warehouse['warehouse_name'],
+                "warehouse_location": warehouse['warehouse_location']
+            }
+            if warehouse_can_fulfill_all:
+                warehouse_details["can_fulfill_all"] = True
+                result["warehouses_full_fulfillment"].append(summary)
+            elif has_any_availability:
+                warehouse_details["has_partial"] = True
+                result["warehouses_partial_fulfillment"].append(summary)
+
+            result["details"].append(warehouse_details)
+
+        for item in items:
+            cursor.execute(
+                """
+                SELECT product_id, SUM(available_quantity) as total_available
+                FROM warehouses.inventory
+                WHERE product_id = %s
+                GROUP BY product_id
+                """,
+                (item['product_id'],)
+            )
+            total_available = cursor.fetchone()
+            queries += 1
+
+            total_available_qty = total_available['total_available'] if total_available else 0
+            if total_available_qty < item['quantity']:
+                result["unavailable_items"].append({
+                    "product_id": item['product_id'],
+                    "requested": item['quantity'],
+                    "total_available_across_warehouses": total_available_qty,
+                    "shortage": item['quantity'] - total_available_qty
+                })
+
+        result["can_fulfill_completely"] = len(result["warehouses_full_fulfillment"]) > 0 and len(result["unavailable_items"]) == 0
+
+    return result, queries
+
+
+#### Benchmark
+
+def _normalized(result: dict) -> dict:
+    """The old warehouse query had no ORDER BY, compare results independent of warehouse order."""
+
+    by_warehouse = lambda entry: entry["warehouse_id"]
+    return {
+        **result,
+        "warehouses_full_fulfillment": sorted(result["warehouses_full_fulfillment"], key=by_warehouse),
+        "warehouses_partial_fulfillment": sorted(result["warehouses_partial_fulfillment"], key=by_warehouse),
+        "details": sorted(result["details"], key=by_warehouse),
+    }
+
+
+def _time(fn, items, iterations: int) -> list[float]:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(items)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{name:<12} median {statistics.median(timings) * 1000:9.1f} ms   p95 {p95 * 1000:9.1f} ms   min {timings[0] * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark check_warehouse_availability on a synthetic inventory.")
+    parser.add_argument("--warehouses", type=int, default=100)
+    parser.add_argument("--skus", type=int, default=10_000)
+    parser.add_argument("--items", type=int, default=10, help="Items per availability request")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--legacy-iterations", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse rows left by a previous --keep-data run")
+    parser.add_argument("--keep-data", action="store_true", help="Leave the synthetic rows in place")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        start = time.perf_counter()
+        seed_inventory(args.warehouses, args.skus, args.seed)
+        print(f"Seeded {args.warehouses * args.skus} inventory rows in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(args.seed)
+    items = [
+        {"product_id": f"{BENCH_PREFIX}SKU-{s:05d}", "quantity": rng.randint(1, 20)}
+        for s in rng.sample(range(args.skus), args.items)
+    ]
+
+    try:
+        expected, legacy_queries = legacy_check_warehouse_availability(items)
+        actual = check_warehouse_availability(items)
+        assert _normalized(actual) == _normalized(expected), "set-based result differs from the previous implementation"
+        print(f"Results match, {len(actual['details'])} warehouses x {len(items)} items")
+        print(f"Round trips: previous {legacy_queries}, set-based 1")
+
+        _report("previous", _time(legacy_check_warehouse_availability, items, args.legacy_iterations))
+        _report("set-based", _time(check_warehouse_availability, items, args.iterations))
+    finally:
+        if not args.keep_data:
+            delete_inventory()
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
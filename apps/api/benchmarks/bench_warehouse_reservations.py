@@ -0,0 +1,182 @@
+"""Contention benchmark for reserve_warehouse_items.
+
+Many concurrent reservers each reserve a few lines, in random order, from a
+small set of hot (warehouse, SKU) rows seeded under a BENCH- prefix. The bulk
+tool is compared against the previous row-at-a-time implementation, which
+locks rows in the order the lines were given and can deadlock. After each run
+the reserved quantities are checked against the reservations that succeeded.
+
+    make run-benchmark-warehouse-reservations
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg import errors
+
+from api.agents.tools import reserve_warehouse_items
+from api.core.config import config
+from api.core.db import get_connection, close_pool
+
+
+BENCH_PREFIX = "BENCH-"
+
+
+#### Synthetic Inventory
+
+def seed_hot_inventory(warehouses: int, skus: int, stock: int) -> list[tuple[str, str]]:
+    keys = [
+        (f"{BENCH_PREFIX}WH-{w:03d}", f"{BENCH_PREFIX}HOT-{s:03d}")
+        for w in range(warehouses)
+        for s in range(skus)
+    ]
+    with get_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM warehouses.inventory WHERE warehouse_id LIKE %s", (f"{BENCH_PREFIX}%",))
+        cursor.executemany(
+            """
+            INSERT INTO warehouses.inventory (warehouse_id, product_id, total_quantity, reserved_quantity, warehouse_name, warehouse_location)
+            VALUES (%s, %s, %s, 0, %s, %s)
+            """,
+            [(warehouse_id, product_id, stock, f"Bench {warehouse_id}", "Bench city") for warehouse_id, product_id in keys]
+        )
+    return keys
+
+
+def reserved_quantities() -> dict:
+    with get_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT warehouse_id, product_id, reserved_quantity FROM warehouses.inventory WHERE warehouse_id LIKE %s",
+            (f"{BENCH_PREFIX}%",)
+        )
+        return {(row['warehouse_id'], row['product_id']): row['reserved_quantity'] for row in cursor.fetchall()}
+
+
+def delete_inventory() -> None:
+    with get_connection() as conn:
+        conn.execute("DELETE FROM warehouses.inventory WHERE warehouse_id LIKE %s", (f"{BENCH_PREFIX}%",))
+
+
+#### Previous Implementation
+
+def legacy_reserve_warehouse_items(reservations: list[dict]) -> dict:
+    """The row-at-a-time version the tool replaced: lock and update each line in the order given."""
+
+    with get_connection() as conn, conn.cursor() as cursor:
+        result = {"success": False, "reserved_items": [], "failed_items": []}
+
+        for reservation in reservations:
+            cursor.execute(
+                """
+                SELECT warehouse_name, warehouse_location, available_quantity
+                FROM warehouses.inventory
+                WHERE warehouse_id = %s AND product_id = %s
+                FOR UPDATE
+                """,
+                (reservation['warehouse_id'], reservation['product_id'])
+            )
+            inventory = cursor.fetchone()
+
+            if inventory and inventory['available_quantity'] >= reservation['quantity']:
+                cursor.execute(
+                    """
+                    UPDATE warehouses.inventory
+                    SET reserved_quantity = reserved_quantity + %s
+                    WHERE warehouse_id = %s AND product_id = %s
+                    """,
+                    (reservation['quantity'], reservation['warehouse_id'], reservation['product_id'])
+                )
+                result["reserved_items"].append(reservation)
+            else:
+                result["failed_items"].append(reservation)
+
+        if len(result["failed_items"]) == 0:
+            conn.commit()
+            result["success"] = True
+        else:
+            conn.rollback()
+
+    return result
+
+
+#### Benchmark
+
+def run(name: str, reserve, keys: list, args) -> None:
+    rng = random.Random(args.seed)
+    requests = [
+        [
+            {"warehouse_id": warehouse_id, "product_id": product_id, "quantity": rng.randint(1, 3)}
+            for warehouse_id, product_id in rng.sample(keys, args.lines)
+        ]
+        for _ in range(args.requests)
+    ]
+
+    before = reserved_quantities()
+    latencies = []
+    expected = {}
+    counts = {"success": 0, "rejected": 0, "deadlock": 0}
+    lock = threading.Lock()
+
+    def reserve_one(reservations):
+        start = time.perf_counter()
+        try:
+            result = reserve(reservations)
+            outcome = "success" if result["success"] else "rejected"
+        except errors.DeadlockDetected:
+            result, outcome = None, "deadlock"
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            latencies.append(elapsed)
+            counts[outcome] += 1
+            if outcome == "success":
+                for reservation in reservations:
+                    key = (reservation['warehouse_id'], reservation['product_id'])
+                    expected[key] = expected.get(key, 0) + reservation['quantity']
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(reserve_one, requests))
+    wall = time.perf_counter() - start
+
+    after = reserved_quantities()
+    consistent = all(after[key] - before[key] == expected.get(key, 0) for key in after)
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:<10} {len(requests) / wall:8.1f} req/s   median {statistics.median(latencies) * 1000:7.1f} ms   "
+        f"p95 {p95 * 1000:7.1f} ms   success {counts['success']}   rejected {counts['rejected']}   "
+        f"deadlocks {counts['deadlock']}   consistent {consistent}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contention benchmark for reserve_warehouse_items.")
+    parser.add_argument("--warehouses", type=int, default=3)
+    parser.add_argument("--hot-skus", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=1_000_000, help="Units per hot row, large enough that lines do not run out")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent reservers")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--lines", type=int, default=4, help="Reservation lines per request")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # One pooled connection per reserver, so the pool is not the bottleneck
+    config.DB_POOL_MAX_SIZE = max(config.DB_POOL_MAX_SIZE, args.workers)
+
+    keys = seed_hot_inventory(args.warehouses, args.hot_skus, args.stock)
+    print(f"{args.workers} reservers, {args.requests} requests of {args.lines} lines over {len(keys)} hot rows")
+
+    try:
+        run("previous", legacy_reserve_warehouse_items, keys, args)
+        run("bulk", reserve_warehouse_items, keys, args)
+    finally:
+        delete_inventory()
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
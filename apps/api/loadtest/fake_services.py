@@ -0,0 +1,338 @@
+"""Local stand-ins for OpenAI, Groq and Qdrant, served from one process.
+
+- /v1/embeddings: deterministic embeddings (loadtest.fixtures.embed).
+- /v1/chat/completions: scripted structured completions for the agents'
+  instructor calls. The coordinator delegates to the product QA agent, or
+  to the shopping cart agent when the user asks to add an item to the
+  cart. The sub-agent calls its tool once, then answers from the tool
+  result, and the coordinator passes that answer on. Groq is the same
+  endpoint, through GROQ_API_BASE.
+- /collections/...: the Qdrant REST calls the API makes, answered by a
+  local-mode Qdrant loaded with the fixture collections. BM25 documents
+  are turned into the fixtures' sparse vectors.
+- /langsmith/info: enough of LangSmith for its client to start offline.
+
+Latencies are sampled per call from the configured distributions. The
+delay injected for each X-Request-ID is kept, so the load generator can
+separate the API's own overhead from the time spent "in" dependencies.
+The local Qdrant searches run in threads, off the event loop that serves
+the other stand-ins, and their time counts as injected too.
+
+    python -m loadtest.fake_services --port 18000 --llm-latency lognormal:0.8,0.3
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from qdrant_client import models
+
+from loadtest.fixtures import build_qdrant, embed, sparse_terms
+
+
+CART_REQUEST = re.compile(r"\badd\b.*\bcart\b", re.IGNORECASE)
+PRODUCT_ID = re.compile(r"\bLT\d{5}\b")
+CONTEXT_ID = re.compile(r"ID: (\w+),")
+
+# Injected delay per request ID, the oldest are dropped past this many
+MAX_TRACKED_REQUESTS = 100000
+
+
+#### Latency
+
+class Latency:
+    """Delay distribution given as "none", "fixed:S", "uniform:MIN,MAX" or "lognormal:MEDIAN,SIGMA", in seconds."""
+
+    def __init__(self, spec: str, seed: int = 0):
+        self.spec = spec
+        self.kind, _, params = spec.partition(":")
+        self.params = [float(param) for param in params.split(",") if param]
+        self.rng = random.Random(seed)
+
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "lognormal": 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise argparse.ArgumentTypeError(f"Invalid latency {spec!r}, expected none, fixed:S, uniform:MIN,MAX or lognormal:MEDIAN,SIGMA")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(*self.params)
+        if self.kind == "lognormal":
+            return self.rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        return 0.0
+
+
+class Services:
+    def __init__(self, llm: Latency, embedding: Latency, qdrant: Latency, items: int, reviews_per_item: int):
+        self.latency = {"llm": llm, "embedding": embedding, "qdrant": qdrant}
+        self.qdrant = build_qdrant(items, reviews_per_item)
+        self.injected = OrderedDict()
+        self.calls = {"llm": 0, "embedding": 0, "qdrant": 0}
+        # Local mode makes no promise about concurrent use
+        self._qdrant_lock = threading.Lock()
+
+    def _inject(self, request: Request, seconds: float) -> None:
+        request_id = request.headers.get("x-request-id")
+        if request_id:
+            self.injected[request_id] = self.injected.get(request_id, 0.0) + seconds
+            while len(self.injected) > MAX_TRACKED_REQUESTS:
+                self.injected.popitem(last=False)
+
+    async def delay(self, request: Request, service: str) -> None:
+        seconds = self.latency[service].sample()
+        self.calls[service] += 1
+        self._inject(request, seconds)
+
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def run_qdrant(self, request: Request, work):
+        """Result of `work`, a local Qdrant call and the dump of its points, run in a thread and counted as injected."""
+
+        def locked():
+            with self._qdrant_lock:
+                return work()
+
+        start = time.perf_counter()
+        result = await asyncio.to_thread(locked)
+        self._inject(request, time.perf_counter() - start)
+        return result
+
+
+#### Scripted Completions
+
+def _text(message: dict) -> str:
+    content = message.get("content") or ""
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+def _current_turn(messages: list[dict]) -> tuple[str, list[dict]]:
+    """The latest user message and the messages that followed it."""
+
+    last_user = max((i for i, message in enumerate(messages) if message["role"] == "user"), default=0)
+    return _text(messages[last_user]), messages[last_user + 1:]
+
+
+def script_response(response_model: str, messages: list[dict]) -> dict:
+    system = next((_text(message) for message in messages if message["role"] == "system"), "")
+    query, turn = _current_turn(messages)
+    tool_results = [_text(message) for message in turn if message["role"] == "tool"]
+
+    if response_model == "CoordinatorAgentResponse":
+        answers = [_text(message) for message in turn if message["role"] == "assistant" and message.get("content") and not message.get("tool_calls")]
+        if answers:
+            return {"next_agent": "", "plan": [], "final_answer": True, "answer": answers[-1]}
+        agent = "shopping_cart_agent" if CART_REQUEST.search(query) else "product_qa_agent"
+        return {"next_agent": agent, "plan": [{"agent": agent, "task": query}], "final_answer": False, "answer": ""}
+
+    if response_model == "ProductQAAgentResponse":
+        if not tool_results:
+            return {"answer": "", "references": [], "final_answer": False, "tool_calls": [
+                {"name": "get_formatted_items_context", "arguments": {"query": query, "top_k": 5}}
+            ]}
+        ids = CONTEXT_ID.findall(tool_results[-1])[:3]
+        return {
+            "answer": f"Here are a few options: {', '.join(ids) or 'none found'}.",
+            "references": [{"id": item_id, "description": f"Item {item_id}"} for item_id in ids],
+            "final_answer": True,
+            "tool_calls": [],
+        }
+
+    if response_model == "ShoppingCartAgentResponse" and not tool_results:
+        user_id = re.search(r"User ID: (\S+)", system)
+        cart_id = re.search(r"Cart ID: (\S+)", system)
+        return {"answer": "", "final_answer": False, "tool_calls": [{
+            "name": "add_to_shopping_cart",
+            "arguments": {
+                "items": [{"product_id": item_id, "quantity": 1} for item_id in PRODUCT_ID.findall(query)],
+                "user_id": user_id.group(1) if user_id else "loadtest",
+                "cart_id": cart_id.group(1) if cart_id else "loadtest",
+            },
+        }]}
+
+    return {"answer": "Done.", "final_answer": True, "tool_calls": []}
+
+
+def _token_estimate(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+#### App
+
+def create_app(services: Services) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> dict:
+        body = await request.json()
+        await services.delay(request, "llm")
+
+        # instructor's TOOLS mode forces a single function named after the response model
+        tools = body.get("tools") or []
+        response_model = tools[0]["function"]["name"] if tools else body.get("response_format", {}).get("json_schema", {}).get("name", "")
+        arguments = json.dumps(script_response(response_model, body.get("messages", [])))
+
+        if tools:
+            message = {"role": "assistant", "content": None, "tool_calls": [
+                {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": response_model, "arguments": arguments}}
+            ]}
+        else:
+            message = {"role": "assistant", "content": arguments}
+
+        prompt_tokens = _token_estimate(json.dumps(body.get("messages", [])))
+        completion_tokens = _token_estimate(arguments)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tools else "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": 0},
+            },
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request) -> dict:
+        body = await request.json()
+        await services.delay(request, "embedding")
+
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        vectors = [embed(str(text)) for text in inputs]
+        # The OpenAI SDK asks for base64 unless told otherwise
+        if body.get("encoding_format") == "base64":
+            data = [base64.b64encode(vector.astype(np.float32).tobytes()).decode() for vector in vectors]
+        else:
+            data = [vector.tolist() for vector in vectors]
+
+        tokens = sum(_token_estimate(str(text)) for text in inputs)
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": embedding} for i, embedding in enumerate(data)],
+            "model": body.get("model", ""),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.get("/")
+    async def qdrant_version() -> dict:
+        return {"title": "qdrant - vector search engine (load-test stand-in)", "version": "1.16.2"}
+
+    @app.post("/collections/{collection_name}/points/query")
+    async def query_points(collection_name: str, request: Request) -> dict:
+        start = time.perf_counter()
+        query = models.QueryRequest.model_validate(await request.json())
+        await services.delay(request, "qdrant")
+
+        def search() -> dict:
+            response = services.qdrant.query_points(
+                collection_name,
+                query=_local_query(query.query),
+                prefetch=[_local_prefetch(prefetch) for prefetch in _as_list(query.prefetch)] or None,
+                using=query.using,
+                query_filter=query.filter,
+                limit=query.limit or 10,
+                offset=query.offset,
+                with_payload=query.with_payload if query.with_payload is not None else False,
+                with_vectors=query.with_vector or False,
+                score_threshold=query.score_threshold,
+            )
+            return {"points": [_dump_point(point) for point in response.points]}
+
+        return _qdrant_result(await services.run_qdrant(request, search), start)
+
+    @app.post("/collections/{collection_name}/points/scroll")
+    async def scroll_points(collection_name: str, request: Request) -> dict:
+        start = time.perf_counter()
+        scroll = models.ScrollRequest.model_validate(await request.json())
+        await services.delay(request, "qdrant")
+
+        def page() -> dict:
+            points, next_offset = services.qdrant.scroll(
+                collection_name,
+                scroll_filter=scroll.filter,
+                limit=scroll.limit or 10,
+                offset=scroll.offset,
+                with_payload=scroll.with_payload if scroll.with_payload is not None else True,
+                with_vectors=scroll.with_vector or False,
+            )
+            return {"points": [_dump_point(point) for point in points], "next_page_offset": next_offset}
+
+        return _qdrant_result(await services.run_qdrant(request, page), start)
+
+    @app.get("/langsmith/info")
+    async def langsmith_info() -> dict:
+        # Tracing is off, but the feedback client still asks for the server info
+        return {}
+
+    @app.get("/loadtest/injected")
+    async def injected() -> dict:
+        return {"calls": services.calls, "injected_seconds": services.injected}
+
+    return app
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _local_query(query):
+    # The API leaves BM25 inference to the server, local mode would need fastembed for it
+    if isinstance(query, models.NearestQuery) and isinstance(query.nearest, models.Document):
+        return models.NearestQuery(nearest=sparse_terms(query.nearest.text))
+    if isinstance(query, models.Document):
+        return sparse_terms(query.text)
+    return query
+
+
+def _local_prefetch(prefetch: models.Prefetch) -> models.Prefetch:
+    return prefetch.model_copy(update={
+        "query": _local_query(prefetch.query),
+        "prefetch": [_local_prefetch(nested) for nested in _as_list(prefetch.prefetch)] or None,
+    })
+
+
+def _dump_point(point) -> dict:
+    data = point.model_dump(mode="json", exclude_none=True)
+    # A zero query vector (the API's payload lookups) scores NaN under cosine
+    if "score" in data and not math.isfinite(data["score"]):
+        data["score"] = 0.0
+    return data
+
+
+def _qdrant_result(result: dict, start: float) -> dict:
+    return {"result": result, "status": "ok", "time": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for OpenAI, Groq and Qdrant.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--llm-latency", type=Latency, default=Latency("lognormal:0.8,0.3"), help="Per chat completion")
+    parser.add_argument("--embedding-latency", type=Latency, default=Latency("lognormal:0.1,0.3"), help="Per embeddings call")
+    parser.add_argument("--qdrant-latency", type=Latency, default=Latency("none"), help="Per Qdrant call, on top of the local-mode search")
+    parser.add_argument("--items", type=int, default=200, help="Products in the fixture collection")
+    parser.add_argument("--reviews-per-item", type=int, default=3)
+    args = parser.parse_args()
+
+    services = Services(args.llm_latency, args.embedding_latency, args.qdrant_latency, args.items, args.reviews_per_item)
+    uvicorn.run(create_app(services), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Deterministic data the load-test stand-ins serve: embeddings, Qdrant collections and Postgres schemas.
+
+Embeddings are the normalized sum of one seeded random vector per token,
+so texts sharing words are close and the same text always gets the same
+vector. The sparse "bm25" vectors are hashed term counts. Both collections
+the API queries are built in a local-mode (in-memory) Qdrant with the same
+names, vector names and payload fields as the real ones.
+"""
+import random
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import psycopg
+from qdrant_client import QdrantClient, models
+
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+EMBEDDING_DIMENSIONS = 1536
+ITEMS_COLLECTION = "Amazon-items-collection-01-hybrid-search"
+REVIEWS_COLLECTION = "Amazon-items-collection-01-reviews"
+DENSE_VECTOR = "text-embedding-3-small"
+SPARSE_VECTOR = "bm25"
+
+PRODUCT_ID_PREFIX = "LT"
+PRODUCT_KINDS = [
+    "wireless headphones", "usb-c charger", "laptop stand", "mechanical keyboard", "phone case",
+    "smart watch", "bluetooth speaker", "webcam", "gaming mouse", "portable ssd",
+]
+PRODUCT_TRAITS = ["compact", "budget", "premium", "waterproof", "lightweight", "ergonomic", "fast", "durable"]
+REVIEW_OPINIONS = ["works great", "stopped working after a month", "good value", "feels cheap", "exceeded expectations"]
+
+# Scripts from scripts/sql, applied when the tools database has no shopping cart table yet
+TOOLS_DB_SCRIPTS = ["shopping_cart_table.sql", "warehouse_management.sql", "cart_notify.sql", "inventory_notify.sql"]
+
+
+#### Vectors
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(token: str) -> np.ndarray:
+    return np.random.default_rng(zlib.crc32(token.encode())).standard_normal(EMBEDDING_DIMENSIONS).astype(np.float32)
+
+
+def embed(text: str) -> np.ndarray:
+    tokens = tokenize(text) or [""]
+    vector = np.sum([_token_vector(token) for token in tokens], axis=0)
+    return vector / np.linalg.norm(vector)
+
+
+def sparse_terms(text: str) -> models.SparseVector:
+    counts = Counter(zlib.crc32(token.encode()) for token in tokenize(text))
+    return models.SparseVector(indices=list(counts), values=[float(count) for count in counts.values()])
+
+
+#### Qdrant
+
+def product_id(index: int) -> str:
+    return f"{PRODUCT_ID_PREFIX}{index:05d}"
+
+
+def product_description(index: int) -> str:
+    trait = PRODUCT_TRAITS[index % len(PRODUCT_TRAITS)]
+    kind = PRODUCT_KINDS[(index // len(PRODUCT_TRAITS)) % len(PRODUCT_KINDS)]
+    return f"{trait.capitalize()} {kind}, model {product_id(index)}"
+
+
+def build_qdrant(items: int = 200, reviews_per_item: int = 3) -> QdrantClient:
+    """Local-mode Qdrant holding both collections the API reads."""
+
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        ITEMS_COLLECTION,
+        vectors_config={DENSE_VECTOR: models.VectorParams(size=EMBEDDING_DIMENSIONS, distance=models.Distance.COSINE)},
+        sparse_vectors_config={SPARSE_VECTOR: models.SparseVectorParams()},
+    )
+    client.create_collection(
+        REVIEWS_COLLECTION,
+        vectors_config=models.VectorParams(size=EMBEDDING_DIMENSIONS, distance=models.Distance.COSINE),
+    )
+
+    rng = random.Random(items)
+    item_points, review_points = [], []
+    for index in range(items):
+        description = product_description(index)
+        item_points.append(models.PointStruct(
+            id=index,
+            vector={DENSE_VECTOR: embed(description).tolist(), SPARSE_VECTOR: sparse_terms(description)},
+            payload={
+                "parent_asin": product_id(index),
+                "description": description,
+                "average_rating": round(rng.uniform(2.5, 5.0), 1),
+                "price": round(rng.uniform(5, 300), 2),
+                "image": f"https://images.loadtest.invalid/{product_id(index)}.jpg",
+            },
+        ))
+        for review in range(reviews_per_item):
+            text = f"{description}: {REVIEW_OPINIONS[(index + review) % len(REVIEW_OPINIONS)]}"
+            review_points.append(models.PointStruct(
+                id=index * reviews_per_item + review,
+                vector=embed(text).tolist(),
+                payload={"parent_asin": product_id(index), "description": text},
+            ))
+
+    client.upsert(ITEMS_COLLECTION, points=item_points)
+    client.upsert(REVIEWS_COLLECTION, points=review_points)
+    return client
+
+
+#### Postgres
+
+def prepare_postgres() -> None:
+    """Create what the API expects in the configured databases, leaving existing schemas and data alone."""
+
+    # Imported here, the settings need the API keys the stand-ins don't
+    from api.core.config import config
+    from langgraph.checkpoint.postgres import PostgresSaver
+
+    with psycopg.connect(config.tools_db_conn_string, autocommit=True) as conn:
+        if conn.execute("SELECT to_regclass('shopping_carts.shopping_cart_items')").fetchone()[0] is None:
+            for script in TOOLS_DB_SCRIPTS:
+                conn.execute((REPO_ROOT / "scripts" / "sql" / script).read_text())
+
+    with PostgresSaver.from_conn_string(config.checkpointer_conn_string) as checkpointer:
+        checkpointer.setup()
+
+
+#### Queries
+
+def product_query(rng: random.Random, items: int) -> str:
+    index = rng.randrange(items)
+    return f"Can you recommend a {PRODUCT_TRAITS[index % len(PRODUCT_TRAITS)]} {PRODUCT_KINDS[(index // len(PRODUCT_TRAITS)) % len(PRODUCT_KINDS)]}?"
+
+
+def cart_query(rng: random.Random, items: int) -> str:
+    return f"Please add {product_id(rng.randrange(items))} to my cart."
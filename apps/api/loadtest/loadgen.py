@@ -0,0 +1,193 @@
+"""Concurrent /agent sessions against a running API, with a latency report.
+
+Each session is one thread: it sends --turns queries one after the other,
+with think time in between, and reads every turn's stream to the end.
+Reported per turn:
+
+- TTFB: request sent to the first event.
+- answer: request sent to the final_result event.
+- total: request sent to the end of the stream.
+- overhead: answer latency minus the delay the stand-ins injected for the
+  turn's X-Request-ID, the time the API itself spent orchestrating.
+
+With --max-overhead-p95, exits non-zero when the overhead p95 goes over
+the budget, so a regression in orchestration fails the run.
+
+    make run-load-test
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+from loadtest.fixtures import cart_query, product_query
+
+
+#### Sessions
+
+async def run_turn(client: httpx.AsyncClient, query: str, thread_id: str, transport: str) -> dict:
+    request_id = str(uuid.uuid4())
+    headers = {"X-Request-ID": request_id}
+    if transport == "ndjson":
+        headers["Accept"] = "application/x-ndjson"
+
+    result = {"request_id": request_id, "status": None, "ttfb": None, "answer": None, "total": None, "error": None}
+    start = time.perf_counter()
+    try:
+        async with client.stream("POST", "/agent/", json={"query": query, "thread_id": thread_id}, headers=headers) as response:
+            result["status"] = response.status_code
+            if response.status_code != 200:
+                await response.aread()
+                result["error"] = f"HTTP {response.status_code}"
+                return result
+
+            async for line in response.aiter_lines():
+                if transport == "sse":
+                    if not line.startswith("data: "):
+                        continue
+                    line = line[len("data: "):]
+                elif not line:
+                    continue
+
+                elapsed = time.perf_counter() - start
+                if result["ttfb"] is None:
+                    result["ttfb"] = elapsed
+                # SSE progress events are plain text, everything else is JSON with a type
+                if line.startswith("{") and json.loads(line).get("type") == "final_result":
+                    result["answer"] = elapsed
+
+        result["total"] = time.perf_counter() - start
+        if result["answer"] is None:
+            result["error"] = "no final_result"
+    except httpx.HTTPError as e:
+        result["error"] = type(e).__name__
+    return result
+
+
+async def run_session(client: httpx.AsyncClient, session: int, args, results: list) -> None:
+    rng = random.Random(args.seed + session)
+    thread_id = f"loadtest-{uuid.uuid4()}"
+
+    # Spread the first requests over one think time rather than sending them at once
+    await asyncio.sleep(rng.uniform(0, args.think_time))
+    for _ in range(args.turns):
+        query = cart_query(rng, args.items) if rng.random() < args.cart_ratio else product_query(rng, args.items)
+        results.append(await run_turn(client, query, thread_id, args.transport))
+        await asyncio.sleep(rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0)
+
+
+#### Report
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": values[-1], "mean": statistics.fmean(values)}
+
+
+def report(results: list[dict], injected: dict, wall: float) -> dict:
+    ok = [result for result in results if result["error"] is None]
+    for result in ok:
+        result["overhead"] = result["answer"] - injected.get(result["request_id"], 0.0)
+
+    errors = {}
+    for result in results:
+        if result["error"] is not None:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+    return {
+        "turns": len(results),
+        "ok": len(ok),
+        "errors": errors,
+        "wall_seconds": wall,
+        "throughput": len(ok) / wall if wall > 0 else 0.0,
+        "latency": {metric: percentiles([result[metric] for result in ok]) for metric in ["ttfb", "answer", "total", "overhead"]},
+    }
+
+
+def print_report(summary: dict) -> None:
+    print(
+        f"{summary['ok']}/{summary['turns']} turns ok in {summary['wall_seconds']:.1f}s, "
+        f"{summary['throughput']:.2f} turns/s"
+    )
+    if summary["errors"]:
+        print("errors: " + ", ".join(f"{error} x{count}" for error, count in sorted(summary["errors"].items())))
+
+    print(f"{'':<10}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'mean':>9}")
+    for metric, stats in summary["latency"].items():
+        if stats:
+            print(f"{metric:<10}" + "".join(f"{stats[key]:>8.3f}s" for key in ["p50", "p95", "p99", "max", "mean"]))
+
+
+#### Run
+
+async def run(args) -> dict:
+    results = []
+    limits = httpx.Limits(max_connections=args.sessions, max_keepalive_connections=args.sessions)
+    timeout = httpx.Timeout(args.timeout, connect=5.0)
+
+    async with httpx.AsyncClient(base_url=args.api_url, limits=limits, timeout=timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(client, session, args, results) for session in range(args.sessions)))
+        wall = time.perf_counter() - start
+
+        injected = {}
+        if args.services_url:
+            response = await client.get(f"{args.services_url}/loadtest/injected")
+            injected = response.json()["injected_seconds"]
+
+    return report(results, injected, wall)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent sessions, one thread each")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per session")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean pause between the turns of a session, in seconds")
+    parser.add_argument("--cart-ratio", type=float, default=0.2, help="Share of turns asking to add an item to the cart")
+    parser.add_argument("--items", type=int, default=200, help="Products in the fixture collection")
+    parser.add_argument("--transport", choices=["sse", "ndjson"], default="sse")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Read timeout per turn, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    parser.add_argument("--max-overhead-p95", type=float, help="Exit non-zero when the overhead p95 is over this many seconds")
+
+
+def check(summary: dict, args) -> int:
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if summary["ok"] == 0:
+        print("No turn completed")
+        return 1
+    overhead_p95 = summary["latency"]["overhead"]["p95"]
+    if args.max_overhead_p95 is not None and overhead_p95 > args.max_overhead_p95:
+        print(f"Overhead p95 {overhead_p95:.3f}s is over the {args.max_overhead_p95:.3f}s budget")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent /agent sessions and report latency.")
+    parser.add_argument("--api-url", default="http://127.0.0.1:18001")
+    parser.add_argument("--services-url", default="http://127.0.0.1:18000", help="Stand-ins to read the injected delays from, empty to skip")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    print_report(summary)
+    sys.exit(check(summary, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Offline load test of /agent: stand-ins, API and load generator on one box.
+
+Prepares the Postgres schemas, starts loadtest.fake_services in place of
+OpenAI, Groq and Qdrant, starts the API (python -m api.serve) pointed at
+it, waits for /ready, drives the sessions with loadtest.loadgen and stops
+both processes. Postgres is the only real dependency, the one from
+docker-compose or any local server the POSTGRES_* / TOOLS_DB_* settings
+point at. No request leaves the machine.
+
+    make run-load-test
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from loadtest import loadgen
+from loadtest.fixtures import REPO_ROOT, prepare_postgres
+
+
+# Keys the settings require, never sent anywhere but the stand-ins
+DUMMY_ENV = {"OPENAI_API_KEY": "sk-loadtest", "GROQ_API_KEY": "gsk-loadtest", "GOOGLE_API_KEY": "loadtest"}
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before it was ready")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def stop(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /agent offline, against local stand-ins.")
+    parser.add_argument("--services-port", type=int, default=18000)
+    parser.add_argument("--api-port", type=int, default=18001)
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes")
+    parser.add_argument("--llm-latency", default="lognormal:0.8,0.3")
+    parser.add_argument("--embedding-latency", default="lognormal:0.1,0.3")
+    parser.add_argument("--qdrant-latency", default="none")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    loadgen.add_arguments(parser)
+    args = parser.parse_args()
+
+    for key, value in DUMMY_ENV.items():
+        os.environ.setdefault(key, value)
+    prepare_postgres()
+
+    services_url = f"http://127.0.0.1:{args.services_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    env = {
+        **os.environ,
+        **DUMMY_ENV,
+        "OPENAI_BASE_URL": f"{services_url}/v1",
+        "GROQ_API_BASE": f"{services_url}/v1",
+        "QDRANT_URL": services_url,
+        "LANGSMITH_TRACING": "false",
+        "LANGSMITH_ENDPOINT": f"{services_url}/langsmith",
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+        "FEEDBACK_WORKER_ENABLED": "false",
+        "API_HOST": "127.0.0.1",
+        "API_PORT": str(args.api_port),
+        "API_WORKERS": str(args.workers),
+        "API_RELOAD": "false",
+    }
+
+    services = subprocess.Popen(
+        [
+            sys.executable, "-m", "loadtest.fake_services",
+            "--port", str(args.services_port),
+            "--llm-latency", args.llm_latency,
+            "--embedding-latency", args.embedding_latency,
+            "--qdrant-latency", args.qdrant_latency,
+            "--items", str(args.items),
+        ],
+        cwd=REPO_ROOT / "apps" / "api",
+        env=env,
+    )
+    api = None
+    try:
+        wait_until_ready(f"{services_url}/", services, args.ready_timeout)
+        api = subprocess.Popen([sys.executable, "-m", "api.serve"], cwd=REPO_ROOT / "apps" / "api" / "src", env=env)
+        wait_until_ready(f"{api_url}/ready", api, args.ready_timeout)
+
+        args.api_url, args.services_url = api_url, services_url
+        summary = asyncio.run(loadgen.run(args))
+    finally:
+        if api is not None:
+            stop(api)
+        stop(services)
+
+    loadgen.print_report(summary)
+    sys.exit(loadgen.check(summary, args))
+
+
+if __name__ == "__main__":
+    main()
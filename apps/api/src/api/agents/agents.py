@@ -1,13 +1,15 @@
 from langsmith import traceable, get_current_run_tree
 from langchain_core.messages import convert_to_openai_messages, AIMessage
-from openai import OpenAI
-import instructor
-
 from api.agents.utils.prompt_management import prompt_template_config
-from api.agents.utils.utils import format_ai_message
+from api.agents.utils.utils import format_ai_message, emit_progress, tool_calls_to_text
+from api.core import deadline
+from api.core.config import config
+from api.core.metrics import observe_latency, LLM_LATENCY, LLM_FALLBACKS
+from api.core.request_context import request_id_headers
+from api.core.tracing import feedback_trace_id
+from api.core.usage import record_completion
 from pydantic import BaseModel, Field
 from typing import List
-from litellm import completion
 
 import logging
 
@@ -17,6 +19,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_llm_client = None
+
+
+def get_llm_client():
+    """instructor client over litellm completions, shared by the agents.
+
+    litellm alone takes seconds to import, so both are loaded on first use
+    (or by the startup warm-up) rather than with the app.
+    """
+
+    global _llm_client
+
+    if _llm_client is None:
+        import instructor
+        from litellm import completion
+
+        _llm_client = instructor.from_litellm(completion)
+    return _llm_client
+
+
+def _create_with_fallback(agent: str, models: list, response_model, prompts: dict, conversation: list):
+    """(response, raw completion) of the first model that answers, (None, None) once the request deadline has passed.
+
+    Each attempt gets what is left of the deadline as its timeout, so a
+    fallback model only runs when there is still time for it. The tokens of
+    every attempt, failed ones included, go to the turn's usage ledger.
+    """
+
+    client = get_llm_client()
+    error = None
+
+    for model in models:
+        if deadline.expired():
+            return None, None
+        try:
+            with observe_latency(LLM_LATENCY, agent=agent, model=model):
+                response, raw_response = client.chat.completions.create_with_completion(
+                    model=model,
+                    response_model=response_model,
+                    messages=[{"role": "system", "content": prompts[model]}, *conversation],
+                    temperature=0.5,
+                    timeout=deadline.timeout(config.LLM_TIMEOUT_SECONDS),
+                    extra_headers=request_id_headers(),
+                )
+        except Exception as e:
+            # Responses that failed validation were still billed
+            record_completion(agent, model, getattr(e, "total_usage", None), failed=True)
+            LLM_FALLBACKS.labels(agent=agent, model=model).inc()
+            print(f"Error with model {model}, {e}")
+            error = e
+        else:
+            record_completion(agent, model, raw_response.usage)
+            return response, raw_response
+
+    if deadline.expired():
+        return None, None
+    raise error
+
+
 ### QnA Agent Response Model
 
 class ToolCall(BaseModel):
@@ -71,6 +132,8 @@ class CoordinatorAgentResponse(BaseModel):
 )
 def product_qa_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"]) -> dict:
 
+    emit_progress("Looking into the products...")
+
     prompts = {}
     for model in models:
             prompts[model] = prompt_template_config("api/agents/prompts/product_qa_agent.yaml", model).render(
@@ -84,19 +147,18 @@ def product_qa_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"])
     for message in messages:
             conversation.append(convert_to_openai_messages(message))
 
-    client = instructor.from_litellm(completion)
+    response, raw_response = _create_with_fallback("product_qa_agent", models, ProductQAAgentResponse, prompts, conversation)
 
-    for model in models:
-        try:
-            response, raw_response = client.chat.completions.create_with_completion(
-                model=model,
-                response_model=ProductQAAgentResponse,
-                messages=[{"role": "system", "content": prompts[model]}, *conversation],
-                temperature=0.5,
-            )
-            break
-        except Exception as e:
-            print(f"Error with model {model}, {e}")
+    if response is None:
+        # Out of time, hand back to the coordinator with what was found so far
+        return {
+            "product_qa_agent": {
+                "tool_calls": [],
+                "iteration": state.product_qa_agent.iteration + 1,
+                "final_answer": True,
+                "available_tools": state.product_qa_agent.available_tools
+            }
+        }
 
     current_run = get_current_run_tree()
 
@@ -109,6 +171,9 @@ def product_qa_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"])
 
     ai_message = format_ai_message(response)
 
+    if response.tool_calls and not response.final_answer:
+        emit_progress(tool_calls_to_text(response.tool_calls))
+
     return {
         "messages": [ai_message],
         "product_qa_agent": {
@@ -130,6 +195,8 @@ def product_qa_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"])
 )
 def shopping_cart_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"]) -> dict:
 
+    emit_progress("Working on the shopping cart...")
+
     prompts = {}
     for model in models:
         prompts[model] = prompt_template_config("api/agents/prompts/shopping_cart_agent.yaml", model).render(
@@ -145,19 +212,17 @@ def shopping_cart_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"
     for message in messages:
         conversation.append(convert_to_openai_messages(message))
 
-    client = instructor.from_litellm(completion)
+    response, raw_response = _create_with_fallback("shopping_cart_agent", models, ShoppingCartAgentResponse, prompts, conversation)
 
-    for model in models:
-        try:
-            response, raw_response = client.chat.completions.create_with_completion(
-                model=model,
-                response_model=ShoppingCartAgentResponse,
-                messages=[{"role": "system", "content": prompts[model]}, *conversation],
-                temperature=0.5,
-            )
-            break
-        except Exception as e:
-            print(f"Error with model {model}, {e}")
+    if response is None:
+        return {
+            "shopping_cart_agent": {
+                "iteration": state.shopping_cart_agent.iteration + 1,
+                "final_answer": True,
+                "tool_calls": [],
+                "available_tools": state.shopping_cart_agent.available_tools
+            }
+        }
 
     current_run = get_current_run_tree()
 
@@ -170,6 +235,9 @@ def shopping_cart_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"
 
     ai_message = format_ai_message(response)
 
+    if response.tool_calls and not response.final_answer:
+        emit_progress(tool_calls_to_text(response.tool_calls))
+
     return {
         "messages": [ai_message],
         "shopping_cart_agent": {
@@ -190,6 +258,8 @@ def shopping_cart_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"
     metadata={"ls_provider": "openai", "ls_model_name": "gpt-4.1"}
 )
 def warehouse_manager_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"]) -> dict:
+    emit_progress("Checking the warehouses...")
+
     prompts = {}
     for model in models:
             prompts[model] = prompt_template_config("api/agents/prompts/warehouse_manager_agent.yaml", model).render(
@@ -203,19 +273,17 @@ def warehouse_manager_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versat
     for message in messages:
             conversation.append(convert_to_openai_messages(message))
 
-    client = instructor.from_litellm(completion)
+    response, raw_response = _create_with_fallback("warehouse_manager_agent", models, WarehouseManagerAgentResponse, prompts, conversation)
 
-    for model in models:
-        try:
-            response, raw_response = client.chat.completions.create_with_completion(
-                model=model,
-                response_model=WarehouseManagerAgentResponse,
-                messages=[{"role": "system", "content": prompts[model]}, *conversation],
-                temperature=0.5,
-            )
-            break
-        except Exception as e:
-            print(f"Error with model {model}, {e}")
+    if response is None:
+        return {
+            "warehouse_manager_agent": {
+                "iteration": state.warehouse_manager_agent.iteration + 1,
+                "final_answer": True,
+                "tool_calls": [],
+                "available_tools": state.warehouse_manager_agent.available_tools
+            }
+        }
 
     current_run = get_current_run_tree()
 
@@ -228,6 +296,9 @@ def warehouse_manager_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versat
 
     ai_message = format_ai_message(response)
 
+    if response.tool_calls and not response.final_answer:
+        emit_progress(tool_calls_to_text(response.tool_calls))
+
     return {
         "messages": [ai_message],
         "warehouse_manager_agent": {
@@ -250,6 +321,8 @@ def warehouse_manager_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versat
 )
 def coordinator_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"]):
 
+    emit_progress("Planning...")
+
     prompts = {}
     for model in models:
         prompts[model] = prompt_template_config("api/agents/prompts/coordinator_agent.yaml", model).render()
@@ -261,21 +334,22 @@ def coordinator_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"])
     for message in messages:
         conversation.append(convert_to_openai_messages(message))
 
-    client = instructor.from_litellm(completion)
-
-    for model in models:
-        try:
-            response, raw_response = client.chat.completions.create_with_completion(
-                model=model,
-                response_model=CoordinatorAgentResponse,
-                messages=[{"role": "system", "content": prompts[model]}, *conversation],
-                temperature=0.5,
-            )
-            break
-        except Exception as e:
-            print(f"Error with model {model}, {e}")
+    response, raw_response = _create_with_fallback("coordinator_agent", models, CoordinatorAgentResponse, prompts, conversation)
 
     current_run = get_current_run_tree()
+    trace_id = feedback_trace_id(current_run)
+
+    if response is None:
+        # Out of time, end the turn on the answer the sub-agents got to
+        return {
+            "coordinator_agent": {
+                "iteration": state.coordinator_agent.iteration + 1,
+                "final_answer": True,
+                "next_agent": "",
+                "plan": []
+            },
+            "trace_id": trace_id
+        }
 
     if current_run:
             current_run.metadata["usage_metadata"] = {
@@ -283,7 +357,6 @@ def coordinator_agent(state, models=["gpt-4.1", "groq/llama-3.3-70b-versatile"])
                 "output_tokens": raw_response.usage.completion_tokens,
                 "total_tokens": raw_response.usage.total_tokens
             }
-            trace_id = str(getattr(current_run, "trace_id", current_run.id))
         
     if response.final_answer:
         ai_message = [AIMessage(
@@ -0,0 +1,169 @@
+import math
+from itertools import combinations
+
+import numpy as np
+
+
+# Warehouse locations are free text like "Berlin, Germany". Cities listed here
+# get real great-circle distances, anything else falls back to matching the
+# city and country names.
+CITY_COORDINATES = {
+    "amsterdam": (52.37, 4.90),
+    "barcelona": (41.39, 2.17),
+    "berlin": (52.52, 13.40),
+    "bordeaux": (44.84, -0.58),
+    "brussels": (50.85, 4.35),
+    "cologne": (50.94, 6.96),
+    "copenhagen": (55.68, 12.57),
+    "dortmund": (51.51, 7.47),
+    "dresden": (51.05, 13.74),
+    "dusseldorf": (51.23, 6.77),
+    "frankfurt": (50.11, 8.68),
+    "hamburg": (53.55, 9.99),
+    "hanover": (52.38, 9.73),
+    "leipzig": (51.34, 12.37),
+    "lille": (50.63, 3.06),
+    "london": (51.51, -0.13),
+    "lyon": (45.76, 4.84),
+    "madrid": (40.42, -3.70),
+    "marseille": (43.30, 5.37),
+    "milan": (45.46, 9.19),
+    "munich": (48.14, 11.58),
+    "nantes": (47.22, -1.55),
+    "nice": (43.70, 7.27),
+    "nuremberg": (49.45, 11.08),
+    "paris": (48.86, 2.35),
+    "prague": (50.08, 14.44),
+    "rome": (41.90, 12.50),
+    "stuttgart": (48.78, 9.18),
+    "strasbourg": (48.57, 7.75),
+    "toulouse": (43.60, 1.44),
+    "vienna": (48.21, 16.37),
+    "warsaw": (52.23, 21.01),
+    "zurich": (47.38, 8.54),
+}
+
+SAME_COUNTRY_DISTANCE_KM = 500.0
+OTHER_COUNTRY_DISTANCE_KM = 1500.0
+
+# Largest number of warehouse subsets the exact solver will score before
+# falling back to the greedy allocation
+MAX_EXACT_COMBINATIONS = 50_000
+
+
+#### Distances
+
+def _parse_location(location: str) -> tuple[str, str]:
+    parts = [part.strip().lower() for part in (location or "").split(",") if part.strip()]
+    city = parts[0] if parts else ""
+    country = parts[-1] if len(parts) > 1 else ""
+    return city, country
+
+
+def _haversine_km(a: tuple, b: tuple) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+def location_distance_km(user_location: str, warehouse_location: str) -> float:
+    """Approximate distance in km, 0 when the user location is unknown or empty."""
+
+    user_city, user_country = _parse_location(user_location)
+    warehouse_city, warehouse_country = _parse_location(warehouse_location)
+
+    if not user_city:
+        return 0.0
+    if user_city in CITY_COORDINATES and warehouse_city in CITY_COORDINATES:
+        return round(_haversine_km(CITY_COORDINATES[user_city], CITY_COORDINATES[warehouse_city]), 1)
+    if user_city == warehouse_city:
+        return 0.0
+    if (user_country and user_country == warehouse_country) or user_city == warehouse_country:
+        return SAME_COUNTRY_DISTANCE_KM
+    return OTHER_COUNTRY_DISTANCE_KM
+
+
+#### Solvers
+
+def _allocate_within(available: np.ndarray, requested: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """Fill each item from the warehouses in `order`, taking as much as possible from each in turn."""
+
+    allocation = np.zeros_like(available)
+    remaining = requested.copy()
+    for warehouse in order:
+        take = np.minimum(available[warehouse], remaining)
+        allocation[warehouse] = take
+        remaining -= take
+    return allocation
+
+
+def solve_exact(available: np.ndarray, requested: np.ndarray, distances: np.ndarray):
+    """Smallest set of warehouses that covers every item, ties broken by total distance.
+
+    Scores all subsets of size 1, 2, ... at once per size with numpy, returns
+    None when no covering set is found within MAX_EXACT_COMBINATIONS subsets.
+    """
+
+    if not requested.any():
+        return np.zeros_like(available)
+
+    # Only warehouses holding something useful can be part of a best set
+    useful = np.flatnonzero((np.minimum(available, requested) > 0).any(axis=1))
+    scored = 0
+
+    for size in range(1, len(useful) + 1):
+        subsets = math.comb(len(useful), size)
+        if scored + subsets > MAX_EXACT_COMBINATIONS:
+            return None
+        scored += subsets
+
+        candidates = np.array(list(combinations(useful, size)), dtype=np.int64).reshape(subsets, size)
+        covers = (available[candidates].sum(axis=1) >= requested).all(axis=1)
+        if not covers.any():
+            continue
+
+        feasible = candidates[covers]
+        best = feasible[np.argmin(distances[feasible].sum(axis=1))]
+        return _allocate_within(available, requested, best[np.argsort(distances[best], kind="stable")])
+
+    return None
+
+
+def solve_greedy(available: np.ndarray, requested: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    """Repeatedly ship from the warehouse covering the most outstanding units, the closest one on ties."""
+
+    allocation = np.zeros_like(available)
+    remaining = requested.copy()
+    unused = np.ones(available.shape[0], dtype=bool)
+
+    while remaining.any() and unused.any():
+        coverage = np.minimum(available, remaining).sum(axis=1)
+        coverage[~unused] = -1
+        best_coverage = coverage.max()
+        if best_coverage <= 0:
+            break
+        candidates = np.flatnonzero(coverage == best_coverage)
+        warehouse = candidates[np.argmin(distances[candidates])]
+
+        take = np.minimum(available[warehouse], remaining)
+        allocation[warehouse] = take
+        remaining -= take
+        unused[warehouse] = False
+
+    return allocation
+
+
+def allocate(available: np.ndarray, requested: np.ndarray, distances: np.ndarray) -> tuple[np.ndarray, str]:
+    """Warehouses x items allocation for `requested`, and which solver produced it.
+
+    The exact solver is used when the order can be fulfilled completely and
+    the search space is small, the greedy one otherwise, including partial
+    fulfilment where it allocates whatever stock there is.
+    """
+
+    available = np.maximum(available, 0)
+    if (available.sum(axis=0) >= requested).all():
+        allocation = solve_exact(available, requested, distances)
+        if allocation is not None:
+            return allocation, "exact"
+    return solve_greedy(available, requested, distances), "greedy"
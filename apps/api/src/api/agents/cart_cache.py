@@ -0,0 +1,85 @@
+import threading
+
+from api.core.cache import TTLCache
+from api.core.config import config
+from api.core.listener import NotificationListener, tools_listener, trigger_installed
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+# Emitted for every shopping cart row change by scripts/sql/cart_notify.sql
+CART_CHANNEL = "cart_changes"
+CART_TABLE = "shopping_carts.shopping_cart_items"
+CART_TRIGGER = "shopping_cart_notify_change"
+
+
+class CartCache:
+    """Per-process read cache of shopping carts keyed by (user_id, cart_id).
+
+    Writes in this process invalidate their cart directly, writes from other
+    workers (or anything else touching the table) arrive as notifications on
+    the cart channel. While the listener is not in sync, or the notify trigger
+    was not found when it connected, the cache is bypassed, and everything
+    cached is dropped on reconnect.
+    """
+
+    def __init__(self, listener: NotificationListener = None):
+        self.listener = listener or tools_listener
+
+        self._entries = TTLCache("shopping_cart", ttl_seconds=config.CART_CACHE_TTL_SECONDS, max_size=config.CART_CACHE_MAX_SIZE)
+        self._lock = threading.Lock()
+        self.notified = False
+        # Bumped by every invalidation, a load that raced with one is not cached
+        self._generation = 0
+
+    def start(self) -> None:
+        self.listener.subscribe(
+            CART_CHANNEL,
+            on_connect=self._on_connect,
+            on_notify=lambda change: self.invalidate(change["user_id"], change["shopping_cart_id"])
+        )
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.listener.unsubscribe(CART_CHANNEL, timeout)
+
+    def _on_connect(self, conn) -> None:
+        self.clear()
+        self.notified = trigger_installed(conn, CART_TABLE, CART_TRIGGER)
+        if not self.notified:
+            logger.warning(f"Trigger {CART_TRIGGER} is missing on {CART_TABLE}, carts are not cached, install scripts/sql/cart_notify.sql and restart to cache them")
+
+    def get_or_load(self, user_id: str, cart_id: str, loader):
+        if not (config.CART_CACHE_ENABLED and self.notified and self.listener.is_fresh(config.CART_CACHE_MAX_STALENESS_SECONDS)):
+            return loader()
+
+        key = (user_id, cart_id)
+        cart = self._entries.get(key)
+        if cart is not None:
+            return cart
+
+        with self._lock:
+            generation = self._generation
+        cart = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._entries.set(key, cart)
+        return cart
+
+    def invalidate(self, user_id: str, cart_id: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.invalidate((user_id, cart_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+cart_cache = CartCache()
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass, asdict
+
+import psycopg
+
+from api.core.config import config
+from api.core.metrics import CHECKPOINT_RETENTION_DELETED
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionStats:
+    threads_expired: int = 0
+    threads_compacted: int = 0
+    checkpoints_deleted: int = 0
+    writes_deleted: int = 0
+    blobs_deleted: int = 0
+    thread_usage_deleted: int = 0
+    batches: int = 0
+    duration_seconds: float = 0.0
+    skipped: bool = False
+
+
+#### Queries
+
+# Session lock held for a whole pass, so the API workers (and a cron run of
+# the CLI) never prune the same threads or vacuum the same tables at once
+TRY_LOCK_QUERY = "SELECT pg_try_advisory_lock(hashtext('checkpoint_retention'))"
+
+UNLOCK_QUERY = "SELECT pg_advisory_unlock(hashtext('checkpoint_retention'))"
+
+# Threads whose latest checkpoint is older than the TTL. The checkpoint JSONB
+# carries the wall-clock "ts" of the superstep that produced it. Both candidate
+# queries scan the whole table, so they run once per pass and not per batch.
+EXPIRED_THREADS_QUERY = """
+    SELECT thread_id
+    FROM checkpoints
+    GROUP BY thread_id
+    HAVING max((checkpoint->>'ts')::timestamptz) < now() - make_interval(days => %s)
+    ORDER BY thread_id
+"""
+
+# Threads holding more than K checkpoints that are idle long enough that no
+# graph run can be writing to them while we compact.
+COMPACTABLE_THREADS_QUERY = """
+    SELECT thread_id
+    FROM checkpoints
+    GROUP BY thread_id
+    HAVING count(*) > %s
+       AND max((checkpoint->>'ts')::timestamptz) < now() - make_interval(secs => %s)
+    ORDER BY thread_id
+"""
+
+DELETE_THREADS_QUERIES = {
+    "writes_deleted": "DELETE FROM checkpoint_writes WHERE thread_id = ANY(%s)",
+    "blobs_deleted": "DELETE FROM checkpoint_blobs WHERE thread_id = ANY(%s)",
+    "checkpoints_deleted": "DELETE FROM checkpoints WHERE thread_id = ANY(%s)",
+}
+
+# The thread's running token and cost total (api.core.usage) goes with it,
+# once the first turn has created its table
+THREAD_USAGE_EXISTS_QUERY = "SELECT to_regclass('agent_thread_usage') IS NOT NULL"
+
+DELETE_THREAD_USAGE_QUERY = "DELETE FROM agent_thread_usage WHERE thread_id = ANY(%s)"
+
+DELETE_OLD_CHECKPOINTS_QUERY = """
+    DELETE FROM checkpoints c
+    USING (
+        SELECT thread_id, checkpoint_ns, checkpoint_id
+        FROM (
+            SELECT
+                thread_id, checkpoint_ns, checkpoint_id,
+                row_number() OVER (
+                    PARTITION BY thread_id, checkpoint_ns
+                    ORDER BY checkpoint_id DESC
+                ) AS rn
+            FROM checkpoints
+            WHERE thread_id = ANY(%s)
+        ) ranked
+        WHERE rn > %s
+    ) old
+    WHERE c.thread_id = old.thread_id
+      AND c.checkpoint_ns = old.checkpoint_ns
+      AND c.checkpoint_id = old.checkpoint_id
+"""
+
+DELETE_ORPHAN_WRITES_QUERY = """
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = ANY(%s)
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = w.thread_id
+            AND c.checkpoint_ns = w.checkpoint_ns
+            AND c.checkpoint_id = w.checkpoint_id
+      )
+"""
+
+# Blobs are shared between checkpoints: a channel that did not change keeps
+# pointing at an older version, so only drop versions no remaining checkpoint uses.
+DELETE_ORPHAN_BLOBS_QUERY = """
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = ANY(%s)
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = b.thread_id
+            AND c.checkpoint_ns = b.checkpoint_ns
+            AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+      )
+"""
+
+
+#### Retention Passes
+
+def _thread_batches(conn, query: str, params: tuple, batch_size: int):
+    # Thread ids are small, the candidates of a pass are held in memory
+    thread_ids = [row[0] for row in conn.execute(query, params).fetchall()]
+    for start in range(0, len(thread_ids), batch_size):
+        yield thread_ids[start:start + batch_size]
+
+
+def expire_idle_threads(conn, ttl_days: int, batch_size: int, stats: RetentionStats) -> None:
+    """Delete every checkpoint, write and blob of threads idle longer than the TTL, and their usage totals."""
+
+    queries = dict(DELETE_THREADS_QUERIES)
+    if conn.execute(THREAD_USAGE_EXISTS_QUERY).fetchone()[0]:
+        queries["thread_usage_deleted"] = DELETE_THREAD_USAGE_QUERY
+
+    for thread_ids in _thread_batches(conn, EXPIRED_THREADS_QUERY, (ttl_days,), batch_size):
+        with conn.transaction():
+            for stat, query in queries.items():
+                deleted = conn.execute(query, (thread_ids,)).rowcount
+                setattr(stats, stat, getattr(stats, stat) + deleted)
+        stats.threads_expired += len(thread_ids)
+        stats.batches += 1
+
+
+def compact_threads(conn, keep_last: int, min_idle_seconds: int, batch_size: int, stats: RetentionStats) -> None:
+    """Keep only the latest `keep_last` checkpoints of each thread, plus the writes and blobs they still reference."""
+
+    for thread_ids in _thread_batches(conn, COMPACTABLE_THREADS_QUERY, (keep_last, min_idle_seconds), batch_size):
+        with conn.transaction():
+            stats.checkpoints_deleted += conn.execute(DELETE_OLD_CHECKPOINTS_QUERY, (thread_ids, keep_last)).rowcount
+            stats.writes_deleted += conn.execute(DELETE_ORPHAN_WRITES_QUERY, (thread_ids,)).rowcount
+            stats.blobs_deleted += conn.execute(DELETE_ORPHAN_BLOBS_QUERY, (thread_ids,)).rowcount
+        stats.threads_compacted += len(thread_ids)
+        stats.batches += 1
+
+
+def vacuum_checkpoint_tables(conn) -> None:
+    """VACUUM cannot run inside a transaction block, so this needs an autocommit connection."""
+
+    for table in ("checkpoints", "checkpoint_writes", "checkpoint_blobs"):
+        conn.execute(f"VACUUM (ANALYZE) {table}")
+
+
+def run_retention(
+    conn_string: str = None,
+    keep_last: int = None,
+    ttl_days: int = None,
+    min_idle_seconds: int = None,
+    batch_size: int = None,
+    vacuum: bool = None,
+) -> RetentionStats:
+    """Run one full retention pass: TTL expiry, per-thread compaction, then vacuum.
+
+    Any argument left as None falls back to the CHECKPOINT_* settings. Deleted
+    row counts are also exported as checkpoint_retention_deleted_total. The
+    pass is skipped, with `skipped` set, while another process runs one.
+    """
+
+    conn_string = conn_string or config.checkpointer_conn_string
+    keep_last = config.CHECKPOINT_KEEP_LAST if keep_last is None else keep_last
+    ttl_days = config.CHECKPOINT_TTL_DAYS if ttl_days is None else ttl_days
+    min_idle_seconds = config.CHECKPOINT_MIN_IDLE_SECONDS if min_idle_seconds is None else min_idle_seconds
+    batch_size = config.CHECKPOINT_RETENTION_BATCH_SIZE if batch_size is None else batch_size
+    vacuum = config.CHECKPOINT_RETENTION_VACUUM if vacuum is None else vacuum
+
+    if keep_last < 1:
+        raise ValueError("keep_last must be at least 1, the latest checkpoint is needed to resume a thread")
+
+    stats = RetentionStats()
+    start = time.perf_counter()
+
+    with psycopg.connect(conn_string, autocommit=True) as conn:
+        if not conn.execute(TRY_LOCK_QUERY).fetchone()[0]:
+            logger.info("Checkpoint retention skipped, another process is running it")
+            stats.skipped = True
+            return stats
+        try:
+            if ttl_days > 0:
+                expire_idle_threads(conn, ttl_days, batch_size, stats)
+            compact_threads(conn, keep_last, min_idle_seconds, batch_size, stats)
+            if vacuum and stats.batches > 0:
+                vacuum_checkpoint_tables(conn)
+        finally:
+            conn.execute(UNLOCK_QUERY)
+
+    stats.duration_seconds = time.perf_counter() - start
+
+    CHECKPOINT_RETENTION_DELETED.labels(table="checkpoints").inc(stats.checkpoints_deleted)
+    CHECKPOINT_RETENTION_DELETED.labels(table="checkpoint_writes").inc(stats.writes_deleted)
+    CHECKPOINT_RETENTION_DELETED.labels(table="checkpoint_blobs").inc(stats.blobs_deleted)
+    CHECKPOINT_RETENTION_DELETED.labels(table="agent_thread_usage").inc(stats.thread_usage_deleted)
+    logger.info(f"Checkpoint retention finished: {asdict(stats)}")
+
+    return stats
+
+
+async def run_retention_periodically(interval_seconds: int = None) -> None:
+    """Background task for the API process, runs a retention pass every `interval_seconds`."""
+
+    interval_seconds = interval_seconds or config.CHECKPOINT_RETENTION_INTERVAL_SECONDS
+
+    while True:
+        try:
+            await asyncio.to_thread(run_retention)
+        except Exception as e:
+            logger.error(f"Checkpoint retention failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+#### CLI
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune LangGraph checkpoints stored in Postgres.")
+    parser.add_argument("--keep-last", type=int, default=None, help="Checkpoints to keep per thread")
+    parser.add_argument("--ttl-days", type=int, default=None, help="Delete threads idle longer than this, 0 disables expiry")
+    parser.add_argument("--min-idle-seconds", type=int, default=None, help="Only compact threads idle at least this long")
+    parser.add_argument("--batch-size", type=int, default=None, help="Threads deleted per transaction")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip VACUUM (ANALYZE) after deleting")
+    args = parser.parse_args()
+
+    run_retention(
+        keep_last=args.keep_last,
+        ttl_days=args.ttl_days,
+        min_idle_seconds=args.min_idle_seconds,
+        batch_size=args.batch_size,
+        vacuum=False if args.no_vacuum else None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,23 @@
-from qdrant_client import QdrantClient
 from pydantic import BaseModel, Field
 from operator import add
-import numpy as np
-from qdrant_client.models import Filter, FieldCondition, MatchValue
 from typing import Annotated, List, Any, Dict
 from api.agents.agents import ToolCall, RAGUsedContext, Delegation, product_qa_agent, shopping_cart_agent, warehouse_manager_agent, coordinator_agent
-from api.agents.tools import get_formatted_items_context, get_formatted_reviews_context, add_to_shopping_cart, remove_from_shopping_cart, get_shopping_cart, check_warehouse_availability, reserve_warehouse_items
+from api.agents.tools import get_formatted_items_context, get_formatted_reviews_context, add_to_shopping_cart, remove_from_shopping_cart, get_shopping_cart, check_warehouse_availability, plan_warehouse_allocation, reserve_warehouse_items, get_product_attributes
 from api.agents.utils.utils import get_tool_descriptions
+from api.core import deadline
+from api.core.config import config as settings
+from api.core.db import get_saver_pool
+from api.core.metrics import GraphMetricsCallbackHandler, AGENT_ITERATIONS, AGENT_DEADLINE_EXCEEDED
+from api.core.usage import finish_turn, add_thread_usage
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
 from langgraph.checkpoint.postgres import PostgresSaver
-import os
-import json
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeoutError
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class AgentProperties(BaseModel):    
@@ -49,6 +55,8 @@ def product_qa_agent_tool_edge(state) -> str:
         return "end"
     elif state.product_qa_agent.iteration > 4:
         return "end"
+    elif deadline.expired():
+        return "end"
     elif len(state.product_qa_agent.tool_calls) > 0:
         return "tools"
     else:
@@ -62,6 +70,8 @@ def shopping_cart_agent_tool_edge(state) -> str:
         return "end"
     elif state.shopping_cart_agent.iteration > 2:
         return "end"
+    elif deadline.expired():
+        return "end"
     elif len(state.shopping_cart_agent.tool_calls) > 0:
         return "tools"
     else:
@@ -74,6 +84,8 @@ def warehouse_manager_agent_tool_edge(state) -> str:
         return "end"
     elif state.warehouse_manager_agent.iteration > 2:
         return "end"
+    elif deadline.expired():
+        return "end"
     elif len(state.warehouse_manager_agent.tool_calls) > 0:
         return "tools"
     else:
@@ -85,6 +97,8 @@ def coordinator_agent_edge(state):
         return "end"
     elif state.coordinator_agent.final_answer and len(state.coordinator_agent.plan) == 0:
         return "end"
+    elif deadline.expired():
+        return "end"
     elif state.coordinator_agent.next_agent == "product_qa_agent":
         return "product_qa_agent"
     elif state.coordinator_agent.next_agent == "shopping_cart_agent":
@@ -110,7 +124,7 @@ shopping_cart_agent_tools = [add_to_shopping_cart, remove_from_shopping_cart, ge
 shopping_cart_agent_tool_node = ToolNode(shopping_cart_agent_tools)
 shopping_cart_agent_tool_descriptions = get_tool_descriptions(shopping_cart_agent_tools)
 
-warehouse_manager_agent_tools = [check_warehouse_availability, reserve_warehouse_items]
+warehouse_manager_agent_tools = [check_warehouse_availability, plan_warehouse_allocation, reserve_warehouse_items]
 warehouse_manager_agent_tool_node = ToolNode(warehouse_manager_agent_tools)
 warehouse_manager_agent_tool_descriptions = get_tool_descriptions(warehouse_manager_agent_tools)
 
@@ -166,42 +180,72 @@ workflow.add_edge("product_qa_agent_tool_node", "product_qa_agent")
 workflow.add_edge("shopping_cart_agent_tool_node", "shopping_cart_agent")
 workflow.add_edge("warehouse_manager_agent_tool_node", "warehouse_manager_agent")
 
+_graph = None
+_graph_lock = threading.Lock()
 
-#### Agent Execution Function
 
-def rag_agent_stream_wrapper(question: str, thread_id: str):
+def get_graph():
+    """The workflow compiled once per worker, with a PostgresSaver over a connection pool. Built by the warm-up."""
+
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = workflow.compile(checkpointer=PostgresSaver(get_saver_pool()))
+    return _graph
 
-    def _string_for_sse(message: str):
-        return f"data: {message}\n\n"
 
-    def _process_graph_event(chunk):
+#### Post-graph Enrichment
+
+# Copies the caller's context into each lookup, so the request ID reaches its logs and traces
+enrichment_executor = ContextThreadPoolExecutor(max_workers=16, thread_name_prefix="enrichment")
+
+
+def _collect_used_context(references, references_future):
+    """Keep reference order, skip products without an image or missing from the catalog.
+
+    Empty when the lookup failed or is still running.
+    """
+
+    if not references_future.done():
+        return []
+    if references_future.exception() is not None:
+        logger.warning(f"Reference lookup failed: {references_future.exception()}")
+        return []
+
+    attributes = references_future.result()
+    used_context = []
+    for item in references:
+        image_url = attributes.get(item.id, {}).get("image")
+        if image_url:
+            used_context.append({
+                "image_url": image_url,
+                "price": attributes[item.id].get("price"),
+                "description": item.description
+            })
+    return used_context
 
-        def _is_node_start(chunk):
-            return chunk[1].get("type") == "task"
 
-        def _is_node_end(chunk):
-            return chunk[0] == "updates"
+def _format_shopping_cart(shopping_cart):
+    return [
+        {
+            "price": float(item.get("price")) if item.get("price") else None,
+            "quantity": item.get("quantity"),
+            "currency": item.get("currency"),
+            "product_image_url": item.get("product_image_url"),
+            "total_price": float(item.get("total_price")) if item.get("total_price") else None
+        }
+        for item in shopping_cart
+    ]
 
-        def _tool_to_text(tool_call):
-            if tool_call.name == "get_formatted_items_context":
-                return f"Looking for items: {tool_call.arguments.get('query', '')}."
-            elif tool_call.name == "get_formatted_reviews_context":
-                return f"Fetching user reviews..."
-            else:
-                return f"Unknown tool: {tool_call.name}."
 
-        if _is_node_start(chunk):
-            if chunk[1].get("payload", {}).get("name") == "intent_router_node":
-                return "Analysing the question..."
-            if chunk[1].get("payload", {}).get("name") == "agent_node":
-                return "Planning..."
-            if chunk[1].get("payload", {}).get("name") == "tool_node":
-                message = " ".join([_tool_to_text(tool_call) for tool_call in chunk[1].get('payload', {}).get('input', {}).tool_calls])
-                return message
-        else:
-            return False
+#### Agent Execution Function
 
-    qdrant_client = QdrantClient(url="http://qdrant:6333")
+DEADLINE_FALLBACK_ANSWER = "Sorry, I ran out of time before I could answer. Please try again or ask a narrower question."
+
+
+def rag_agent_stream_wrapper(question: str, thread_id: str):
+    """Run one turn of the graph, yielding its events ({"type", "data"}) for the transports to encode."""
 
     initial_state = {
         "messages": [{"role": "user", "content": question}],
@@ -229,6 +273,10 @@ def rag_agent_stream_wrapper(question: str, thread_id: str):
             "plan": [],
             "next_agent": ""
         },
+        # Answered anew each turn, so running out of time never repeats the previous answer
+        "answer": "",
+        # Set by the coordinator, empty when this turn's trace is not exported
+        "trace_id": "",
         "user_id": thread_id,
         "cart_id": thread_id
     }
@@ -236,78 +284,95 @@ def rag_agent_stream_wrapper(question: str, thread_id: str):
     config = {
         "configurable": {
             "thread_id": thread_id
-        }
+        },
+        "callbacks": [GraphMetricsCallbackHandler()]
     }
 
-    with PostgresSaver.from_conn_string(f"""postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}""") as checkpointer:
-
-        graph = workflow.compile(checkpointer=checkpointer)
+    graph = get_graph()
 
+    try:
         for chunk in graph.stream(
             initial_state, 
             config=config,
-            stream_mode=["debug", "values"]
+            stream_mode="custom"
         ):
-            processed_chunk = _process_graph_event(chunk)
-
-            if processed_chunk:
-                yield _string_for_sse(processed_chunk)
-            
-            if chunk[0] == "values":
-                result = chunk[1]
-
-    used_context = []
-    dummy_vector = np.zeros(1536).tolist()
-
-    for item in result.get("references", []):
-        payload = qdrant_client.query_points(
-            collection_name="Amazon-items-collection-01-hybrid-search",
-            query=dummy_vector,
-            limit=1,
-            using="text-embedding-3-small",
-            with_payload=True,
-            query_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="parent_asin",
-                        match=MatchValue(value=item.id)
-                    )
-                ]
-            )
-        ).points[0].payload
-        image_url = payload.get("image")
-        price = payload.get("price")
-        if image_url:
-            used_context.append({
-                "image_url": image_url,
-                "price": price,
-                "description": item.description
-            })
-
-    shopping_cart = get_shopping_cart(thread_id, thread_id)
-    shopping_cart_items = [
-        {
-            "price": float(item.get("price")) if item.get("price") else None,
-            "quantity": item.get("quantity"),
-            "currency": item.get("currency"),
-            "product_image_url": item.get("product_image_url"),
-            "total_price": float(item.get("total_price")) if item.get("total_price") else None
+            if chunk.get("type") == "progress":
+                yield {"type": "progress", "data": {"message": chunk["message"]}}
+    except Exception as e:
+        # A call cut short by the deadline, the last checkpoint holds the best answer so far
+        if not deadline.expired():
+            raise
+        logger.warning(f"Agent run stopped by the deadline: {e}")
+
+    result = graph.get_state(config).values
+
+    answer = result.get("answer", "")
+    if deadline.exceeded():
+        AGENT_DEADLINE_EXCEEDED.inc()
+        logger.warning(f"Deadline of {deadline.deadline_var.get().seconds:.1f}s exceeded, answering with the partial result (thread_id: {thread_id})")
+        answer = answer or DEADLINE_FALLBACK_ANSWER
+
+    for agent in ("coordinator_agent", "product_qa_agent", "shopping_cart_agent", "warehouse_manager_agent"):
+        AGENT_ITERATIONS.labels(agent=agent).observe(result.get(agent, {}).get("iteration", 0))
+
+    # Every reference resolved by one cached, batched lookup
+    references = result.get("references", [])
+    references_future = enrichment_executor.submit(get_product_attributes, [item.id for item in references])
+    shopping_cart_future = enrichment_executor.submit(get_shopping_cart, thread_id, thread_id)
+    usage = finish_turn()
+    # The thread's running total follows in its own event, the answer does not wait for Postgres
+    thread_usage_future = enrichment_executor.submit(add_thread_usage, thread_id, usage) if usage else None
+
+    yield {
+        "type": "final_result",
+        "data": {
+            "answer": answer,
+            "trace_id": result.get("trace_id", ""),
+            "deadline_exceeded": deadline.exceeded(),
+            "usage": usage
         }
-        for item in shopping_cart
-    ]
-
+    }
 
-    yield _string_for_sse(json.dumps(
-        {
-            "type": "final_result",
-            "data": {
-                "answer": result.get("answer", ""),
-                "used_context": used_context,
-                "trace_id": result.get("trace_id", ""),
-                "shopping_cart": shopping_cart_items
+    pending = {shopping_cart_future, references_future}
+    if thread_usage_future is not None:
+        pending.add(thread_usage_future)
+    enrichment_timeout = settings.ENRICHMENT_TIMEOUT_SECONDS
+    if deadline.remaining() is not None:
+        enrichment_timeout = max(min(enrichment_timeout, deadline.remaining()), 0)
+    used_context_sent = False
+
+    try:
+        for future in as_completed(pending, timeout=enrichment_timeout):
+            pending.discard(future)
+
+            if future is thread_usage_future:
+                if future.exception() is not None:
+                    logger.warning(f"Could not add the turn's usage to thread {thread_id}: {future.exception()}")
+                else:
+                    yield {
+                        "type": "thread_usage",
+                        "data": future.result()
+                    }
+
+            if future is shopping_cart_future:
+                if future.exception() is not None:
+                    logger.warning(f"Shopping cart lookup failed: {future.exception()}")
+                else:
+                    yield {
+                        "type": "shopping_cart",
+                        "data": _format_shopping_cart(future.result())
+                    }
+
+            if future is references_future:
+                used_context_sent = True
+                yield {
+                    "type": "used_context",
+                    "data": _collect_used_context(references, references_future)
+                }
+    except FuturesTimeoutError:
+        logger.warning(f"Enrichment deadline of {enrichment_timeout:.1f}s exceeded, {len(pending)} lookups dropped (thread_id: {thread_id})")
+        if not used_context_sent:
+            yield {
+                "type": "used_context",
+                "data": _collect_used_context(references, references_future)
             }
-        }
-    ))
-
-               
-
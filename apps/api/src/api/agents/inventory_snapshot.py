@@ -0,0 +1,178 @@
+import threading
+import time
+
+import numpy as np
+
+from api.core.listener import NotificationListener, tools_listener, trigger_installed
+from api.core.metrics import INVENTORY_SNAPSHOT_ROWS, INVENTORY_SNAPSHOT_EVENTS
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+# Emitted for every inventory row change by scripts/sql/inventory_notify.sql
+INVENTORY_CHANNEL = "inventory_changes"
+INVENTORY_TABLE = "warehouses.inventory"
+INVENTORY_TRIGGER = "inventory_notify_change"
+
+LOAD_QUERY = """
+    SELECT warehouse_id, product_id, available_quantity, warehouse_name, warehouse_location
+    FROM warehouses.inventory
+"""
+
+
+class InventorySnapshot:
+    """In-process product x warehouse table of available quantities.
+
+    The listener loads the full table on every (re)connect, notifications
+    sent while disconnected are lost, then applies each change notification
+    as it arrives. Without the notify trigger installed nothing would ever
+    arrive, so the snapshot is only trusted when the trigger is found on connect.
+    """
+
+    def __init__(self, listener: NotificationListener = None):
+        self.listener = listener or tools_listener
+
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.notified = False
+        self._product_index = {}
+        self._warehouse_index = {}
+        self._warehouses = []
+        self._available = np.zeros((0, 0), dtype=np.int64)
+        self._stocked = np.zeros((0, 0), dtype=bool)
+
+    #### Lifecycle
+
+    def start(self) -> None:
+        self.listener.subscribe(INVENTORY_CHANNEL, on_connect=self.load, on_notify=self.apply)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.listener.unsubscribe(INVENTORY_CHANNEL, timeout)
+
+    #### Updates
+
+    def load(self, conn) -> None:
+        """Replace the snapshot with the current content of warehouses.inventory."""
+
+        start = time.perf_counter()
+        self.notified = trigger_installed(conn, INVENTORY_TABLE, INVENTORY_TRIGGER)
+        if not self.notified:
+            logger.warning(f"Trigger {INVENTORY_TRIGGER} is missing on {INVENTORY_TABLE}, reading availability from the database, install scripts/sql/inventory_notify.sql and restart to use the snapshot")
+        rows = conn.execute(LOAD_QUERY).fetchall()
+
+        product_index = {}
+        warehouse_index = {}
+        warehouses = []
+        product_rows = np.empty(len(rows), dtype=np.int64)
+        warehouse_cols = np.empty(len(rows), dtype=np.int64)
+        quantities = np.empty(len(rows), dtype=np.int64)
+
+        for n, (warehouse_id, product_id, available_quantity, warehouse_name, warehouse_location) in enumerate(rows):
+            col = warehouse_index.get(warehouse_id)
+            if col is None:
+                col = warehouse_index[warehouse_id] = len(warehouses)
+                warehouses.append({
+                    "warehouse_id": warehouse_id,
+                    "warehouse_name": warehouse_name,
+                    "warehouse_location": warehouse_location
+                })
+            product_rows[n] = product_index.setdefault(product_id, len(product_index))
+            warehouse_cols[n] = col
+            quantities[n] = available_quantity
+
+        available = np.zeros((len(product_index), len(warehouses)), dtype=np.int64)
+        stocked = np.zeros((len(product_index), len(warehouses)), dtype=bool)
+        available[product_rows, warehouse_cols] = quantities
+        stocked[product_rows, warehouse_cols] = True
+
+        with self._lock:
+            self._product_index = product_index
+            self._warehouse_index = warehouse_index
+            self._warehouses = warehouses
+            self._available = available
+            self._stocked = stocked
+            self.loaded = True
+
+        INVENTORY_SNAPSHOT_ROWS.set(len(rows))
+        logger.info(f"Loaded inventory snapshot: {len(product_index)} products x {len(warehouses)} warehouses in {time.perf_counter() - start:.2f}s")
+
+    def apply(self, change: dict) -> None:
+        """Apply one row change: {"op", "warehouse_id", "product_id", "available_quantity", "warehouse_name", "warehouse_location"}."""
+
+        with self._lock:
+            if not self.loaded:
+                return
+
+            row = self._product_row(change["product_id"])
+            col = self._warehouse_col(change["warehouse_id"])
+
+            if change["op"] == "DELETE":
+                self._available[row, col] = 0
+                self._stocked[row, col] = False
+            else:
+                self._available[row, col] = change["available_quantity"]
+                self._stocked[row, col] = True
+                self._warehouses[col]["warehouse_name"] = change["warehouse_name"]
+                self._warehouses[col]["warehouse_location"] = change["warehouse_location"]
+
+        INVENTORY_SNAPSHOT_EVENTS.labels(op=change["op"].lower()).inc()
+
+    def _product_row(self, product_id: str) -> int:
+        row = self._product_index.get(product_id)
+        if row is None:
+            row = self._product_index[product_id] = len(self._product_index)
+            if row >= self._available.shape[0]:
+                self._grow(rows=max(16, row * 2), cols=self._available.shape[1])
+        return row
+
+    def _warehouse_col(self, warehouse_id: str) -> int:
+        col = self._warehouse_index.get(warehouse_id)
+        if col is None:
+            col = self._warehouse_index[warehouse_id] = len(self._warehouses)
+            self._warehouses.append({"warehouse_id": warehouse_id, "warehouse_name": None, "warehouse_location": None})
+            if col >= self._available.shape[1]:
+                self._grow(rows=self._available.shape[0], cols=max(4, col * 2))
+        return col
+
+    def _grow(self, rows: int, cols: int) -> None:
+        available = np.zeros((rows, cols), dtype=np.int64)
+        stocked = np.zeros((rows, cols), dtype=bool)
+        old_rows, old_cols = self._available.shape
+        available[:old_rows, :old_cols] = self._available
+        stocked[:old_rows, :old_cols] = self._stocked
+        self._available = available
+        self._stocked = stocked
+
+    #### Reads
+
+    def is_fresh(self, max_staleness_seconds: float) -> bool:
+        """True when the snapshot is loaded, its trigger installed and the listener drained the channel within `max_staleness_seconds`."""
+        return self.loaded and self.notified and self.listener.is_fresh(max_staleness_seconds)
+
+    def availability(self, product_ids: list[str]) -> tuple[list[dict], np.ndarray]:
+        """Warehouses stocking anything, ordered by id, and their warehouses x products matrix of available quantities."""
+
+        with self._lock:
+            cols = [
+                col for col in range(len(self._warehouses))
+                if self._stocked[:len(self._product_index), col].any()
+            ]
+            cols.sort(key=lambda col: self._warehouses[col]["warehouse_id"])
+
+            rows = np.array([self._product_index.get(product_id, -1) for product_id in product_ids], dtype=np.int64)
+            known = rows >= 0
+
+            available = np.zeros((len(cols), len(product_ids)), dtype=np.int64)
+            available[:, known] = self._available[np.ix_(rows[known], cols)].T
+            warehouses = [dict(self._warehouses[col]) for col in cols]
+
+        return warehouses, available
+
+
+inventory_snapshot = InventorySnapshot()
@@ -0,0 +1,99 @@
+# SQL the agent tools run against the tools database. Each statement is a
+# constant with bound parameters, so its text is identical on every call and
+# pooled connections prepare it server-side once (see api.core.db), later
+# executions skip parsing and planning.
+
+
+#### Shopping Cart
+
+CART_SELECT_QUERY = """
+    SELECT
+        product_id, price, quantity,
+        currency, product_image_url
+    FROM shopping_carts.shopping_cart_items
+    WHERE user_id = %s AND shopping_cart_id = %s
+    ORDER BY added_at DESC
+"""
+
+# Insert new items and add to the quantity of existing ones in one statement,
+# the unique_user_cart_product constraint makes concurrent adds safe
+CART_UPSERT_QUERY = """
+    INSERT INTO shopping_carts.shopping_cart_items (
+        user_id, shopping_cart_id, product_id,
+        price, quantity, currency, product_image_url
+    )
+    SELECT %s, %s, item.product_id, item.price, item.quantity, %s, item.product_image_url
+    FROM unnest(%s::varchar[], %s::numeric[], %s::integer[], %s::varchar[])
+        AS item(product_id, price, quantity, product_image_url)
+    ON CONFLICT ON CONSTRAINT unique_user_cart_product DO UPDATE
+    SET
+        quantity = shopping_cart_items.quantity + EXCLUDED.quantity,
+        price = EXCLUDED.price,
+        currency = EXCLUDED.currency,
+        product_image_url = COALESCE(EXCLUDED.product_image_url, shopping_cart_items.product_image_url)
+    RETURNING product_id, quantity, price, (xmax = 0) AS inserted
+"""
+
+CART_DELETE_QUERY = """
+    DELETE FROM shopping_carts.shopping_cart_items
+    WHERE user_id = %s AND shopping_cart_id = %s AND product_id = %s
+"""
+
+
+#### Warehouse Inventory
+
+# One row per warehouse with the available quantity of every requested
+# item, in request order (0 when the warehouse does not stock it).
+# Warehouse ids are walked through idx_inventory_warehouse (a loose index
+# scan) instead of a DISTINCT over the whole inventory table.
+INVENTORY_AVAILABILITY_QUERY = """
+    WITH RECURSIVE warehouse_ids AS (
+        (SELECT warehouse_id FROM warehouses.inventory ORDER BY warehouse_id LIMIT 1)
+        UNION ALL
+        SELECT (
+            SELECT i.warehouse_id FROM warehouses.inventory i
+            WHERE i.warehouse_id > w.warehouse_id
+            ORDER BY i.warehouse_id
+            LIMIT 1
+        )
+        FROM warehouse_ids w
+        WHERE w.warehouse_id IS NOT NULL
+    )
+    SELECT
+        w.warehouse_id, d.warehouse_name, d.warehouse_location,
+        COALESCE(a.available, '{}') AS available
+    FROM warehouse_ids w
+    CROSS JOIN LATERAL (
+        SELECT warehouse_name, warehouse_location
+        FROM warehouses.inventory
+        WHERE warehouse_id = w.warehouse_id
+        LIMIT 1
+    ) d
+    CROSS JOIN LATERAL (
+        SELECT array_agg(COALESCE(i.available_quantity, 0) ORDER BY r.ordinality) AS available
+        FROM unnest(%s::varchar[]) WITH ORDINALITY AS r(product_id, ordinality)
+        LEFT JOIN warehouses.inventory i
+            ON i.warehouse_id = w.warehouse_id AND i.product_id = r.product_id
+    ) a
+    WHERE w.warehouse_id IS NOT NULL
+    ORDER BY w.warehouse_id
+"""
+
+# Lock every target row at once, in key order, so concurrent multi-item
+# reservations always queue on the same row first instead of deadlocking
+INVENTORY_LOCK_QUERY = """
+    SELECT i.warehouse_id, i.product_id, i.warehouse_name, i.warehouse_location,
+           i.total_quantity, i.reserved_quantity, i.available_quantity
+    FROM warehouses.inventory i
+    JOIN unnest(%s::varchar[], %s::varchar[]) AS r(warehouse_id, product_id)
+        ON i.warehouse_id = r.warehouse_id AND i.product_id = r.product_id
+    ORDER BY i.warehouse_id, i.product_id
+    FOR UPDATE OF i
+"""
+
+INVENTORY_RESERVE_QUERY = """
+    UPDATE warehouses.inventory i
+    SET reserved_quantity = i.reserved_quantity + r.quantity
+    FROM unnest(%s::varchar[], %s::varchar[], %s::integer[]) AS r(warehouse_id, product_id, quantity)
+    WHERE i.warehouse_id = r.warehouse_id AND i.product_id = r.product_id
+"""
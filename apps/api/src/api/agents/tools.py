@@ -1,12 +1,43 @@
-import openai
 from langsmith import traceable, get_current_run_tree
-from qdrant_client.models import Prefetch, FusionQuery, Document, Filter, FieldCondition, MatchAny
-from qdrant_client import QdrantClient
 
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import numpy as np
-from qdrant_client.models import MatchValue
+
+from api.agents.allocation import allocate, location_distance_km
+from api.agents.cart_cache import cart_cache
+from api.agents.inventory_snapshot import inventory_snapshot
+from api.agents.queries import (
+    CART_SELECT_QUERY, CART_UPSERT_QUERY, CART_DELETE_QUERY,
+    INVENTORY_AVAILABILITY_QUERY, INVENTORY_LOCK_QUERY, INVENTORY_RESERVE_QUERY
+)
+from api.core import deadline
+from api.core.cache import TTLCache
+from api.core.config import config
+from api.core.db import get_connection
+from api.core.request_context import request_id_headers
+from api.core.usage import record_embedding
+from api.core.metrics import observe_latency, EMBEDDING_LATENCY, QDRANT_LATENCY, POSTGRES_LATENCY, INVENTORY_READS
+
+
+# openai and qdrant_client take over a second each to import, they are
+# loaded on first use (or by the startup warm-up) rather than with the app
+
+def get_qdrant_client():
+    """Qdrant client for the current request, its calls carry the request ID.
+
+    The client/server version check costs a round trip per client, the
+    startup warm-up runs it once instead. Calls time out with the request
+    deadline, rounded up to whole seconds by the client.
+    """
+
+    from qdrant_client import QdrantClient
+
+    return QdrantClient(
+        url=config.QDRANT_URL,
+        metadata=request_id_headers(),
+        check_compatibility=False,
+        timeout=deadline.timeout(config.QDRANT_TIMEOUT_SECONDS),
+    )
+
 
 @traceable(
     name="embed query",
@@ -14,10 +45,16 @@ from qdrant_client.models import MatchValue
     metadata={"ls_provider": "openai", "ls_model_name": "text-embedding-3-small"}
 )
 def get_embedding(text, model="text-embedding-3-small"):
-    response = openai.embeddings.create(
-        input=text,
-        model=model,
-    )
+    import openai
+
+    with observe_latency(EMBEDDING_LATENCY, model=model):
+        response = openai.embeddings.create(
+            input=text,
+            model=model,
+            timeout=deadline.timeout(config.EMBEDDING_TIMEOUT_SECONDS),
+            extra_headers=request_id_headers(),
+        )
+    record_embedding(model, response.usage)
     current_run= get_current_run_tree()
     if current_run:
         current_run.metadata["usage_metadata"] = {
@@ -31,31 +68,33 @@ def get_embedding(text, model="text-embedding-3-small"):
     run_type="retriever"
 )
 def retrieve_items_data(query, k=5):
+    from qdrant_client.models import Prefetch, FusionQuery, Document
 
     query_embedding = get_embedding(query)
 
-    qdrant_client = QdrantClient(url="http://qdrant:6333")
-
-    results = qdrant_client.query_points(
-        collection_name="Amazon-items-collection-01-hybrid-search",
-        prefetch=[
-            Prefetch(
-                query=query_embedding,
-                using="text-embedding-3-small",
-                limit=20
-            ),
-            Prefetch(
-                query=Document(
-                    text=query,
-                    model="qdrant/bm25"
+    qdrant_client = get_qdrant_client()
+
+    with observe_latency(QDRANT_LATENCY, collection="Amazon-items-collection-01-hybrid-search", operation="hybrid_search"):
+        results = qdrant_client.query_points(
+            collection_name="Amazon-items-collection-01-hybrid-search",
+            prefetch=[
+                Prefetch(
+                    query=query_embedding,
+                    using="text-embedding-3-small",
+                    limit=20
                 ),
-                using="bm25",
-                limit=20
-            )
-        ],
-        query=FusionQuery(fusion="rrf"),
-        limit=k,
-    )
+                Prefetch(
+                    query=Document(
+                        text=query,
+                        model="qdrant/bm25"
+                    ),
+                    using="bm25",
+                    limit=20
+                )
+            ],
+            query=FusionQuery(fusion="rrf"),
+            limit=k,
+        )
 
     retrieved_context_ids = []
     retrieved_context = []
@@ -115,31 +154,34 @@ def get_formatted_items_context(query: str, top_k: int = 5) -> str:
     run_type="retriever"
 )
 def retrieve_reviews_data(query, item_list, k=5):
+    from qdrant_client.models import Prefetch, FusionQuery, Filter, FieldCondition, MatchAny
+
     query_embedding = get_embedding(query)
 
-    qdrant_client = QdrantClient(url="http://qdrant:6333")
+    qdrant_client = get_qdrant_client()
 
-    results = qdrant_client.query_points(
-        collection_name="Amazon-items-collection-01-reviews",
-        prefetch=[
-            Prefetch(
-                query=query_embedding,
-                filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="parent_asin",
-                            match=MatchAny(
-                                any=item_list
+    with observe_latency(QDRANT_LATENCY, collection="Amazon-items-collection-01-reviews", operation="filtered_search"):
+        results = qdrant_client.query_points(
+            collection_name="Amazon-items-collection-01-reviews",
+            prefetch=[
+                Prefetch(
+                    query=query_embedding,
+                    filter=Filter(
+                        must=[
+                            FieldCondition(
+                                key="parent_asin",
+                                match=MatchAny(
+                                    any=item_list
+                                )
                             )
-                        )
-                    ]
-                ),
-                limit=20
-            )
-        ],
-        query=FusionQuery(fusion="rrf"),
-        limit=k
-    )
+                        ]
+                    ),
+                    limit=20
+                )
+            ],
+            query=FusionQuery(fusion="rrf"),
+            limit=k
+        )
 
     retrieved_context_ids = []
     retrieved_context = []
@@ -189,6 +231,68 @@ def get_formatted_reviews_context(query: str, item_list: list, top_k: int = 15)
 
     return formatted_context
 
+### Product Attributes
+
+product_attribute_cache = TTLCache(
+    "product_attributes",
+    ttl_seconds=config.PRODUCT_ATTRIBUTE_CACHE_TTL_SECONDS,
+    max_size=config.PRODUCT_ATTRIBUTE_CACHE_MAX_SIZE
+)
+
+
+@traceable(
+    name="get_product_attributes",
+    run_type="retriever"
+)
+def get_product_attributes(product_ids: list[str]) -> dict:
+    """Resolve price and image for many products with one Qdrant scroll.
+
+    Returns a dict keyed by product id, products missing from the collection
+    are left out. Found products are cached for PRODUCT_ATTRIBUTE_CACHE_TTL_SECONDS.
+    """
+
+    attributes = product_attribute_cache.get_many(product_ids)
+    missing = [product_id for product_id in dict.fromkeys(product_ids) if product_id not in attributes]
+
+    if not missing:
+        return attributes
+
+    from qdrant_client.models import Filter, FieldCondition, MatchAny
+
+    qdrant_client = get_qdrant_client()
+
+    resolved = {}
+    offset = None
+    with observe_latency(QDRANT_LATENCY, collection="Amazon-items-collection-01-hybrid-search", operation="product_attributes"):
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name="Amazon-items-collection-01-hybrid-search",
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="parent_asin",
+                            match=MatchAny(any=missing)
+                        )
+                    ]
+                ),
+                limit=len(missing),
+                offset=offset,
+                with_payload=["parent_asin", "price", "image"],
+                with_vectors=False,
+            )
+            for point in points:
+                resolved.setdefault(point.payload["parent_asin"], {
+                    "price": point.payload.get("price"),
+                    "image": point.payload.get("image")
+                })
+            if offset is None or len(resolved) == len(missing):
+                break
+
+    product_attribute_cache.set_many(resolved)
+
+    return {**attributes, **resolved}
+
+
 #Shoppig cart agent.
 
 # Add to shopping cart tools
@@ -207,91 +311,55 @@ def add_to_shopping_cart(items: list[dict], user_id: str, cart_id: str) -> str:
         cart_id: The id of the shopping cart to add the items to.
         
     Returns:
-        A list of the items added to the shopping cart.
+        A summary of the items added, with the resulting quantity in the cart for each item.
+        Product ids not found in the catalog are not added and reported with status not_found.
     """
 
-    conn = psycopg2.connect(
-        host="postgres",
-        port=5432,
-        database="tools_database",
-        user="langraph_user",
-        password="langraph_password"
-    )
-    conn.autocommit = True
+    # Sum repeated product ids, a single upsert cannot touch the same row twice
+    quantities = {}
+    for item in items:
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+
+    if not quantities:
+        return "No items to add to the shopping cart."
+
+    # Unknown ids, usually made up by the model, never enter the cart
+    attributes = get_product_attributes(list(quantities))
+    found = {product_id: quantity for product_id, quantity in quantities.items() if product_id in attributes}
+
+    rows = {}
+    if found:
+        with get_connection() as conn, conn.cursor() as cursor:
+            with observe_latency(POSTGRES_LATENCY, query="cart_item_upsert"):
+                cursor.execute(CART_UPSERT_QUERY, (
+                    user_id, cart_id, 'USD',
+                    list(found),
+                    [attributes[product_id]["price"] for product_id in found],
+                    list(found.values()),
+                    [attributes[product_id]["image"] for product_id in found]
+                ))
+                rows = {row['product_id']: row for row in cursor.fetchall()}
+
+        cart_cache.invalidate(user_id, cart_id)
+
+    results = [
+        {
+            "product_id": product_id,
+            "quantity_added": quantity,
+            "quantity_in_cart": rows[product_id]['quantity'],
+            "price": float(rows[product_id]['price']) if rows[product_id]['price'] is not None else None,
+            "status": "added" if rows[product_id]['inserted'] else "quantity_updated"
+        }
+        if product_id in rows else
+        {
+            "product_id": product_id,
+            "quantity_added": 0,
+            "status": "not_found"
+        }
+        for product_id, quantity in quantities.items()
+    ]
 
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        
-        for item in items:
-            product_id = item['product_id']
-            quantity = item['quantity']
-
-            qdrant_client = QdrantClient(url="http://qdrant:6333")
-
-            dummy_vector = np.zeros(1536).tolist()
-            payload = qdrant_client.query_points(
-                collection_name="Amazon-items-collection-01-hybrid-search",
-                prefetch=[
-                    Prefetch(
-                        query=dummy_vector,
-                        filter=Filter(
-                        must=[
-                            FieldCondition(
-                                key="parent_asin",
-                                match=MatchValue(value=product_id)
-                            )
-                        ]
-                    ),
-                        using="text-embedding-3-small",
-                        limit=20
-                    )
-                ],
-                query=FusionQuery(fusion="rrf"),
-                limit=1,
-            ).points[0].payload
-
-            product_image_url = payload.get("image")
-            price = payload.get("price")
-            currency = 'USD'
-        
-            # Check if item already exists
-            check_query = """
-                SELECT id, quantity, price 
-                FROM shopping_carts.shopping_cart_items 
-                WHERE user_id = %s AND shopping_cart_id = %s AND product_id = %s
-            """
-            cursor.execute(check_query, (user_id, cart_id, product_id))
-            existing_item = cursor.fetchone()
-            
-            if existing_item:
-                # Update existing item
-                new_quantity = existing_item['quantity'] + quantity
-                
-                update_query = """
-                    UPDATE shopping_carts.shopping_cart_items 
-                    SET 
-                        quantity = %s,
-                        price = %s,
-                        currency = %s,
-                        product_image_url = COALESCE(%s, product_image_url)
-                    WHERE user_id = %s AND shopping_cart_id = %s AND product_id = %s
-                    RETURNING id, quantity, price
-                """
-                
-                cursor.execute(update_query, (new_quantity, price, currency, product_image_url, user_id, cart_id, product_id))
-            
-            else:
-                # Insert new item
-                insert_query = """
-                    INSERT INTO shopping_carts.shopping_cart_items (
-                        user_id, shopping_cart_id, product_id,
-                        price, quantity, currency, product_image_url
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id, quantity, price
-                """
-                
-                cursor.execute(insert_query, (user_id, cart_id, product_id, price, quantity, currency, product_image_url))
-            
-    return f"Added {items} to the shopping cart."
+    return f"Added items to the shopping cart: {results}"
 
 
 # Get shopping cart tool
@@ -312,29 +380,36 @@ def get_shopping_cart(user_id: str, cart_id: str) -> list[dict]:
         List of dictionaries containing cart items
     """
     
-    conn = psycopg2.connect(
-        host="postgres",
-        port=5432,
-        database="tools_database",
-        user="langraph_user",
-        password="langraph_password"
-    )
-    conn.autocommit = True
+    return [dict(item) for item in get_cart_snapshot(user_id, cart_id)["items"]]
+
+
+def _load_cart_snapshot(user_id: str, cart_id: str) -> dict:
+
+    with get_connection() as conn, conn.cursor() as cursor:
+        with observe_latency(POSTGRES_LATENCY, query="cart_select"):
+            cursor.execute(CART_SELECT_QUERY, (user_id, cart_id))
+            rows = cursor.fetchall()
 
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+    items = [
+        {**row, "total_price": row['price'] * row['quantity'] if row['price'] is not None else None}
+        for row in rows
+    ]
 
-        query = """
-                SELECT 
-                    product_id, price, quantity,
-                    currency, product_image_url,
-                    (price * quantity) as total_price
-                FROM shopping_carts.shopping_cart_items 
-                WHERE user_id = %s AND shopping_cart_id = %s
-                ORDER BY added_at DESC
-            """
-        cursor.execute(query, (user_id, cart_id))
+    return {
+        "items": items,
+        "item_count": sum(item['quantity'] for item in items),
+        "cart_total": sum(item['total_price'] for item in items if item['total_price'] is not None)
+    }
 
-        return [dict(row) for row in cursor.fetchall()]
+
+def get_cart_snapshot(user_id: str, cart_id: str) -> dict:
+    """Cart items with their line totals, the number of units and the cart total.
+
+    Served from the per-process cart cache when it is in sync, the cart tools
+    invalidate it on every write.
+    """
+
+    return cart_cache.get_or_load(user_id, cart_id, lambda: _load_cart_snapshot(user_id, cart_id))
 
 
 # Remove from shopping cart.
@@ -356,28 +431,38 @@ def remove_from_shopping_cart(product_id: str, user_id: str, cart_id: str) -> st
         True if item was removed, False if item wasn't found
     """
     
-    conn = psycopg2.connect(
-        host="postgres",
-        port=5432,
-        database="tools_database",
-        user="langraph_user",
-        password="langraph_password"
-    )
-    conn.autocommit = True
-
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+    with get_connection() as conn, conn.cursor() as cursor:
+        with observe_latency(POSTGRES_LATENCY, query="cart_item_delete"):
+            cursor.execute(CART_DELETE_QUERY, (user_id, cart_id, product_id))
+            removed = cursor.rowcount > 0
 
-        query = """
-                DELETE FROM shopping_carts.shopping_cart_items
-                WHERE user_id = %s AND shopping_cart_id = %s AND product_id = %s
-            """
-        cursor.execute(query, (user_id, cart_id, product_id))
+    cart_cache.invalidate(user_id, cart_id)
 
-        return cursor.rowcount > 0
+    return removed
 
 
 ### Warehouse Manager Agent Tools
 
+def _get_availability_matrix(product_ids: list[str]) -> tuple[list[dict], np.ndarray]:
+    """Warehouses ordered by id, and their warehouses x products matrix of available quantities."""
+
+    # warehouses x items matrix of available quantities, from the in-process
+    # snapshot when it is recent enough, otherwise from Postgres
+    if config.INVENTORY_SNAPSHOT_ENABLED and inventory_snapshot.is_fresh(config.INVENTORY_SNAPSHOT_MAX_STALENESS_SECONDS):
+        INVENTORY_READS.labels(source="snapshot").inc()
+        warehouses, available = inventory_snapshot.availability(product_ids)
+    else:
+        INVENTORY_READS.labels(source="database").inc()
+        with get_connection() as conn, conn.cursor() as cursor:
+            with observe_latency(POSTGRES_LATENCY, query="inventory_availability_matrix"):
+                cursor.execute(INVENTORY_AVAILABILITY_QUERY, (product_ids,))
+                warehouses = cursor.fetchall()
+
+        available = np.array([warehouse['available'] for warehouse in warehouses], dtype=np.int64).reshape(len(warehouses), len(product_ids))
+
+    return warehouses, available
+
+
 def check_warehouse_availability(items: list[dict]) -> dict:
 
     """Check availability of items across warehouses, including partial fulfillment options.
@@ -394,126 +479,147 @@ def check_warehouse_availability(items: list[dict]) -> dict:
         - details: detailed breakdown per warehouse with availability for each item
     """
     
-    conn = psycopg2.connect(
-        host="postgres",
-        port=5432,
-        database="tools_database",
-        user="langraph_user",
-        password="langraph_password"
-    )
-    
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            result = {
-                "can_fulfill_completely": False,
-                "warehouses_full_fulfillment": [],
-                "warehouses_partial_fulfillment": [],
-                "unavailable_items": [],
-                "details": []
-            }
-            
-            # Check each warehouse for availability
-            warehouse_query = """
-                SELECT DISTINCT warehouse_id, warehouse_name, warehouse_location
-                FROM warehouses.inventory
-            """
-            cursor.execute(warehouse_query)
-            warehouses = cursor.fetchall()
-            
-            for warehouse in warehouses:
-                warehouse_can_fulfill_all = True
-                has_any_availability = False
-                warehouse_details = {
-                    "warehouse_id": warehouse['warehouse_id'],
-                    "warehouse_name": warehouse['warehouse_name'],
-                    "warehouse_location": warehouse['warehouse_location'],
-                    "items": [],
-                    "can_fulfill_all": False,
-                    "has_partial": False
+    product_ids = [item['product_id'] for item in items]
+    requested = np.array([item['quantity'] for item in items], dtype=np.int64)
+
+    warehouses, available = _get_availability_matrix(product_ids)
+
+    fulfills_item = available >= requested
+    can_fulfill_all = fulfills_item.all(axis=1)
+    has_any_availability = (available > 0).any(axis=1)
+
+    total_available = available.sum(axis=0)
+
+    result = {
+        "can_fulfill_completely": False,
+        "warehouses_full_fulfillment": [],
+        "warehouses_partial_fulfillment": [],
+        "unavailable_items": [],
+        "details": []
+    }
+
+    for row, warehouse in enumerate(warehouses):
+        warehouse_summary = {
+            "warehouse_id": warehouse['warehouse_id'],
+            "warehouse_name": warehouse['warehouse_name'],
+            "warehouse_location": warehouse['warehouse_location']
+        }
+
+        warehouse_details = {
+            **warehouse_summary,
+            "items": [
+                {
+                    "product_id": product_id,
+                    "requested": item['quantity'],
+                    "available": available_qty,
+                    "can_fulfill_completely": available_qty >= item['quantity'],
+                    "can_fulfill_partially": available_qty > 0 and available_qty < item['quantity']
                 }
-                
-                for item in items:
-                    product_id = item['product_id']
-                    requested_quantity = item['quantity']
-                    
-                    # Check availability in this warehouse
-                    availability_query = """
-                        SELECT product_id, total_quantity, reserved_quantity, available_quantity
-                        FROM warehouses.inventory
-                        WHERE warehouse_id = %s AND product_id = %s
-                    """
-                    cursor.execute(availability_query, (warehouse['warehouse_id'], product_id))
-                    inventory = cursor.fetchone()
-                    
-                    available_qty = inventory['available_quantity'] if inventory else 0
-                    
-                    item_detail = {
-                        "product_id": product_id,
-                        "requested": requested_quantity,
-                        "available": available_qty,
-                        "can_fulfill_completely": available_qty >= requested_quantity,
-                        "can_fulfill_partially": available_qty > 0 and available_qty < requested_quantity
-                    }
-                    
-                    warehouse_details["items"].append(item_detail)
-                    
-                    # Track if warehouse can fulfill this item completely
-                    if available_qty < requested_quantity:
-                        warehouse_can_fulfill_all = False
-                    
-                    # Track if warehouse has any availability for any item
-                    if available_qty > 0:
-                        has_any_availability = True
-                
-                # Categorize warehouse
-                if warehouse_can_fulfill_all:
-                    warehouse_details["can_fulfill_all"] = True
-                    result["warehouses_full_fulfillment"].append({
-                        "warehouse_id": warehouse['warehouse_id'],
-                        "warehouse_name": warehouse['warehouse_name'],
-                        "warehouse_location": warehouse['warehouse_location']
-                    })
-                elif has_any_availability:
-                    warehouse_details["has_partial"] = True
-                    result["warehouses_partial_fulfillment"].append({
-                        "warehouse_id": warehouse['warehouse_id'],
-                        "warehouse_name": warehouse['warehouse_name'],
-                        "warehouse_location": warehouse['warehouse_location']
-                    })
-                
-                result["details"].append(warehouse_details)
-            
-            # Check if any items cannot be fulfilled from any warehouse
-            for item in items:
-                product_id = item['product_id']
-                requested_quantity = item['quantity']
-                
-                # Get total available quantity across all warehouses
-                total_available_query = """
-                    SELECT product_id, SUM(available_quantity) as total_available
-                    FROM warehouses.inventory
-                    WHERE product_id = %s
-                    GROUP BY product_id
-                """
-                cursor.execute(total_available_query, (product_id,))
-                total_available = cursor.fetchone()
-                
-                total_available_qty = total_available['total_available'] if total_available else 0
-                
-                if total_available_qty < requested_quantity:
-                    result["unavailable_items"].append({
-                        "product_id": product_id,
-                        "requested": requested_quantity,
-                        "total_available_across_warehouses": total_available_qty,
-                        "shortage": requested_quantity - total_available_qty
-                    })
-            
-            result["can_fulfill_completely"] = len(result["warehouses_full_fulfillment"]) > 0 and len(result["unavailable_items"]) == 0
-            
-            return result
-            
-    finally:
-        conn.close()
+                for product_id, item, available_qty in zip(product_ids, items, available[row].tolist())
+            ],
+            "can_fulfill_all": False,
+            "has_partial": False
+        }
+
+        # Categorize warehouse
+        if can_fulfill_all[row]:
+            warehouse_details["can_fulfill_all"] = True
+            result["warehouses_full_fulfillment"].append(warehouse_summary)
+        elif has_any_availability[row]:
+            warehouse_details["has_partial"] = True
+            result["warehouses_partial_fulfillment"].append(warehouse_summary)
+
+        result["details"].append(warehouse_details)
+
+    # Items that cannot be fulfilled even when combining all warehouses
+    for item, total_available_qty in zip(items, total_available.tolist()):
+        if total_available_qty < item['quantity']:
+            result["unavailable_items"].append({
+                "product_id": item['product_id'],
+                "requested": item['quantity'],
+                "total_available_across_warehouses": total_available_qty,
+                "shortage": item['quantity'] - total_available_qty
+            })
+
+    result["can_fulfill_completely"] = len(result["warehouses_full_fulfillment"]) > 0 and len(result["unavailable_items"]) == 0
+
+    return result
+
+
+def plan_warehouse_allocation(items: list[dict], user_location: str = "") -> dict:
+
+    """Plan which warehouses to reserve items from, using as few warehouses as possible and preferring the closest ones.
+    
+    Args:
+        items: A list of items to allocate. Each item is a dictionary with keys: product_id, quantity.
+        user_location: Optional location of the user, for example "Berlin, Germany". Leave empty if unknown.
+        
+    Returns:
+        A dictionary containing:
+        - can_fulfill_completely: bool indicating if the full quantity of every item is allocated
+        - reservations: list of reservations that can be passed directly to reserve_warehouse_items
+        - shipments: the warehouses used, with their distance to the user and the items shipped from each
+        - unfulfilled_items: list of items that cannot be fully allocated, with the shortage
+    """
+
+    # Repeated product ids are allocated as one line
+    quantities = {}
+    for item in items:
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+
+    product_ids = list(quantities)
+    requested = np.array(list(quantities.values()), dtype=np.int64)
+
+    warehouses, available = _get_availability_matrix(product_ids)
+    distances = np.array(
+        [location_distance_km(user_location, warehouse['warehouse_location']) for warehouse in warehouses],
+        dtype=np.float64
+    )
+
+    allocation, method = allocate(available, requested, distances)
+    allocated = allocation.sum(axis=0)
+
+    result = {
+        "can_fulfill_completely": bool((allocated >= requested).all()),
+        "reservations": [],
+        "shipments": [],
+        "unfulfilled_items": [],
+        "method": method
+    }
+
+    # Closest warehouses first
+    for row in np.argsort(distances, kind="stable"):
+        if not allocation[row].any():
+            continue
+
+        warehouse = warehouses[row]
+        shipped = [
+            {"product_id": product_id, "quantity": quantity}
+            for product_id, quantity in zip(product_ids, allocation[row].tolist())
+            if quantity > 0
+        ]
+
+        result["reservations"].extend(
+            {"warehouse_id": warehouse['warehouse_id'], **line} for line in shipped
+        )
+        result["shipments"].append({
+            "warehouse_id": warehouse['warehouse_id'],
+            "warehouse_name": warehouse['warehouse_name'],
+            "warehouse_location": warehouse['warehouse_location'],
+            "distance_km": float(distances[row]) if user_location else None,
+            "items": shipped
+        })
+
+    for product_id, requested_qty, allocated_qty in zip(product_ids, requested.tolist(), allocated.tolist()):
+        if allocated_qty < requested_qty:
+            result["unfulfilled_items"].append({
+                "product_id": product_id,
+                "requested": requested_qty,
+                "allocated": allocated_qty,
+                "shortage": requested_qty - allocated_qty
+            })
+
+    return result
 
 
 # Reserve warehouse items.
@@ -534,76 +640,67 @@ def reserve_warehouse_items(reservations: list[dict]) -> dict:
         - failed_items: list of items that could not be reserved
     """
     
-    conn = psycopg2.connect(
-        host="postgres",
-        port=5432,
-        database="tools_database",
-        user="langraph_user",
-        password="langraph_password"
-    )
-    conn.autocommit = False  # Use transaction
-    
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            result = {
-                "success": False,
-                "reserved_items": [],
-                "failed_items": []
-            }
-            
-            for reservation in reservations:
-                warehouse_id = reservation['warehouse_id']
-                product_id = reservation['product_id']
-                quantity = reservation['quantity']
-                
-                # Check and lock the inventory row
-                check_query = """
-                    SELECT warehouse_id, product_id, warehouse_name, warehouse_location, 
-                           total_quantity, reserved_quantity, available_quantity
-                    FROM warehouses.inventory
-                    WHERE warehouse_id = %s AND product_id = %s
-                    FOR UPDATE
-                """
-                cursor.execute(check_query, (warehouse_id, product_id))
-                inventory = cursor.fetchone()
-                
-                if inventory and inventory['available_quantity'] >= quantity:
-                    # Update inventory to reserve the items
-                    update_query = """
-                        UPDATE warehouses.inventory
-                        SET reserved_quantity = reserved_quantity + %s
-                        WHERE warehouse_id = %s AND product_id = %s
-                    """
-                    cursor.execute(update_query, (quantity, warehouse_id, product_id))
-                    
-                    result["reserved_items"].append({
-                        "product_id": product_id,
-                        "quantity": quantity,
-                        "warehouse_id": warehouse_id,
-                        "warehouse_name": inventory['warehouse_name'],
-                        "warehouse_location": inventory['warehouse_location']
-                    })
-                else:
-                    result["failed_items"].append({
-                        "product_id": product_id,
-                        "warehouse_id": warehouse_id,
-                        "requested": quantity,
-                        "available": inventory['available_quantity'] if inventory else 0,
-                        "reason": "insufficient_stock" if inventory else "not_in_warehouse"
-                    })
-            
-            # Only commit if all items were successfully reserved
-            if len(result["failed_items"]) == 0:
-                conn.commit()
-                result["success"] = True
+    result = {
+        "success": False,
+        "reserved_items": [],
+        "failed_items": []
+    }
+
+    if not reservations:
+        result["success"] = True
+        return result
+
+    keys = sorted({(reservation['warehouse_id'], reservation['product_id']) for reservation in reservations})
+
+    # The pooled connection runs everything below in one transaction
+    with get_connection() as conn, conn.cursor() as cursor:
+        with observe_latency(POSTGRES_LATENCY, query="inventory_lock"):
+            cursor.execute(INVENTORY_LOCK_QUERY, ([key[0] for key in keys], [key[1] for key in keys]))
+            inventory = {(row['warehouse_id'], row['product_id']): row for row in cursor.fetchall()}
+
+        # Check lines in the order given, a repeated line sees what earlier lines took
+        available = {key: row['available_quantity'] for key, row in inventory.items()}
+        increments = {}
+
+        for reservation in reservations:
+            key = (reservation['warehouse_id'], reservation['product_id'])
+            quantity = reservation['quantity']
+            row = inventory.get(key)
+
+            if row and available[key] >= quantity:
+                available[key] -= quantity
+                increments[key] = increments.get(key, 0) + quantity
+
+                result["reserved_items"].append({
+                    "product_id": reservation['product_id'],
+                    "quantity": quantity,
+                    "warehouse_id": reservation['warehouse_id'],
+                    "warehouse_name": row['warehouse_name'],
+                    "warehouse_location": row['warehouse_location']
+                })
             else:
-                conn.rollback()
-                result["success"] = False
-            
-            return result
-            
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
\ No newline at end of file
+                result["failed_items"].append({
+                    "product_id": reservation['product_id'],
+                    "warehouse_id": reservation['warehouse_id'],
+                    "requested": quantity,
+                    "available": available[key] if row else 0,
+                    "reason": "insufficient_stock" if row else "not_in_warehouse"
+                })
+
+        # All or nothing, only apply the increments if every line fits
+        if len(result["failed_items"]) == 0:
+            with observe_latency(POSTGRES_LATENCY, query="inventory_reserve"):
+                cursor.execute(INVENTORY_RESERVE_QUERY, (
+                    [key[0] for key in increments],
+                    [key[1] for key in increments],
+                    list(increments.values())
+                ))
+            conn.commit()
+            result["success"] = True
+        else:
+            # Nothing was written, committing only releases the row locks and,
+            # unlike a rollback, keeps the connection's prepared statements
+            conn.commit()
+            result["success"] = False
+
+    return result
@@ -1,10 +1,24 @@
 import yaml
+from functools import lru_cache
 from jinja2 import Template
-from langsmith import Client
 
 
-ls_client = Client()
+_ls_client = None
 
+
+def _get_ls_client():
+    # Only prompt_template_registry needs it, building one at import slowed every start
+    global _ls_client
+
+    if _ls_client is None:
+        from langsmith import Client
+
+        _ls_client = Client()
+    return _ls_client
+
+
+# Compiled once per file and key, every agent step used to re-read and re-parse the YAML
+@lru_cache(maxsize=None)
 def prompt_template_config(yaml_file, prompt_key):
 
     with open(yaml_file, 'r') as file:
@@ -18,7 +32,7 @@ def prompt_template_config(yaml_file, prompt_key):
 
 def prompt_template_registry(prompt_name):
 
-    template_content = ls_client.pull_prompt(prompt_name).messages[0].prompt.template
+    template_content = _get_ls_client().pull_prompt(prompt_name).messages[0].prompt.template
 
     template = Template(template_content)
 
@@ -2,6 +2,7 @@ import ast
 import inspect
 from typing import Dict, Any
 from langchain_core.messages import AIMessage
+from langgraph.config import get_stream_writer
 
 
 #### FORMAT AI MESSAGE ####
@@ -29,6 +30,37 @@ def format_ai_message(response):
     return ai_message
 
 
+#### PROGRESS EVENTS ####
+
+TOOL_PROGRESS_MESSAGES = {
+    "get_formatted_items_context": "Looking for items: {query}.",
+    "get_formatted_reviews_context": "Fetching user reviews...",
+    "add_to_shopping_cart": "Adding items to the shopping cart...",
+    "remove_from_shopping_cart": "Removing items from the shopping cart...",
+    "get_shopping_cart": "Fetching the shopping cart...",
+    "check_warehouse_availability": "Checking warehouse availability...",
+    "plan_warehouse_allocation": "Planning which warehouses to ship from...",
+    "reserve_warehouse_items": "Reserving items in the warehouses...",
+}
+
+
+def emit_progress(message: str):
+    """Send a progress event to the custom stream of the running graph, no-op outside a graph run."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"type": "progress", "message": message})
+
+
+def tool_calls_to_text(tool_calls) -> str:
+    messages = []
+    for tool_call in tool_calls:
+        template = TOOL_PROGRESS_MESSAGES.get(tool_call.name, f"Unknown tool: {tool_call.name}.")
+        messages.append(template.format(query=tool_call.arguments.get("query", "")))
+    return " ".join(messages)
+
+
 #### TOOL DESCRIPTION PARSING ####
 
 def parse_function_definition(function_def: str) -> Dict[str, Any]:
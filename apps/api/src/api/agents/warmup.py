@@ -0,0 +1,154 @@
+import asyncio
+import glob
+import time
+
+import yaml
+from langsmith import tracing_context
+
+from api.core.config import config
+from api.core.metrics import WARMUP_STEP_DURATION, WORKERS_READY
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+# Same relative paths as the agents use, so the cached templates are the ones they hit
+PROMPT_FILES = "api/agents/prompts/*.yaml"
+
+
+#### Steps
+
+def warm_prompts() -> None:
+    from api.agents.utils.prompt_management import prompt_template_config
+
+    for yaml_file in sorted(glob.glob(PROMPT_FILES)):
+        with open(yaml_file, "r") as file:
+            prompt_keys = yaml.safe_load(file)["prompts"].keys()
+        for prompt_key in prompt_keys:
+            prompt_template_config(yaml_file, prompt_key)
+
+
+def warm_graph() -> None:
+    # Importing the graph parses the tool docstrings into their descriptions,
+    # the compiled graph and its checkpointer pool are kept for the requests
+    from api.agents.graph import get_graph
+
+    get_graph()
+
+
+def warm_clients() -> None:
+    """Import the LLM, embedding and Qdrant SDKs the app defers, and check the Qdrant server version once."""
+
+    from api.agents.agents import get_llm_client
+
+    get_llm_client()
+    import openai  # noqa: F401 -- preloads the SDK get_embedding imports on first use
+    from qdrant_client import QdrantClient
+
+    # Only warns when the server is unreachable or incompatible
+    QdrantClient(url=config.QDRANT_URL)
+
+
+def warm_postgres() -> None:
+    from api.core.db import get_connection, get_checkpointer_pool
+
+    with get_connection() as conn:
+        conn.execute("SELECT 1")
+    with get_checkpointer_pool().connection() as conn:
+        conn.execute("SELECT 1")
+
+
+def warm_langsmith() -> None:
+    from api.api.processors.feedback_queue import feedback_queue
+    from api.core.tracing import get_tracing_client
+
+    feedback_queue.get_client()
+    get_tracing_client()
+
+
+def warm_retrieval() -> None:
+    """One hybrid search end to end: OpenAI embedding, Qdrant dense and BM25 prefetch, fusion."""
+
+    from api.agents.tools import retrieve_items_data
+
+    # Not worth a trace in LangSmith
+    with tracing_context(enabled=False):
+        retrieve_items_data("wireless headphones", k=1)
+
+
+def default_steps() -> list:
+    """(name, function, required for readiness) in run order."""
+
+    steps = [
+        ("prompts", warm_prompts, True),
+        ("graph", warm_graph, True),
+        ("clients", warm_clients, True),
+        ("postgres", warm_postgres, True),
+        ("langsmith", warm_langsmith, False),
+    ]
+    # Costs one embedding call per worker start
+    if config.WARMUP_RETRIEVAL_ENABLED:
+        steps.append(("retrieval", warm_retrieval, False))
+    return steps
+
+
+class Warmup:
+    """Preloads what the first requests would otherwise pay for, and tells /ready when the worker is warm.
+
+    Failing optional steps are reported but do not hold readiness back, a
+    failing required step is retried every WARMUP_RETRY_SECONDS.
+    """
+
+    def __init__(self, steps: list = None):
+        self.steps = steps
+        self.ready = False
+        self.attempts = 0
+        self.results = {}
+
+    def run(self) -> bool:
+        """Run every step once, returns whether all required steps succeeded."""
+
+        self.attempts += 1
+        ok = True
+
+        for name, step, required in self.steps if self.steps is not None else default_steps():
+            start = time.perf_counter()
+            try:
+                step()
+                error = None
+            except Exception as e:
+                error = str(e)
+                ok = ok and not required
+            duration = time.perf_counter() - start
+
+            self.results[name] = {"ok": error is None, "required": required, "seconds": round(duration, 3), "error": error}
+            WARMUP_STEP_DURATION.labels(step=name).set(duration)
+            if error:
+                logger.warning(f"Warm-up step {name} failed after {duration:.2f}s: {error}")
+
+        timings = ", ".join(f"{name} {result['seconds']:.2f}s" for name, result in self.results.items())
+        logger.info(f"Warm-up attempt {self.attempts} {'finished' if ok else 'incomplete'}: {timings}")
+        return ok
+
+    async def run_until_ready(self) -> None:
+        """Background task for the API process, the worker reports ready once it returns."""
+
+        while not await asyncio.to_thread(self.run):
+            await asyncio.sleep(config.WARMUP_RETRY_SECONDS)
+        self.mark_ready()
+
+    def mark_ready(self) -> None:
+        if not self.ready:
+            self.ready = True
+            WORKERS_READY.inc()
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "attempts": self.attempts, "steps": self.results}
+
+
+warmup = Warmup()
@@ -1,11 +1,24 @@
-from fastapi import Request, APIRouter
-from fastapi.responses import StreamingResponse
+from contextlib import aclosing
 
+from fastapi import Request, APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from pydantic import ValidationError
 
-from api.api.models import RAGRequest, RAGResponse, RAGUsedContext, FeedbackRequest, FeedbackResponse
+
+from api.api.models import RAGRequest, RAGResponse, RAGUsedContext, FeedbackRequest, FeedbackResponse, AgentSocketMessage
 # from api.agents.graph import rag_agent_wrapper
 from api.agents.graph import rag_agent_stream_wrapper
 from api.api.processors.submit_feedback import submit_feedback
+from api.core.admission import admission_controller, AdmissionRejected
+from api.core.metrics import metrics_payload, SSE_STREAM_DURATION, AGENT_STREAM_TURNS, AGENT_WEBSOCKETS_OPEN
+from api.core.stream_log import stream_log
+from api.core.events import sse_stream, ndjson_stream, to_frame
+from api.core.deadline import start_deadline
+from api.core.usage import start_ledger
+from api.core.config import config
+from api.agents.warmup import warmup
+
+import time
 
 import logging
 
@@ -17,16 +30,122 @@ logger = logging.getLogger(__name__)
 
 rag_router = APIRouter()
 feedback_router = APIRouter()
+metrics_router = APIRouter()
+health_router = APIRouter()
+
+
+def _observe_stream_duration(stream):
+    start = time.perf_counter()
+    try:
+        yield from stream
+    finally:
+        SSE_STREAM_DURATION.observe(time.perf_counter() - start)
+
+
+async def _start_turn(query: str, thread_id: str, timeout_seconds: float = None):
+    """Admit a turn and start it in the background, returns its events. Raises AdmissionRejected."""
+
+    # Copied into the background run with the rest of the context
+    start_deadline(min(timeout_seconds or config.AGENT_DEADLINE_SECONDS, config.AGENT_MAX_DEADLINE_SECONDS))
+    start_ledger()
+    ticket = await admission_controller.admit(thread_id)
+    # The run goes on if the client drops, it can resume from the event log
+    run = await stream_log.start(
+        thread_id,
+        ticket.guard(_observe_stream_duration(rag_agent_stream_wrapper(query, thread_id))),
+        on_done=ticket.release
+    )
+    return stream_log.tail(run)
+
+
+def _wants_ndjson(request: Request) -> bool:
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+def _stream_response(request: Request, events) -> StreamingResponse:
+    """Events as SSE, or as NDJSON when the client accepts application/x-ndjson."""
+
+    # Proxies buffer responses unless told otherwise, which holds the events back
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if _wants_ndjson(request):
+        return StreamingResponse(ndjson_stream(events), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(sse_stream(events), media_type="text/event-stream", headers=headers)
+
 
 @rag_router.post("/")
-def rag(
+async def rag(
     request: Request,
     payload: RAGRequest
 ) -> StreamingResponse:
-    return StreamingResponse(
-        rag_agent_stream_wrapper(payload.query,  payload.thread_id),
-        media_type="text/event-stream"
-    )
+    try:
+        events = await _start_turn(payload.query, payload.thread_id, payload.timeout_seconds)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": f"Agent is busy ({e.reason}), retry later"},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    AGENT_STREAM_TURNS.labels(transport="ndjson" if _wants_ndjson(request) else "sse").inc()
+    return _stream_response(request, events)
+
+@rag_router.get("/{thread_id}/stream")
+async def resume_rag(
+    request: Request,
+    thread_id: str
+) -> StreamingResponse:
+    events = await stream_log.resume(thread_id, request.headers.get("Last-Event-ID"))
+    if events is None:
+        return JSONResponse(status_code=404, content={"detail": "No agent run to resume for this thread"})
+    return _stream_response(request, events)
+
+@rag_router.websocket("/{thread_id}/ws")
+async def rag_socket(
+    websocket: WebSocket,
+    thread_id: str
+) -> None:
+    """Many turns of one thread over one connection.
+
+    Each text message ({"query": ...}, or {"last_event_id": ...} to resume
+    the latest turn) is answered with the events of that turn as JSON
+    frames, then an "end" frame, after which the next message is read.
+    """
+
+    await websocket.accept()
+    AGENT_WEBSOCKETS_OPEN.inc()
+    try:
+        while True:
+            try:
+                message = AgentSocketMessage.model_validate_json(await websocket.receive_text())
+            except ValidationError:
+                await _send_error(websocket, 'Invalid message, expected {"query": ...} or {"last_event_id": ...}')
+                continue
+
+            if message.query is not None:
+                try:
+                    events = await _start_turn(message.query, thread_id, message.timeout_seconds)
+                    AGENT_STREAM_TURNS.labels(transport="websocket").inc()
+                except AdmissionRejected as e:
+                    await _send_error(websocket, f"Agent is busy ({e.reason}), retry later", retry_after=e.retry_after)
+                    continue
+            else:
+                events = await stream_log.resume(thread_id, message.last_event_id)
+                if events is None:
+                    await _send_error(websocket, "No agent run to resume for this thread")
+                    continue
+
+            async with aclosing(events):
+                async for event_id, event in events:
+                    await websocket.send_text(to_frame(event_id, event))
+            await websocket.send_text(to_frame(None, {"type": "end", "data": {}}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        AGENT_WEBSOCKETS_OPEN.dec()
+
+async def _send_error(websocket: WebSocket, detail: str, **data) -> None:
+    # Ends the turn like "end" does, the client can send its next message
+    await websocket.send_text(to_frame(None, {"type": "error", "data": {"detail": detail, **data}}))
 
 @feedback_router.post("/")
 def send_feedback(
@@ -36,9 +155,26 @@ def send_feedback(
     submit_feedback(payload.trace_id, payload.feedback_score, payload.feedback_text, payload.feedback_source_type)
     return FeedbackResponse(
         request_id=request.state.request_id,
-        status="success"
+        status="queued"
     )
 
+@metrics_router.get("/metrics")
+def metrics() -> Response:
+    content, content_type = metrics_payload()
+    return Response(content=content, media_type=content_type)
+
+@health_router.get("/live")
+def live() -> dict:
+    return {"status": "alive"}
+
+@health_router.get("/ready")
+def ready() -> JSONResponse:
+    # Per worker: whichever worker takes the probe answers for itself
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 api_router = APIRouter()
 api_router.include_router(rag_router, prefix="/agent", tags=["agent"])
-api_router.include_router(feedback_router, prefix="/submit_feedback", tags=["submit_feedback"])
\ No newline at end of file
+api_router.include_router(feedback_router, prefix="/submit_feedback", tags=["submit_feedback"])
+api_router.include_router(metrics_router, tags=["metrics"])
+api_router.include_router(health_router, tags=["health"])
\ No newline at end of file
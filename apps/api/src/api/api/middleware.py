@@ -1,23 +1,61 @@
-from http.client import REQUEST_HEADER_FIELDS_TOO_LARGE
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+import time
 import uuid
+
+from langsmith import tracing_context
+
+from api.core.request_context import request_id_var, is_valid_request_id
+from api.core.tracing import get_tracing_client
+
 import logging
 
 logger = logging.getLogger(__name__)
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """Middleware that adds a unique request ID to each request."""
 
-    async def dispatch(self, request: Request, call_next):
+class RequestIDMiddleware:
+    """Pure ASGI middleware that gives each request a unique ID.
+
+    The caller's X-Request-ID is reused when it is a sane value, otherwise a
+    UUID is generated. The ID is set in `request_id_var` for the whole request
+    (log records, LangSmith run metadata, outbound calls), stored in
+    `request.state.request_id` and returned in the X-Request-ID header.
+    Response messages, SSE chunks included, are passed through as they come.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_id = _incoming_request_id(scope) or str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        request_id_header = (b"x-request-id", request_id.encode("latin-1"))
+        status = None
 
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        logger.info(f"Request started: {request.method} {request.url.path} (request_id: {request_id:})")
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), request_id_header]}
+            await send(message)
 
-        response = await call_next(request)
+        token = request_id_var.set(request_id)
+        logger.info(f"Request started: {scope.get('method', 'WEBSOCKET')} {scope['path']}")
+        try:
+            # The route picks the trace sampling rate
+            with tracing_context(client=get_tracing_client(), metadata={"request_id": request_id, "route": scope["path"]}):
+                await self.app(scope, receive, send_with_request_id)
+        finally:
+            logger.info(f"Request completed: {scope.get('method', 'WEBSOCKET')} {scope['path']} {status} in {time.perf_counter() - start:.3f}s")
+            request_id_var.reset(token)
 
-        response.headers["X-Request-ID"] = request_id
-        logger.info(f"Request completed: {request.method} {request.url.path} (request_id: {request_id})")
 
-        return response
\ No newline at end of file
+def _incoming_request_id(scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            request_id = value.decode("latin-1")
+            return request_id if is_valid_request_id(request_id) else None
+    return None
\ No newline at end of file
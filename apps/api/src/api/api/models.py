@@ -1,12 +1,21 @@
 from pydoc import describe
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 from typing import Optional, Union
+from uuid import UUID
 
 
 class RAGRequest(BaseModel):
     query: str = Field (..., description="The query is used in the RAG pipeline")
     thread_id: str = Field (..., description="The Thread ID")
+    timeout_seconds: Optional[float] = Field(None, gt=0, description="Time budget of the turn, the server default when missing")
+
+class AgentSocketMessage(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    query: Optional[str] = Field(None, description="Starts a turn of the thread with this query")
+    last_event_id: Optional[str] = Field(None, description="Without a query, resumes the latest turn after this event, from its start when missing")
+    timeout_seconds: Optional[float] = Field(None, gt=0, description="Time budget of the turn, the server default when missing")
 
 class RAGUsedContext(BaseModel):
     image_url: str = Field(..., description="The Url of the image of the item")
@@ -26,6 +35,13 @@ class FeedbackRequest(BaseModel):
     thread_id: str = Field(..., description="The thread ID")
     feedback_source_type: str = Field(..., description="The type of feedback. Human or API")
 
+    @field_validator("trace_id")
+    @classmethod
+    def trace_id_is_uuid(cls, value: str) -> str:
+        # Rejected here rather than by LangSmith, long after the request was acknowledged
+        UUID(value)
+        return value
+
 class FeedbackResponse(BaseModel):
     request_id: str = Field(..., description="The request ID")
     status: str = Field(..., description="The status of the feedback submission")
\ No newline at end of file
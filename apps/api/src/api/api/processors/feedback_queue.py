@@ -0,0 +1,230 @@
+import threading
+import uuid
+
+from langsmith import Client
+from langsmith.utils import LangSmithConflictError
+
+from api.core.config import config
+from api.core.db import get_checkpointer_pool
+from api.core.metrics import FEEDBACK_SUBMISSIONS, FEEDBACK_QUEUE_DEPTH, FEEDBACK_QUEUE_LAG
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+#### Queries
+
+# Lives next to the checkpoints. Sent items are deleted, items that ran out
+# of attempts keep their last error and failed_at for inspection.
+CREATE_QUEUE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS feedback_queue (
+        feedback_id UUID PRIMARY KEY,
+        trace_id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        score INTEGER,
+        value TEXT,
+        feedback_source_type TEXT NOT NULL,
+        enqueued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        failed_at TIMESTAMPTZ
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS feedback_queue_pending_idx
+    ON feedback_queue (next_attempt_at)
+    WHERE failed_at IS NULL
+    """,
+]
+
+ENQUEUE_QUERY = """
+    INSERT INTO feedback_queue (feedback_id, trace_id, key, score, value, feedback_source_type)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+# Leases a batch by pushing next_attempt_at past the lease, so an item whose
+# worker died mid-batch is picked up again once the lease runs out. SKIP
+# LOCKED lets every API worker claim from the same table.
+CLAIM_BATCH_QUERY = """
+    UPDATE feedback_queue q
+    SET next_attempt_at = now() + make_interval(secs => %s),
+        attempts = q.attempts + 1
+    FROM (
+        SELECT feedback_id
+        FROM feedback_queue
+        WHERE failed_at IS NULL AND next_attempt_at <= now()
+        ORDER BY next_attempt_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ) due
+    WHERE q.feedback_id = due.feedback_id
+    RETURNING q.feedback_id, q.trace_id, q.key, q.score, q.value, q.feedback_source_type, q.attempts
+"""
+
+DELETE_SENT_QUERY = "DELETE FROM feedback_queue WHERE feedback_id = ANY(%s)"
+
+RESCHEDULE_QUERY = """
+    UPDATE feedback_queue
+    SET next_attempt_at = now() + make_interval(secs => %s), last_error = %s
+    WHERE feedback_id = %s
+"""
+
+MARK_FAILED_QUERY = """
+    UPDATE feedback_queue
+    SET failed_at = now(), last_error = %s
+    WHERE feedback_id = %s
+"""
+
+QUEUE_STATS_QUERY = """
+    SELECT count(*) AS depth,
+           coalesce(extract(epoch FROM now() - min(enqueued_at)), 0) AS lag_seconds
+    FROM feedback_queue
+    WHERE failed_at IS NULL
+"""
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next attempt after `attempts` failed ones."""
+    return min(config.FEEDBACK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), config.FEEDBACK_RETRY_MAX_SECONDS)
+
+
+class FeedbackQueue:
+    """Durable queue of feedback items for LangSmith, stored in the checkpointer database.
+
+    `enqueue` only inserts rows, so acknowledging feedback costs one local
+    write. Every API worker runs a sender thread that claims due items in
+    batches, sends them, deletes what went through and reschedules the rest
+    with exponential backoff. Each item carries its own feedback id, so an
+    item sent twice after a lost acknowledgement is recorded once.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+
+        self._table_ready = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    #### Lifecycle
+
+    def connection(self):
+        pool = get_checkpointer_pool()
+        if not self._table_ready:
+            with pool.connection() as conn:
+                for query in CREATE_QUEUE_QUERIES:
+                    conn.execute(query)
+            self._table_ready = True
+        return pool.connection()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="feedback-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    #### Producer
+
+    def enqueue(self, items: list[dict]) -> list[str]:
+        """Store feedback items ({"trace_id", "key", "score", "value", "feedback_source_type"}) for sending, returns their feedback ids."""
+
+        feedback_ids = [uuid.uuid4() for _ in items]
+        with self.connection() as conn:
+            with conn.transaction():
+                with conn.cursor() as cur:
+                    cur.executemany(ENQUEUE_QUERY, [
+                        (feedback_id, item["trace_id"], item["key"], item.get("score"), item.get("value"), item["feedback_source_type"])
+                        for feedback_id, item in zip(feedback_ids, items)
+                    ])
+        self._wake.set()
+        return [str(feedback_id) for feedback_id in feedback_ids]
+
+    #### Sender
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                sent = self.send_batch()
+            except Exception as e:
+                logger.error(f"Feedback sender failed: {e}")
+                sent = 0
+
+            # A full batch likely means more is due, go again right away
+            if sent < config.FEEDBACK_BATCH_SIZE:
+                self._wake.wait(config.FEEDBACK_POLL_SECONDS)
+                self._wake.clear()
+
+    def send_batch(self) -> int:
+        """Claim, send and settle one batch of due items, returns how many were claimed."""
+
+        with self.connection() as conn:
+            batch = conn.execute(CLAIM_BATCH_QUERY, (config.FEEDBACK_LEASE_SECONDS, config.FEEDBACK_BATCH_SIZE)).fetchall()
+
+        sent = []
+        for item in batch:
+            try:
+                self._send(item)
+                sent.append(item["feedback_id"])
+                FEEDBACK_SUBMISSIONS.labels(outcome="sent").inc()
+            except Exception as e:
+                self._settle_failure(item, e)
+
+        with self.connection() as conn:
+            if sent:
+                conn.execute(DELETE_SENT_QUERY, (sent,))
+            self._update_gauges(conn)
+
+        return len(batch)
+
+    def get_client(self) -> Client:
+        if self.client is None:
+            self.client = Client()
+        return self.client
+
+    def _send(self, item: dict) -> None:
+        try:
+            self.get_client().create_feedback(
+                run_id=item["trace_id"],
+                key=item["key"],
+                score=item["score"],
+                value=item["value"],
+                feedback_id=item["feedback_id"],
+                feedback_source_type=item["feedback_source_type"]
+            )
+        except LangSmithConflictError:
+            # Already recorded by an earlier attempt whose acknowledgement was lost
+            pass
+
+    def _settle_failure(self, item: dict, error: Exception) -> None:
+        with self.connection() as conn:
+            if item["attempts"] >= config.FEEDBACK_MAX_ATTEMPTS:
+                conn.execute(MARK_FAILED_QUERY, (str(error), item["feedback_id"]))
+                FEEDBACK_SUBMISSIONS.labels(outcome="failed").inc()
+                logger.error(f"Giving up on feedback {item['feedback_id']} for trace {item['trace_id']} after {item['attempts']} attempts: {error}")
+            else:
+                delay = retry_delay(item["attempts"])
+                conn.execute(RESCHEDULE_QUERY, (delay, str(error), item["feedback_id"]))
+                FEEDBACK_SUBMISSIONS.labels(outcome="retried").inc()
+                logger.warning(f"Sending feedback {item['feedback_id']} failed (attempt {item['attempts']}), retrying in {delay:.1f}s: {error}")
+
+    def _update_gauges(self, conn) -> None:
+        stats = conn.execute(QUEUE_STATS_QUERY).fetchone()
+        FEEDBACK_QUEUE_DEPTH.set(stats["depth"])
+        FEEDBACK_QUEUE_LAG.set(float(stats["lag_seconds"]))
+
+
+feedback_queue = FeedbackQueue()
@@ -1,21 +1,27 @@
-from langsmith import Client
+from api.api.processors.feedback_queue import feedback_queue
 
-client = Client()
 
-def submit_feedback(trace_id: str, feedback_score: int = None, feedback_text: str = "", feedback_source_type: str = "api"):
+def submit_feedback(trace_id: str, feedback_score: int = None, feedback_text: str = "", feedback_source_type: str = "api") -> list[str]:
+    """Queue the thumbs score and the comment, whichever were given, for the background sender."""
 
-    if feedback_score:
-        client.create_feedback(
-            run_id=trace_id,
-            key="thumbs",
-            score=feedback_score,
-            feedback_source_type=feedback_source_type
-        )
+    items = []
+
+    if feedback_score is not None:
+        items.append({
+            "trace_id": trace_id,
+            "key": "thumbs",
+            "score": feedback_score,
+            "feedback_source_type": feedback_source_type
+        })
 
     if len(feedback_text) > 0:
-        client.create_feedback(
-            run_id=trace_id,
-            key="comment",
-            value=feedback_text,
-            feedback_source_type=feedback_source_type
-        )
\ No newline at end of file
+        items.append({
+            "trace_id": trace_id,
+            "key": "comment",
+            "value": feedback_text,
+            "feedback_source_type": feedback_source_type
+        })
+
+    if not items:
+        return []
+    return feedback_queue.enqueue(items)
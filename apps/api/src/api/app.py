@@ -1,5 +1,8 @@
 from api.api.middleware import RequestIDMiddleware
 from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+import asyncio
+import os
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -7,6 +10,16 @@ from api.api.endpoints import api_router
 
 
 from api.core.config import config
+from api.core.db import get_pool, close_pool
+from api.core.metrics import mark_worker_dead
+from api.core.request_context import configure_request_logging
+from api.agents.inventory_snapshot import inventory_snapshot
+from api.agents.cart_cache import cart_cache
+from api.agents.checkpoint_retention import run_retention_periodically
+from api.api.processors.feedback_queue import feedback_queue
+from api.core.stream_log import stream_log
+from api.core.tracing import flush_tracing_client
+from api.agents.warmup import warmup
 
 import logging
 
@@ -14,10 +27,52 @@ logging.basicConfig(
     level=logging.INFO,
     format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
+configure_request_logging()
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Starting API worker {os.getpid()}")
+
+    background_tasks = []
+    if config.CHECKPOINT_RETENTION_ENABLED:
+        background_tasks.append(asyncio.create_task(run_retention_periodically()))
+    if config.INVENTORY_SNAPSHOT_ENABLED:
+        inventory_snapshot.start()
+    if config.CART_CACHE_ENABLED:
+        cart_cache.start()
+    if config.FEEDBACK_WORKER_ENABLED:
+        feedback_queue.start()
+
+    # Open the tools database pool before the first request instead of on it
+    try:
+        await asyncio.to_thread(get_pool)
+    except Exception as e:
+        logger.error(f"Could not open the tools database pool: {e}")
+
+    # Liveness answers right away, readiness once the warm-up is done
+    if config.WARMUP_ENABLED:
+        background_tasks.append(asyncio.create_task(warmup.run_until_ready()))
+    else:
+        warmup.mark_ready()
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    await stream_log.stop()
+
+    inventory_snapshot.stop()
+    cart_cache.stop()
+    feedback_queue.stop()
+    await asyncio.to_thread(flush_tracing_client)
+    close_pool()
+    mark_worker_dead()
+    logger.info(f"Stopped API worker {os.getpid()}")
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(RequestIDMiddleware)
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,187 @@
+import asyncio
+import time
+
+from psycopg import errors
+from psycopg_pool import ConnectionPool
+from starlette.concurrency import iterate_in_threadpool
+
+from api.core import deadline
+from api.core.config import config
+from api.core.db import get_admission_pool
+from api.core.metrics import (
+    AGENT_ADMISSION_WAIT,
+    AGENT_ADMISSION_REJECTIONS,
+    AGENT_ADMISSION_QUEUE_DEPTH,
+    AGENT_REQUESTS_IN_FLIGHT,
+)
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+# Session-level advisory lock keyed on the thread id, held for the whole turn
+# by a connection of the admission pool. Unlocked before the connection goes
+# back to the pool, and released by Postgres with the connection when the
+# worker dies.
+THREAD_LOCK_QUERY = "SELECT pg_advisory_lock(hashtextextended(%s, 0))"
+THREAD_UNLOCK_QUERY = "SELECT pg_advisory_unlock(hashtextextended(%s, 0))"
+
+
+class AdmissionRejected(Exception):
+    """The request cannot run now, answer 429 and let the client retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """A slot, and the lock on the thread, held until the response stream ends."""
+
+    def __init__(self, controller: "AdmissionController", lock_key: str, lock_conn):
+        self.controller = controller
+        self.lock_key = lock_key
+        self.lock_conn = lock_conn
+        self.released = False
+
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        self.controller._release_slot()
+        self.controller._unlock(self.lock_key, self.lock_conn)
+
+    async def guard(self, chunks):
+        """Stream a sync generator from the threadpool, releasing the ticket once it is exhausted, fails or the client goes away."""
+
+        try:
+            async for chunk in iterate_in_threadpool(chunks):
+                yield chunk
+        finally:
+            # No awaits here, a cancelled scope would cancel them before the release
+            chunks.close()
+            self.release()
+
+
+class AdmissionController:
+    """Per worker limit on concurrent graph runs, with a bounded wait queue.
+
+    Requests past `max_in_flight` wait up to `queue_timeout` for a slot,
+    at most `max_queued` of them at once, anything beyond is rejected
+    immediately. Turns of the same thread are serialized on top of that with
+    a Postgres advisory lock, so the ordering also holds across workers.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = None,
+        max_queued: int = None,
+        queue_timeout: float = None,
+        thread_lock_timeout: float = None,
+        retry_after: int = None,
+        pool: ConnectionPool = None,
+    ):
+        self.max_in_flight = max_in_flight or config.AGENT_MAX_IN_FLIGHT
+        self.max_queued = config.AGENT_MAX_QUEUED if max_queued is None else max_queued
+        self.queue_timeout = queue_timeout or config.AGENT_QUEUE_TIMEOUT_SECONDS
+        self.thread_lock_timeout = thread_lock_timeout or config.AGENT_THREAD_LOCK_TIMEOUT_SECONDS
+        self.retry_after = retry_after or config.AGENT_RETRY_AFTER_SECONDS
+        self.pool = pool
+
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self.queued = 0
+        self.in_flight = 0
+
+    #### Admission
+
+    async def admit(self, thread_id: str) -> AdmissionTicket:
+        """Wait for a slot and for the previous turn of `thread_id`, raises AdmissionRejected instead of waiting too long."""
+
+        lock_key = f"agent_thread:{thread_id}"
+        await self._acquire_slot()
+        try:
+            lock_conn = await self._lock_thread(lock_key)
+        except BaseException:
+            self._release_slot()
+            raise
+        return AdmissionTicket(self, lock_key, lock_conn)
+
+    async def _acquire_slot(self) -> None:
+        if self._slots.locked() and self.queued >= self.max_queued:
+            self._reject("queue_full")
+
+        start = time.perf_counter()
+        self.queued += 1
+        AGENT_ADMISSION_QUEUE_DEPTH.inc()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), deadline.timeout(self.queue_timeout))
+        except TimeoutError:
+            self._reject("queue_timeout")
+        finally:
+            self.queued -= 1
+            AGENT_ADMISSION_QUEUE_DEPTH.dec()
+            AGENT_ADMISSION_WAIT.labels(stage="slot").observe(time.perf_counter() - start)
+
+        self.in_flight += 1
+        AGENT_REQUESTS_IN_FLIGHT.inc()
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        AGENT_REQUESTS_IN_FLIGHT.dec()
+        self._slots.release()
+
+    async def _lock_thread(self, lock_key: str):
+        start = time.perf_counter()
+        locking = asyncio.ensure_future(asyncio.to_thread(self._connect_and_lock, lock_key))
+        try:
+            # Shielded so a cancelled request still releases a lock acquired in the meantime
+            return await asyncio.shield(locking)
+        except errors.LockNotAvailable:
+            self._reject("thread_busy")
+        except deadline.DeadlineExceeded:
+            self._reject("deadline_exceeded")
+        except asyncio.CancelledError:
+            locking.add_done_callback(lambda locking: self._unlock_acquired(lock_key, locking))
+            raise
+        finally:
+            AGENT_ADMISSION_WAIT.labels(stage="thread").observe(time.perf_counter() - start)
+
+    def _connect_and_lock(self, lock_key: str):
+        pool = self.pool or get_admission_pool()
+        # Never waits in practice, the pool has a connection per slot
+        conn = pool.getconn()
+        try:
+            lock_timeout = deadline.timeout(self.thread_lock_timeout)
+            conn.execute("SELECT set_config('lock_timeout', %s, false)", (f"{max(int(lock_timeout * 1000), 1)}ms",))
+            conn.execute(THREAD_LOCK_QUERY, (lock_key,))
+        except BaseException:
+            pool.putconn(conn)
+            raise
+        return conn
+
+    def _unlock(self, lock_key: str, conn) -> None:
+        try:
+            conn.execute(THREAD_UNLOCK_QUERY, (lock_key,))
+        except Exception as e:
+            # Closed, the pool replaces it, and Postgres releases the lock with the session
+            logger.warning(f"Releasing the thread lock failed, dropping its connection: {e}")
+            conn.close()
+        (self.pool or get_admission_pool()).putconn(conn)
+
+    def _unlock_acquired(self, lock_key: str, locking) -> None:
+        if not locking.cancelled() and locking.exception() is None:
+            self._unlock(lock_key, locking.result())
+
+    def _reject(self, reason: str):
+        AGENT_ADMISSION_REJECTIONS.labels(reason=reason).inc()
+        logger.warning(f"Rejected /agent request: {reason} ({self.in_flight} in flight, {self.queued} queued)")
+        raise AdmissionRejected(reason, self.retry_after)
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+from api.core.metrics import CACHE_REQUESTS
+
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire `ttl_seconds` after being set.
+
+    When full, the oldest entry is evicted first. Hits and misses are counted
+    in cache_requests_total under the cache `name`.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_size: int = 10000):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys) -> dict:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                found[key] = value
+
+        hits = len(found)
+        misses = len(set(keys)) - hits
+        if hits:
+            CACHE_REQUESTS.labels(cache=self.name, result="hit").inc(hits)
+        if misses:
+            CACHE_REQUESTS.labels(cache=self.name, result="miss").inc(misses)
+        return found
+
+    def set_many(self, values: dict) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, value in values.items():
+                self._entries.pop(key, None)
+                self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set(self, key, value) -> None:
+        self.set_many({key: value})
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -5,6 +5,141 @@ class Config(BaseSettings):
     GROQ_API_KEY: str
     GOOGLE_API_KEY: str
 
+    POSTGRES_USER: str = ""
+    POSTGRES_PASSWORD: str = ""
+    POSTGRES_HOST: str = "postgres"
+    POSTGRES_PORT: int = 5432
+    POSTGRES_DB: str = ""
+
+    # Off by default, schedule `make run-checkpoint-retention` instead or
+    # enable it in the API, where one worker at a time runs a pass
+    CHECKPOINT_RETENTION_ENABLED: bool = False
+    CHECKPOINT_RETENTION_INTERVAL_SECONDS: int = 3600
+    CHECKPOINT_KEEP_LAST: int = 20
+    CHECKPOINT_TTL_DAYS: int = 30
+    CHECKPOINT_MIN_IDLE_SECONDS: int = 600
+    CHECKPOINT_RETENTION_BATCH_SIZE: int = 500
+    CHECKPOINT_RETENTION_VACUUM: bool = True
+
+    ENRICHMENT_TIMEOUT_SECONDS: float = 2.0
+
+    # Agent runs outlive their request, clients resume them from this log
+    SSE_LOG_MAX_EVENTS: int = 1000
+    SSE_LOG_MAX_RUNS: int = 1000
+    SSE_LOG_TTL_SECONDS: int = 3600
+    SSE_LOG_POLL_SECONDS: float = 0.5
+    SSE_LOG_RESUME_IDLE_TIMEOUT_SECONDS: float = 300.0
+    # Events waiting to be copied to Postgres per run, and inserted per round trip
+    SSE_LOG_WRITE_QUEUE_SIZE: int = 1000
+    SSE_LOG_WRITE_BATCH_SIZE: int = 100
+
+    # Per API worker: graph runs at once, requests allowed to wait for one
+    # and for how long, before /agent answers 429
+    AGENT_MAX_IN_FLIGHT: int = 8
+    AGENT_MAX_QUEUED: int = 32
+    AGENT_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    # Turns of one thread run one after the other, across workers
+    AGENT_THREAD_LOCK_TIMEOUT_SECONDS: float = 60.0
+    AGENT_RETRY_AFTER_SECONDS: int = 5
+
+    # End-to-end budget of an /agent turn, admission wait included. Requests
+    # can set their own, up to the max. Single dependency calls get what is
+    # left of it, capped by their own timeout.
+    AGENT_DEADLINE_SECONDS: float = 60.0
+    AGENT_MAX_DEADLINE_SECONDS: float = 300.0
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    EMBEDDING_TIMEOUT_SECONDS: float = 10.0
+    QDRANT_TIMEOUT_SECONDS: float = 5.0
+    POSTGRES_STATEMENT_TIMEOUT_SECONDS: float = 10.0
+
+    API_HOST: str = "0.0.0.0"
+    API_PORT: int = 8000
+    API_WORKERS: int = 2
+    # Development only, watches the source tree and forces a single worker
+    API_RELOAD: bool = False
+    API_LOOP: str = "uvloop"
+    API_HTTP: str = "httptools"
+    API_WS: str = "websockets"
+    # Keeps idle /agent WebSockets open through proxies with an idle timeout
+    API_WS_PING_INTERVAL_SECONDS: float = 20.0
+    # Longer than the idle timeout of the load balancer in front of the API
+    API_KEEPALIVE_TIMEOUT_SECONDS: int = 75
+    # On SIGTERM, time open requests (SSE streams included) get to finish
+    API_GRACEFUL_SHUTDOWN_TIMEOUT_SECONDS: int = 120
+
+    # /ready answers 503 until the worker preloaded prompts, graph and connections
+    WARMUP_ENABLED: bool = True
+    # One synthetic retrieval (OpenAI embedding + Qdrant hybrid search) per worker start
+    WARMUP_RETRIEVAL_ENABLED: bool = True
+    WARMUP_RETRY_SECONDS: float = 10.0
+
+    TOOLS_DB_HOST: str = "postgres"
+    TOOLS_DB_PORT: int = 5432
+    TOOLS_DB_NAME: str = "tools_database"
+    TOOLS_DB_USER: str = "langraph_user"
+    TOOLS_DB_PASSWORD: str = "langraph_password"
+
+    QDRANT_URL: str = "http://qdrant:6333"
+
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 5.0
+    DB_POOL_MAX_IDLE_SECONDS: float = 300.0
+    # Executions of the same query on a connection before it is prepared
+    # server-side. Keep it at 1 or more, the pool's empty health-check query
+    # would otherwise leak a statement per checkout. Disable behind a
+    # transaction-mode PgBouncer.
+    DB_PREPARED_STATEMENTS: bool = True
+    DB_PREPARE_THRESHOLD: int = 1
+    # Feedback queue and stream event log, in the checkpointer database
+    CHECKPOINTER_POOL_MAX_SIZE: int = 4
+    # LangGraph's checkpoints, the saver uses one connection at a time
+    SAVER_POOL_MAX_SIZE: int = 2
+
+    PRODUCT_ATTRIBUTE_CACHE_TTL_SECONDS: float = 600.0
+    PRODUCT_ATTRIBUTE_CACHE_MAX_SIZE: int = 10000
+
+    INVENTORY_SNAPSHOT_ENABLED: bool = True
+    INVENTORY_SNAPSHOT_MAX_STALENESS_SECONDS: float = 5.0
+
+    CART_CACHE_ENABLED: bool = True
+    CART_CACHE_TTL_SECONDS: float = 300.0
+    CART_CACHE_MAX_SIZE: int = 10000
+    CART_CACHE_MAX_STALENESS_SECONDS: float = 5.0
+
+    # LangSmith traces are sampled at the rate of their route (longest
+    # matching path prefix, TRACE_SAMPLE_RATE otherwise) and their runs at
+    # the rate of their run type, e.g. {"/agent": 0.1} and {"prompt": 0}.
+    # Traces with an error or slower than TRACE_SLOW_SECONDS are always kept.
+    # Turns whose trace is not sampled answer with an empty trace_id and
+    # take no feedback, so a route rate below 1.0 loses that much feedback.
+    TRACE_SAMPLE_RATE: float = 1.0
+    TRACE_ROUTE_SAMPLE_RATES: dict[str, float] = {}
+    TRACE_RUN_TYPE_SAMPLE_RATES: dict[str, float] = {}
+    TRACE_SLOW_SECONDS: float = 20.0
+    # New traces are dropped while this many run operations wait to be sent
+    TRACE_EXPORT_QUEUE_SIZE: int = 5000
+    # Traces waiting for their root run to end before they are decided
+    TRACE_MAX_BUFFERED_TRACES: int = 1000
+
+    # Feedback is queued in the checkpointer database and sent to LangSmith
+    # in the background, with exponential backoff between attempts
+    FEEDBACK_WORKER_ENABLED: bool = True
+    FEEDBACK_BATCH_SIZE: int = 50
+    FEEDBACK_POLL_SECONDS: float = 1.0
+    FEEDBACK_LEASE_SECONDS: int = 60
+    FEEDBACK_MAX_ATTEMPTS: int = 10
+    FEEDBACK_RETRY_BASE_SECONDS: float = 2.0
+    FEEDBACK_RETRY_MAX_SECONDS: float = 600.0
+
     model_config = SettingsConfigDict(env_file=".env")
 
-config = Config()
\ No newline at end of file
+    @property
+    def checkpointer_conn_string(self) -> str:
+        return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+
+    @property
+    def tools_db_conn_string(self) -> str:
+        return f"postgresql://{self.TOOLS_DB_USER}:{self.TOOLS_DB_PASSWORD}@{self.TOOLS_DB_HOST}:{self.TOOLS_DB_PORT}/{self.TOOLS_DB_NAME}"
+
+config = Config()
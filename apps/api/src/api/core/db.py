@@ -0,0 +1,221 @@
+import threading
+from contextlib import contextmanager
+
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+from api.core import deadline
+from api.core.config import config
+from api.core.metrics import DB_POOL_ACQUIRE_LATENCY, DB_POOL_TIMEOUTS, DB_POOL_CONNECTIONS
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_checkpointer_pool = None
+_checkpointer_pool_lock = threading.Lock()
+
+_saver_pool = None
+_saver_pool_lock = threading.Lock()
+
+_admission_pool = None
+_admission_pool_lock = threading.Lock()
+
+
+#### Pool
+
+def _statement_timeout(seconds: float) -> str:
+    return f"{max(int(seconds * 1000), 1)}ms"
+
+
+def _configure_tools_connection(conn) -> None:
+    # Once per connection, so a tool call only pays a round trip for a deadline closer than this
+    conn.execute("SELECT set_config('statement_timeout', %s, false)", (_statement_timeout(config.POSTGRES_STATEMENT_TIMEOUT_SECONDS),))
+    conn.commit()
+
+
+def get_pool() -> ConnectionPool:
+    """Shared pool for the tools database, opened on first use.
+
+    Connections are checked before being handed out, so a connection killed
+    by a Postgres restart is replaced instead of failing the tool call. The
+    tools only run fixed statements (api.agents.queries), so each connection
+    prepares them server-side once they repeat and skips parsing and planning
+    afterwards.
+    """
+
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    conninfo=config.tools_db_conn_string,
+                    min_size=config.DB_POOL_MIN_SIZE,
+                    max_size=config.DB_POOL_MAX_SIZE,
+                    timeout=config.DB_POOL_TIMEOUT_SECONDS,
+                    max_idle=config.DB_POOL_MAX_IDLE_SECONDS,
+                    check=ConnectionPool.check_connection,
+                    configure=_configure_tools_connection,
+                    kwargs={
+                        "row_factory": dict_row,
+                        "prepare_threshold": config.DB_PREPARE_THRESHOLD if config.DB_PREPARED_STATEMENTS else None
+                    },
+                    name="tools_database",
+                    open=True,
+                )
+                logger.info(f"Opened tools database pool (min_size={config.DB_POOL_MIN_SIZE}, max_size={config.DB_POOL_MAX_SIZE})")
+    return _pool
+
+
+def get_checkpointer_pool() -> ConnectionPool:
+    """Small autocommit pool for the API's own tables in the checkpointer database, opened on first use.
+
+    LangGraph's PostgresSaver has a pool of its own, this one serves the
+    feedback queue, the stream event log and the usage ledger.
+    """
+
+    global _checkpointer_pool
+
+    if _checkpointer_pool is None:
+        with _checkpointer_pool_lock:
+            if _checkpointer_pool is None:
+                _checkpointer_pool = ConnectionPool(
+                    conninfo=config.checkpointer_conn_string,
+                    min_size=1,
+                    max_size=config.CHECKPOINTER_POOL_MAX_SIZE,
+                    timeout=config.DB_POOL_TIMEOUT_SECONDS,
+                    max_idle=config.DB_POOL_MAX_IDLE_SECONDS,
+                    check=ConnectionPool.check_connection,
+                    kwargs={"row_factory": dict_row, "autocommit": True},
+                    name="checkpointer_database",
+                    open=True,
+                )
+    return _checkpointer_pool
+
+
+def get_saver_pool() -> ConnectionPool:
+    """Pool of LangGraph's PostgresSaver in the checkpointer database, opened on first use.
+
+    Autocommit with dict rows and prepare_threshold=0, the connection
+    settings PostgresSaver is written for.
+    """
+
+    global _saver_pool
+
+    if _saver_pool is None:
+        with _saver_pool_lock:
+            if _saver_pool is None:
+                _saver_pool = ConnectionPool(
+                    conninfo=config.checkpointer_conn_string,
+                    min_size=1,
+                    max_size=config.SAVER_POOL_MAX_SIZE,
+                    timeout=config.DB_POOL_TIMEOUT_SECONDS,
+                    max_idle=config.DB_POOL_MAX_IDLE_SECONDS,
+                    check=ConnectionPool.check_connection,
+                    kwargs={"row_factory": dict_row, "autocommit": True, "prepare_threshold": 0},
+                    name="checkpoint_saver",
+                    open=True,
+                )
+    return _saver_pool
+
+
+def get_admission_pool() -> ConnectionPool:
+    """Pool of the connections holding the thread locks of admitted /agent turns, opened on first use.
+
+    One connection per admission slot, so an admitted turn never waits for
+    one. The lock is released before its connection goes back to the pool.
+    """
+
+    global _admission_pool
+
+    if _admission_pool is None:
+        with _admission_pool_lock:
+            if _admission_pool is None:
+                _admission_pool = ConnectionPool(
+                    conninfo=config.checkpointer_conn_string,
+                    min_size=1,
+                    max_size=config.AGENT_MAX_IN_FLIGHT,
+                    timeout=config.DB_POOL_TIMEOUT_SECONDS,
+                    max_idle=config.DB_POOL_MAX_IDLE_SECONDS,
+                    check=ConnectionPool.check_connection,
+                    kwargs={"autocommit": True},
+                    name="admission_locks",
+                    open=True,
+                )
+    return _admission_pool
+
+
+def close_pool() -> None:
+    global _pool, _checkpointer_pool, _saver_pool, _admission_pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+    with _checkpointer_pool_lock:
+        if _checkpointer_pool is not None:
+            _checkpointer_pool.close()
+            _checkpointer_pool = None
+
+    with _saver_pool_lock:
+        if _saver_pool is not None:
+            _saver_pool.close()
+            _saver_pool = None
+
+    with _admission_pool_lock:
+        if _admission_pool is not None:
+            _admission_pool.close()
+            _admission_pool = None
+
+
+def _update_pool_gauges(pool: ConnectionPool) -> None:
+    stats = pool.get_stats()
+    DB_POOL_CONNECTIONS.labels(state="size").set(stats.get("pool_size", 0))
+    DB_POOL_CONNECTIONS.labels(state="available").set(stats.get("pool_available", 0))
+    DB_POOL_CONNECTIONS.labels(state="waiting").set(stats.get("requests_waiting", 0))
+
+
+@contextmanager
+def get_connection():
+    """Borrow a connection from the pool for one transaction.
+
+    The transaction is committed when the block exits and rolled back if it
+    raises, then the connection goes back to the pool. Rows come back as dicts.
+    Statements run for at most POSTGRES_STATEMENT_TIMEOUT_SECONDS. Within a
+    request deadline, waiting for the connection and each statement are
+    limited to what is left of it.
+    """
+
+    pool = get_pool()
+
+    try:
+        with DB_POOL_ACQUIRE_LATENCY.time():
+            conn = pool.getconn(timeout=deadline.timeout(config.DB_POOL_TIMEOUT_SECONDS))
+    except PoolTimeout:
+        DB_POOL_TIMEOUTS.inc()
+        _update_pool_gauges(pool)
+        raise
+
+    _update_pool_gauges(pool)
+    try:
+        # Commits on exit, rolls back on error; a pooled connection is not closed here
+        with conn:
+            left = deadline.remaining()
+            if left is not None and left < config.POSTGRES_STATEMENT_TIMEOUT_SECONDS:
+                # Local to the transaction, the next borrower gets the default back
+                statement_timeout = deadline.timeout(config.POSTGRES_STATEMENT_TIMEOUT_SECONDS)
+                conn.execute("SELECT set_config('statement_timeout', %s, true)", (_statement_timeout(statement_timeout),))
+            yield conn
+    finally:
+        pool.putconn(conn)
+        _update_pool_gauges(pool)
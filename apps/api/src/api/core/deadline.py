@@ -0,0 +1,73 @@
+import time
+from contextvars import ContextVar
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time before a dependency call could start."""
+
+
+class Deadline:
+    """Point in time by which one /agent turn has to be answered.
+
+    Shared by every copy of the context, so a graph node cutting the turn
+    short is seen by the code that reads the result.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.at = time.monotonic() + seconds
+        self.exceeded = False
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+
+# Deadline of the /agent turn being served, set by the endpoints before the
+# turn is admitted. Reaches the graph nodes, tools and enrichment the same
+# way the request ID does.
+deadline_var: ContextVar[Deadline | None] = ContextVar("deadline", default=None)
+
+
+def start_deadline(seconds: float) -> Deadline:
+    deadline = Deadline(seconds)
+    deadline_var.set(deadline)
+    return deadline
+
+
+def remaining() -> float | None:
+    """Seconds left of the current deadline, None outside a request with one."""
+
+    deadline = deadline_var.get()
+    return deadline.remaining() if deadline else None
+
+
+def expired() -> bool:
+    """Whether the current deadline passed, the caller is expected to stop there and wrap up."""
+
+    deadline = deadline_var.get()
+    if deadline is None or deadline.remaining() > 0:
+        return False
+    deadline.exceeded = True
+    return True
+
+
+def timeout(cap: float) -> float:
+    """Timeout for a dependency call: what is left of the deadline, at most `cap`, which alone applies outside a deadline.
+
+    Raises DeadlineExceeded rather than starting a call with no time left.
+    """
+
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        expired()
+        raise DeadlineExceeded(f"Request deadline of {deadline_var.get().seconds:.1f}s exceeded")
+    return min(cap, left)
+
+
+def exceeded() -> bool:
+    """Whether the current turn was cut short by its deadline."""
+
+    deadline = deadline_var.get()
+    return deadline is not None and deadline.exceeded
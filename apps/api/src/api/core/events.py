@@ -0,0 +1,41 @@
+import orjson
+
+
+# Every transport carries the same events: {"id": "<run_id>:<seq>", "type": ..., "data": ...}
+# with type progress, final_result, used_context, shopping_cart or thread_usage,
+# and error ({"detail"}) closing a run that failed. The WebSocket adds control frames
+# without an id: error for a message it cannot serve, and end once a turn is over.
+
+
+def dumps(event: dict) -> str:
+    return orjson.dumps(event).decode()
+
+
+def loads(data: str) -> dict:
+    return orjson.loads(data)
+
+
+#### Encoders
+
+def to_sse(event_id: str, event: dict) -> str:
+    # Progress goes out as plain text, the format SSE clients already read
+    data = event["data"]["message"] if event["type"] == "progress" else dumps(event)
+    return f"id: {event_id}\ndata: {data}\n\n"
+
+
+def to_ndjson(event_id: str, event: dict) -> bytes:
+    return orjson.dumps({"id": event_id, **event}) + b"\n"
+
+
+def to_frame(event_id: str, event: dict) -> str:
+    return dumps({"id": event_id, **event} if event_id else event)
+
+
+async def sse_stream(events):
+    async for event_id, event in events:
+        yield to_sse(event_id, event)
+
+
+async def ndjson_stream(events):
+    async for event_id, event in events:
+        yield to_ndjson(event_id, event)
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+
+import psycopg
+
+from api.core.config import config
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+TRIGGER_INSTALLED_QUERY = """
+    SELECT EXISTS (
+        SELECT 1 FROM pg_trigger
+        WHERE tgrelid = to_regclass(%s) AND tgname = %s AND NOT tgisinternal AND tgenabled <> 'D'
+    )
+"""
+
+
+def trigger_installed(conn, table: str, trigger: str) -> bool:
+    """Whether `trigger` exists and is enabled on `table`, without it its channel never gets a notification."""
+    return conn.execute(TRIGGER_INSTALLED_QUERY, (table, trigger)).fetchone()[0]
+
+
+class NotificationListener:
+    """Background thread that LISTENs on channels of the tools database, all over one connection.
+
+    Each channel is subscribed with `on_connect(conn)`, run once LISTEN on
+    it is active, after subscribing and after every reconnect, so callers
+    can rebuild whatever state notifications sent while disconnected would
+    have changed, and `on_notify(payload)`, which gets each JSON payload in
+    commit order. The thread runs while there are subscribers. `last_synced`
+    is refreshed whenever all pending notifications have been handled,
+    `is_fresh` tells readers whether to trust the derived state.
+    """
+
+    def __init__(self, conn_string: str = None, poll_seconds: float = 1.0):
+        self.conn_string = conn_string
+        self.poll_seconds = poll_seconds
+
+        self.connected = False
+        self.last_synced = 0.0
+        self._channels = {}
+        # Channels still to LISTEN on, the listener thread owns the connection
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, channel: str, on_connect, on_notify) -> None:
+        """Listen on `channel` too, starting the thread if needed."""
+
+        with self._lock:
+            self._channels[channel] = (on_connect, on_notify)
+            self._pending.add(channel)
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._listen, name="listen-tools-database", daemon=True)
+            self._thread.start()
+
+    def unsubscribe(self, channel: str, timeout: float = 5.0) -> None:
+        """Stop handling `channel`, and stop the thread once no channel is left."""
+
+        with self._lock:
+            self._channels.pop(channel, None)
+            self._pending.discard(channel)
+            if self._channels:
+                return
+            self._stop.set()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+        self.connected = False
+
+    def is_fresh(self, max_staleness_seconds: float) -> bool:
+        return self.connected and time.monotonic() - self.last_synced <= max_staleness_seconds
+
+    def _listen_pending(self, conn) -> None:
+        with self._lock:
+            channels, self._pending = self._pending, set()
+        for channel in channels:
+            # LISTEN first, anything committed while on_connect runs is replayed after it
+            conn.execute(f"LISTEN {channel}")
+            handlers = self._channels.get(channel)
+            if handlers:
+                handlers[0](conn)
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.conn_string or config.tools_db_conn_string, autocommit=True) as conn:
+                    with self._lock:
+                        self._pending = set(self._channels)
+                    self._listen_pending(conn)
+                    self.connected = True
+                    self.last_synced = time.monotonic()
+
+                    while not self._stop.is_set():
+                        self._listen_pending(conn)
+                        for notify in conn.notifies(timeout=self.poll_seconds):
+                            handlers = self._channels.get(notify.channel)
+                            # Channels unsubscribed from stay LISTENed to until the next reconnect
+                            if handlers:
+                                handlers[1](json.loads(notify.payload))
+                        self.last_synced = time.monotonic()
+            except Exception as e:
+                logger.error(f"Listener on {', '.join(self._channels)} failed, reconnecting: {e}")
+                self._stop.wait(self.poll_seconds)
+            finally:
+                self.connected = False
+
+
+# Shared by the inventory snapshot and the cart cache, one connection per process
+tools_listener = NotificationListener()
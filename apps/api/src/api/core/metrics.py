@@ -0,0 +1,340 @@
+import os
+import time
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# With several uvicorn/gunicorn workers, PROMETHEUS_MULTIPROC_DIR must point to a
+# directory shared by the workers (and be set before this module is imported),
+# every worker then writes its samples to mmap files that /metrics aggregates.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+COST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+#### Latency Histograms
+
+GRAPH_NODE_LATENCY = Histogram(
+    "agent_graph_node_duration_seconds",
+    "Time spent in a LangGraph node",
+    ["node"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+
+TOOL_LATENCY = Histogram(
+    "agent_tool_duration_seconds",
+    "Time spent in an agent tool function",
+    ["tool", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+EMBEDDING_LATENCY = Histogram(
+    "embedding_request_duration_seconds",
+    "Time spent computing an embedding",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+QDRANT_LATENCY = Histogram(
+    "qdrant_query_duration_seconds",
+    "Time spent in a Qdrant query",
+    ["collection", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+POSTGRES_LATENCY = Histogram(
+    "postgres_query_duration_seconds",
+    "Time spent in a Postgres query",
+    ["query"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "Time spent in an LLM completion, failed attempts included",
+    ["agent", "model"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+
+DB_POOL_ACQUIRE_LATENCY = Histogram(
+    "db_pool_acquire_duration_seconds",
+    "Time spent waiting for a connection from the tools database pool",
+    buckets=LATENCY_BUCKETS,
+)
+
+SSE_STREAM_DURATION = Histogram(
+    "sse_stream_duration_seconds",
+    "Duration of an /agent event stream, from the first to the last event",
+    buckets=LLM_LATENCY_BUCKETS,
+)
+
+AGENT_ADMISSION_WAIT = Histogram(
+    "agent_admission_wait_seconds",
+    "Time an /agent request waited before running, for a free slot or for the previous turn of its thread",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+#### Usage Histograms
+
+AGENT_TURN_TOKENS = Histogram(
+    "agent_turn_tokens",
+    "Tokens one /agent turn used across all its LLM and embedding calls, by kind (prompt, cached, completion)",
+    ["kind"],
+    buckets=TOKEN_BUCKETS,
+)
+
+AGENT_TURN_COST = Histogram(
+    "agent_turn_cost_usd",
+    "Estimated cost of one /agent turn in USD",
+    buckets=COST_BUCKETS,
+)
+
+
+#### Counters
+
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "LLM calls that failed and fell through to the next model",
+    ["agent", "model"],
+)
+
+# Cached tokens are the part of the prompt tokens read from the provider's prompt cache
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens of LLM and embedding calls, failed attempts included, by kind (prompt, cached, completion)",
+    ["agent", "model", "kind"],
+)
+
+LLM_COST = Counter(
+    "llm_cost_usd_total",
+    "Estimated cost of LLM and embedding calls in USD, from litellm's model prices",
+    ["agent", "model"],
+)
+
+AGENT_ITERATIONS = Histogram(
+    "agent_iterations_per_request",
+    "Iterations an agent ran within one /agent request",
+    ["agent"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10),
+)
+
+CHECKPOINT_RETENTION_DELETED = Counter(
+    "checkpoint_retention_deleted_total",
+    "Rows deleted by the checkpoint retention job",
+    ["table"],
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Lookups against an in-process cache",
+    ["cache", "result"],
+)
+
+INVENTORY_READS = Counter(
+    "inventory_availability_reads_total",
+    "Warehouse availability checks, by where the quantities were read from",
+    ["source"],
+)
+
+INVENTORY_SNAPSHOT_EVENTS = Counter(
+    "inventory_snapshot_events_total",
+    "Inventory change notifications applied to the in-process snapshot",
+    ["op"],
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Connection requests that timed out waiting on the tools database pool",
+)
+
+AGENT_ADMISSION_REJECTIONS = Counter(
+    "agent_admission_rejections_total",
+    "/agent requests answered with 429, by reason",
+    ["reason"],
+)
+
+SSE_STREAM_RESUMES = Counter(
+    "sse_stream_resumes_total",
+    "/agent streams resumed from the event log, by where the run was read from (memory, postgres)",
+    ["source"],
+)
+
+SSE_LOG_EVENTS_DROPPED = Counter(
+    "sse_log_events_dropped_total",
+    "Agent run events not copied to Postgres because the run's write queue was full",
+)
+
+AGENT_DEADLINE_EXCEEDED = Counter(
+    "agent_deadline_exceeded_total",
+    "/agent turns cut short by their deadline and answered with what they had so far",
+)
+
+AGENT_STREAM_TURNS = Counter(
+    "agent_stream_turns_total",
+    "Agent turns started, by transport (sse, ndjson, websocket)",
+    ["transport"],
+)
+
+LANGSMITH_TRACES = Counter(
+    "langsmith_traces_total",
+    "Traces by export decision: sampled, error or slow (exported in full), dropped, queue_full, evicted",
+    ["decision"],
+)
+
+FEEDBACK_SUBMISSIONS = Counter(
+    "feedback_submissions_total",
+    "Queued feedback items sent to LangSmith, by outcome (sent, retried, failed)",
+    ["outcome"],
+)
+
+
+#### Gauges
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections in the tools database pool, by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+
+INVENTORY_SNAPSHOT_ROWS = Gauge(
+    "inventory_snapshot_rows",
+    "Inventory rows held by the in-process snapshot at its last full load",
+    multiprocess_mode="max",
+)
+
+AGENT_ADMISSION_QUEUE_DEPTH = Gauge(
+    "agent_admission_queue_depth",
+    "/agent requests waiting for a free slot",
+    multiprocess_mode="livesum",
+)
+
+AGENT_REQUESTS_IN_FLIGHT = Gauge(
+    "agent_requests_in_flight",
+    "/agent requests holding a slot, from admission until their stream ends",
+    multiprocess_mode="livesum",
+)
+
+AGENT_WEBSOCKETS_OPEN = Gauge(
+    "agent_websockets_open",
+    "Open /agent WebSocket connections",
+    multiprocess_mode="livesum",
+)
+
+WARMUP_STEP_DURATION = Gauge(
+    "warmup_step_duration_seconds",
+    "Duration of each startup warm-up step at its last run, slowest worker",
+    ["step"],
+    multiprocess_mode="max",
+)
+
+WORKERS_READY = Gauge(
+    "api_workers_ready",
+    "API workers that finished their warm-up",
+    multiprocess_mode="livesum",
+)
+
+LANGSMITH_EXPORT_QUEUE_DEPTH = Gauge(
+    "langsmith_export_queue_depth",
+    "Run operations waiting to be sent to LangSmith",
+    multiprocess_mode="livesum",
+)
+
+# Read from the shared queue table, every worker reports the same value
+FEEDBACK_QUEUE_DEPTH = Gauge(
+    "feedback_queue_depth",
+    "Feedback items waiting to be sent to LangSmith",
+    multiprocess_mode="max",
+)
+
+FEEDBACK_QUEUE_LAG = Gauge(
+    "feedback_queue_lag_seconds",
+    "Age of the oldest feedback item waiting to be sent to LangSmith",
+    multiprocess_mode="max",
+)
+
+
+#### Helpers
+
+@contextmanager
+def observe_latency(histogram, **labels):
+    """Time the wrapped block into `histogram`, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+class GraphMetricsCallbackHandler(BaseCallbackHandler):
+    """Times graph nodes and tool calls from LangChain callbacks.
+
+    A node run is the chain whose name matches the `langgraph_node` metadata,
+    nested runnables inside the node inherit the metadata but carry their own name.
+    """
+
+    def __init__(self):
+        self._node_starts = {}
+        self._tool_starts = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._node_starts[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_node(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_node(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        tool = (serialized or {}).get("name") or kwargs.get("name", "unknown")
+        self._tool_starts[run_id] = (tool, time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end_tool(run_id, "success")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end_tool(run_id, "error")
+
+    def _end_node(self, run_id):
+        started = self._node_starts.pop(run_id, None)
+        if started:
+            node, start = started
+            GRAPH_NODE_LATENCY.labels(node=node).observe(time.perf_counter() - start)
+
+    def _end_tool(self, run_id, status):
+        started = self._tool_starts.pop(run_id, None)
+        if started:
+            tool, start = started
+            TOOL_LATENCY.labels(tool=tool, status=status).observe(time.perf_counter() - start)
+
+
+def metrics_payload() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauge samples when it exits, so livesum gauges stop counting it."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
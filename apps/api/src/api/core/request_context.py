@@ -0,0 +1,49 @@
+import logging
+import re
+from contextvars import ContextVar
+
+
+# ID of the HTTP request being served, set by api.api.middleware.RequestIDMiddleware.
+# Copied into threadpool endpoints, streaming responses and LangGraph nodes
+# like any contextvar; plain executors need langchain_core's ContextThreadPoolExecutor.
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+def get_request_id() -> str | None:
+    return request_id_var.get()
+
+
+def is_valid_request_id(value: str) -> bool:
+    """Whether a caller supplied ID is safe to reuse in logs and headers."""
+    return bool(_VALID_REQUEST_ID.match(value))
+
+
+def request_id_headers() -> dict:
+    """Headers forwarding the current request ID to outbound calls, empty outside a request."""
+    request_id = request_id_var.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+#### Logging
+
+def configure_request_logging() -> None:
+    """Stamp every log record with the current request ID ("-" outside a request) and show it in the root handlers' format."""
+
+    previous_factory = logging.getLogRecordFactory()
+
+    if not getattr(previous_factory, "adds_request_id", False):
+        def record_factory(*args, **kwargs):
+            record = previous_factory(*args, **kwargs)
+            record.request_id = request_id_var.get() or "-"
+            return record
+
+        record_factory.adds_request_id = True
+        logging.setLogRecordFactory(record_factory)
+
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
@@ -0,0 +1,325 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from api.core.config import config
+from api.core.db import get_checkpointer_pool
+from api.core.events import dumps, loads
+from api.core.metrics import SSE_STREAM_RESUMES, SSE_LOG_EVENTS_DROPPED
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+# Ends the log of a run that raised, clients see why the answer never came
+RUN_FAILED_EVENT = {"type": "error", "data": {"detail": "The agent failed to answer, please try again"}}
+
+
+#### Queries
+
+# Only the latest run of each thread is kept, it is the only one a client can resume
+CREATE_LOG_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS agent_stream_runs (
+        thread_id TEXT PRIMARY KEY,
+        run_id TEXT NOT NULL,
+        done BOOLEAN NOT NULL DEFAULT false,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agent_stream_events (
+        thread_id TEXT NOT NULL,
+        run_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (thread_id, run_id, seq)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS agent_stream_runs_updated_idx ON agent_stream_runs (updated_at)",
+]
+
+START_RUN_QUERIES = [
+    """
+    INSERT INTO agent_stream_runs (thread_id, run_id)
+    VALUES (%(thread_id)s, %(run_id)s)
+    ON CONFLICT (thread_id) DO UPDATE SET run_id = EXCLUDED.run_id, done = false, updated_at = now()
+    """,
+    "DELETE FROM agent_stream_events WHERE thread_id = %(thread_id)s AND run_id <> %(run_id)s",
+]
+
+APPEND_EVENT_QUERY = "INSERT INTO agent_stream_events (thread_id, run_id, seq, data) VALUES (%s, %s, %s, %s)"
+
+FINISH_RUN_QUERY = "UPDATE agent_stream_runs SET done = true, updated_at = now() WHERE thread_id = %s AND run_id = %s"
+
+GET_RUN_QUERY = "SELECT run_id, done FROM agent_stream_runs WHERE thread_id = %s"
+
+READ_EVENTS_QUERY = """
+    SELECT seq, data FROM agent_stream_events
+    WHERE thread_id = %s AND run_id = %s AND seq >= %s AND seq < %s
+    ORDER BY seq
+"""
+
+EXPIRE_RUNS_QUERIES = [
+    """
+    DELETE FROM agent_stream_events e
+    USING agent_stream_runs r
+    WHERE e.thread_id = r.thread_id AND r.updated_at < now() - make_interval(secs => %(ttl)s)
+    """,
+    "DELETE FROM agent_stream_runs WHERE updated_at < now() - make_interval(secs => %(ttl)s)",
+]
+
+
+def event_id(run_id: str, seq: int) -> str:
+    return f"{run_id}:{seq}"
+
+
+def parse_event_id(last_event_id: str) -> tuple[str, int]:
+    """(run_id, seq) of a Last-Event-ID header, (None, -1) when missing or malformed."""
+
+    run_id, _, seq = (last_event_id or "").strip().rpartition(":")
+    if not run_id or not seq.isdigit():
+        return None, -1
+    return run_id, int(seq)
+
+
+class RunLog:
+    """Events of one agent run, the newest `max_events` in memory and all of them in Postgres."""
+
+    def __init__(self, thread_id: str, run_id: str, max_events: int):
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.events = deque(maxlen=max_events)
+        self.count = 0
+        self.done = False
+        self.finished_at = None
+        self.changed = asyncio.Condition()
+
+    @property
+    def first_in_memory(self) -> int:
+        return self.count - len(self.events)
+
+
+class StreamLog:
+    """Per-thread log of the events of agent runs, so a dropped client can resume.
+
+    A run is produced by a background task that outlives the request which
+    started it. Clients tail the log: they get the events recorded so far,
+    then the new ones as they come. Runs of this worker are served from
+    memory, runs of other workers, or evicted from memory, are read from
+    Postgres and tailed by polling until the run is marked done. Consumers
+    get (event id, event) pairs and encode them for their transport.
+    """
+
+    def __init__(self):
+        self._runs = OrderedDict()
+        self._tasks = set()
+        self._tables_ready = False
+        self._last_expiry = 0.0
+
+    #### Postgres
+
+    def _connection(self):
+        pool = get_checkpointer_pool()
+        if not self._tables_ready:
+            with pool.connection() as conn:
+                for query in CREATE_LOG_QUERIES:
+                    conn.execute(query)
+            self._tables_ready = True
+        return pool.connection()
+
+    def _persist(self, query, params) -> None:
+        with self._connection() as conn:
+            if query is APPEND_EVENT_QUERY:
+                # A batch of rows, sent in one round trip
+                with conn.cursor() as cursor:
+                    cursor.executemany(query, params)
+            elif isinstance(query, list):
+                for q in query:
+                    conn.execute(q, params)
+            else:
+                conn.execute(query, params)
+
+    async def _persist_quietly(self, query, params) -> None:
+        # The live stream is served from memory, losing the copy only costs resumability
+        try:
+            await asyncio.to_thread(self._persist, query, params)
+        except Exception as e:
+            logger.warning(f"Could not persist stream event log: {e}")
+
+    def _read_run(self, thread_id: str):
+        with self._connection() as conn:
+            return conn.execute(GET_RUN_QUERY, (thread_id,)).fetchone()
+
+    def _read_events(self, thread_id: str, run_id: str, start: int, end: int) -> list:
+        with self._connection() as conn:
+            return conn.execute(READ_EVENTS_QUERY, (thread_id, run_id, start, end)).fetchall()
+
+    #### Producer
+
+    async def start(self, thread_id: str, events, on_done=None) -> RunLog:
+        """Run `events`, an async iterator of events, in a background task recording into a new log for `thread_id`.
+
+        `on_done` is called once the run is over, whatever happened to the clients.
+        """
+
+        run = RunLog(thread_id, uuid.uuid4().hex[:16], config.SSE_LOG_MAX_EVENTS)
+        self._runs.pop(thread_id, None)
+        self._runs[thread_id] = run
+        self._evict()
+
+        task = asyncio.create_task(self._produce(run, events, on_done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return run
+
+    async def _produce(self, run: RunLog, events, on_done) -> None:
+        # Copies to Postgres go through a writer task, a slow database never holds the run back
+        writes = asyncio.Queue(maxsize=config.SSE_LOG_WRITE_QUEUE_SIZE)
+        writer = asyncio.create_task(self._write(run, writes))
+        try:
+            async for event in events:
+                await self._append(run, writes, event)
+        except Exception as e:
+            logger.error(f"Agent run {run.run_id} of thread {run.thread_id} failed: {e}")
+            await self._append(run, writes, RUN_FAILED_EVENT)
+        finally:
+            if on_done is not None:
+                on_done()
+            async with run.changed:
+                run.done = True
+                run.finished_at = time.monotonic()
+                run.changed.notify_all()
+            await writes.put(None)
+            await writer
+
+    async def _append(self, run: RunLog, writes: asyncio.Queue, event: dict) -> None:
+        seq = run.count
+        async with run.changed:
+            run.events.append(event)
+            run.count += 1
+            run.changed.notify_all()
+        try:
+            writes.put_nowait((seq, event))
+        except asyncio.QueueFull:
+            SSE_LOG_EVENTS_DROPPED.inc()
+
+    async def _write(self, run: RunLog, writes: asyncio.Queue) -> None:
+        """Copy the events of `run` to Postgres in batches until the None that ends the run, then mark it done."""
+
+        await self._persist_quietly(START_RUN_QUERIES, {"thread_id": run.thread_id, "run_id": run.run_id})
+        done = False
+        while not done:
+            batch = [await writes.get()]
+            while not writes.empty() and len(batch) < config.SSE_LOG_WRITE_BATCH_SIZE:
+                batch.append(writes.get_nowait())
+            if batch[-1] is None:
+                done = True
+                batch.pop()
+            if batch:
+                rows = [(run.thread_id, run.run_id, seq, dumps(event)) for seq, event in batch]
+                await self._persist_quietly(APPEND_EVENT_QUERY, rows)
+
+        await self._persist_quietly(FINISH_RUN_QUERY, (run.thread_id, run.run_id))
+        await self._expire_persisted()
+
+    async def stop(self) -> None:
+        """Cancel the runs still going on shutdown, so they are marked done for clients tailing from other workers."""
+
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for thread_id, run in list(self._runs.items()):
+            expired = run.done and now - run.finished_at > config.SSE_LOG_TTL_SECONDS
+            if expired or (len(self._runs) > config.SSE_LOG_MAX_RUNS and run.done):
+                del self._runs[thread_id]
+
+    async def _expire_persisted(self) -> None:
+        if time.monotonic() - self._last_expiry < config.SSE_LOG_TTL_SECONDS / 10:
+            return
+        self._last_expiry = time.monotonic()
+        await self._persist_quietly(EXPIRE_RUNS_QUERIES, {"ttl": config.SSE_LOG_TTL_SECONDS})
+
+    #### Consumers
+
+    async def tail(self, run: RunLog, after: int = -1):
+        """Events of `run` after seq `after`, then the live ones until the run is done."""
+
+        position = after + 1
+        while True:
+            async with run.changed:
+                await run.changed.wait_for(lambda: run.count > position or run.done)
+                start = max(position, run.first_in_memory)
+                fresh = list(run.events)[start - run.first_in_memory:]
+                end, done = run.count, run.done
+
+            # Fell behind what memory holds, the rest is in Postgres
+            if position < start:
+                for row in await asyncio.to_thread(self._read_events, run.thread_id, run.run_id, position, start):
+                    yield event_id(run.run_id, row["seq"]), loads(row["data"])
+
+            for offset, event in enumerate(fresh):
+                yield event_id(run.run_id, start + offset), event
+            position = end
+
+            if done:
+                return
+
+    async def _tail_persisted(self, thread_id: str, run_id: str, after: int):
+        position = after + 1
+        idle_since = time.monotonic()
+        while True:
+            stored = await asyncio.to_thread(self._read_run, thread_id)
+            if stored is None or stored["run_id"] != run_id:
+                return
+
+            rows = await asyncio.to_thread(self._read_events, thread_id, run_id, position, 2 ** 31 - 1)
+            for row in rows:
+                yield event_id(run_id, row["seq"]), loads(row["data"])
+                position = row["seq"] + 1
+
+            if stored["done"] and not rows:
+                return
+            if rows:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > config.SSE_LOG_RESUME_IDLE_TIMEOUT_SECONDS:
+                logger.warning(f"Gave up tailing run {run_id} of thread {thread_id}, no events for {config.SSE_LOG_RESUME_IDLE_TIMEOUT_SECONDS}s")
+                return
+            else:
+                await asyncio.sleep(config.SSE_LOG_POLL_SECONDS)
+
+    async def resume(self, thread_id: str, last_event_id: str = None):
+        """Replay the latest run of `thread_id` after `last_event_id` and follow it, None when there is nothing to resume.
+
+        A Last-Event-ID of an older run replays the latest one from its start.
+        """
+
+        run_id, seq = parse_event_id(last_event_id)
+
+        run = self._runs.get(thread_id)
+        if run is not None:
+            SSE_STREAM_RESUMES.labels(source="memory").inc()
+            return self.tail(run, seq if run_id == run.run_id else -1)
+
+        try:
+            stored = await asyncio.to_thread(self._read_run, thread_id)
+        except Exception as e:
+            logger.warning(f"Could not read the stream event log of thread {thread_id}: {e}")
+            return None
+        if stored is None:
+            return None
+
+        SSE_STREAM_RESUMES.labels(source="postgres").inc()
+        return self._tail_persisted(thread_id, stored["run_id"], seq if run_id == stored["run_id"] else -1)
+
+
+stream_log = StreamLog()
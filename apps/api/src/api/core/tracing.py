@@ -0,0 +1,251 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from langsmith import Client
+
+from api.core.config import config
+from api.core.metrics import LANGSMITH_TRACES, LANGSMITH_EXPORT_QUEUE_DEPTH
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+#### Sampling
+
+class SamplingPolicy:
+    """Export rates of a trace by route, and of the runs in it by run type."""
+
+    def __init__(self, default_rate: float = 1.0, route_rates: dict = None, run_type_rates: dict = None, slow_seconds: float = None):
+        self.default_rate = default_rate
+        # Longest prefix first, so /agent/feedback can override /agent
+        self.route_rates = sorted((route_rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.run_type_rates = run_type_rates or {}
+        self.slow_seconds = slow_seconds
+
+    def route_rate(self, route: str | None) -> float:
+        for prefix, rate in self.route_rates:
+            if route is not None and route.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def run_type_rate(self, run_type: str | None) -> float:
+        return self.run_type_rates.get(run_type, 1.0)
+
+    def is_slow(self, seconds: float) -> bool:
+        return self.slow_seconds is not None and seconds >= self.slow_seconds
+
+
+class _Trace:
+    def __init__(self, sampled: bool, queue_full: bool = False):
+        self.sampled = sampled
+        self.queue_full = queue_full
+        self.start = time.monotonic()
+        self.finished = False
+        self.error = False
+        # Runs held back, with their descendants, and their operations in call
+        # order. Kept as passed in, they are only serialized if promoted.
+        self.held = set()
+        self.buffer = []
+
+
+class SamplingClient(Client):
+    """LangSmith client that decides per trace what gets exported.
+
+    When its root run starts, a trace is sampled at the rate of its route
+    (the "route" metadata the request middleware sets), and within a
+    sampled trace each run at the rate of its run type. Whatever is not
+    sampled is held back until the root run ends: then a trace that raised
+    an error anywhere or ran for at least `slow_seconds` is exported in
+    full, the rest is dropped without ever being serialized.
+
+    Sampled runs go through the regular background export. A new trace is
+    dropped whole, rather than queued, while more than `max_queued` run
+    operations wait to be sent, so an unreachable or slow LangSmith costs
+    traces and not memory or request latency.
+    """
+
+    def __init__(self, policy: SamplingPolicy, max_queued: int = 5000, max_buffered_traces: int = 1000, **kwargs):
+        super().__init__(**kwargs)
+        self.policy = policy
+        self.max_queued = max_queued
+        self.max_buffered_traces = max_buffered_traces
+        self._traces = OrderedDict()
+        # Decided traces, for runs that end after their root (background work started by it)
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def create_run(self, name: str, inputs: dict, run_type: str, **kwargs) -> None:
+        run_id = kwargs.get("id")
+        trace_id = kwargs.get("trace_id") or run_id
+        parent_run_id = kwargs.get("parent_run_id")
+        op = ("create", {"name": name, "inputs": inputs, "run_type": run_type, **kwargs})
+
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            if trace is None:
+                trace = self._finished.get(trace_id)
+                if trace is None and parent_run_id is not None:
+                    # Child of a trace started before this client or forgotten since
+                    return
+            if trace is None:
+                route = ((kwargs.get("extra") or {}).get("metadata") or {}).get("route")
+                trace = self._start_trace(trace_id, route)
+
+            sampled = trace.sampled and (
+                parent_run_id is None
+                or (parent_run_id not in trace.held and self._rng.random() < self.policy.run_type_rate(run_type))
+            )
+            if not sampled:
+                trace.held.add(run_id)
+                if not trace.finished:
+                    trace.buffer.append(op)
+            trace.error = trace.error or bool(kwargs.get("error"))
+            ops = self._finish_trace(trace_id, trace) if run_id == trace_id and kwargs.get("end_time") else []
+
+        if sampled:
+            ops.insert(0, op)
+        self._export(ops)
+
+    def update_run(self, run_id, **kwargs) -> None:
+        trace_id = kwargs.get("trace_id") or run_id
+        op = ("update", {"run_id": run_id, **kwargs})
+
+        with self._lock:
+            trace = self._traces.get(trace_id) or self._finished.get(trace_id)
+            if trace is None:
+                return
+            held = run_id in trace.held
+            if held and not trace.finished:
+                trace.buffer.append(op)
+            trace.error = trace.error or bool(kwargs.get("error"))
+            ops = self._finish_trace(trace_id, trace) if run_id == trace_id and kwargs.get("end_time") else []
+
+        if not held:
+            ops.insert(0, op)
+        self._export(ops)
+
+    def is_sampled(self, trace_id) -> bool:
+        """Whether the root run of `trace_id` is being exported, True for a trace this client never saw.
+
+        A held back trace can still be exported when its root run ends,
+        with an error or slowly, but nothing can be attached to it before.
+        """
+
+        with self._lock:
+            trace = self._traces.get(trace_id) or self._finished.get(trace_id)
+        return trace is None or trace.sampled
+
+    def _start_trace(self, trace_id, route: str | None) -> _Trace:
+        if not self._has_room():
+            trace = _Trace(sampled=False, queue_full=True)
+        else:
+            trace = _Trace(sampled=self._rng.random() < self.policy.route_rate(route))
+
+        self._traces[trace_id] = trace
+        while len(self._traces) > self.max_buffered_traces:
+            # Roots that never ended, their held runs are given up on
+            self._traces.popitem(last=False)
+            LANGSMITH_TRACES.labels(decision="evicted").inc()
+        return trace
+
+    def _finish_trace(self, trace_id, trace: _Trace) -> list:
+        """Operations still to export once the root run ended."""
+
+        del self._traces[trace_id]
+        trace.finished = True
+        self._finished[trace_id] = trace
+        while len(self._finished) > self.max_buffered_traces:
+            self._finished.popitem(last=False)
+
+        buffer, trace.buffer = trace.buffer, []
+        decision = "error" if trace.error else "slow" if self.policy.is_slow(time.monotonic() - trace.start) else None
+        if decision is None:
+            LANGSMITH_TRACES.labels(decision="sampled" if trace.sampled else "queue_full" if trace.queue_full else "dropped").inc()
+            return []
+        if buffer and not self._has_room():
+            LANGSMITH_TRACES.labels(decision="queue_full").inc()
+            return []
+        LANGSMITH_TRACES.labels(decision=decision).inc()
+        # Exported in full from here on, late runs included
+        trace.sampled = True
+        trace.held.clear()
+        return buffer
+
+    def _has_room(self) -> bool:
+        # No queue when LangSmith sends synchronously or compresses traces itself
+        return self.tracing_queue is None or self.tracing_queue.qsize() < self.max_queued
+
+    def _export(self, ops: list) -> None:
+        for method, kwargs in ops:
+            if method == "create":
+                super().create_run(**kwargs)
+            else:
+                super().update_run(**kwargs)
+        if ops and self.tracing_queue is not None:
+            LANGSMITH_EXPORT_QUEUE_DEPTH.set(self.tracing_queue.qsize())
+
+
+_tracing_client = None
+_tracing_client_lock = threading.Lock()
+
+
+def get_tracing_client() -> SamplingClient:
+    """Client every traced run of a request goes through, set by the request middleware."""
+
+    global _tracing_client
+    if _tracing_client is None:
+        with _tracing_client_lock:
+            if _tracing_client is None:
+                policy = SamplingPolicy(
+                    default_rate=config.TRACE_SAMPLE_RATE,
+                    route_rates=config.TRACE_ROUTE_SAMPLE_RATES,
+                    run_type_rates=config.TRACE_RUN_TYPE_SAMPLE_RATES,
+                    slow_seconds=config.TRACE_SLOW_SECONDS,
+                )
+                _tracing_client = SamplingClient(
+                    policy,
+                    max_queued=config.TRACE_EXPORT_QUEUE_SIZE,
+                    max_buffered_traces=config.TRACE_MAX_BUFFERED_TRACES,
+                )
+    return _tracing_client
+
+
+def feedback_trace_id(run) -> str:
+    """Id of the trace of `run` to send feedback for, "" without a run or when its trace is not exported.
+
+    Feedback on a dropped trace fails in LangSmith after every retry, the
+    clients offer no feedback for a turn without a trace id instead.
+    """
+
+    if run is None:
+        return ""
+    trace_id = getattr(run, "trace_id", None) or run.id
+    client = getattr(run, "client", None)
+    if isinstance(client, SamplingClient) and not client.is_sampled(trace_id):
+        return ""
+    return str(trace_id)
+
+
+def flush_tracing_client(timeout: float = 5.0) -> None:
+    """Send what is queued before the worker exits, giving up after `timeout` seconds.
+
+    The flush waits for the export threads, which never finish with
+    LangSmith unreachable, so it runs in a thread of its own.
+    """
+
+    if _tracing_client is None:
+        return
+
+    flusher = threading.Thread(target=_tracing_client.flush, daemon=True)
+    flusher.start()
+    flusher.join(timeout)
+    if flusher.is_alive():
+        logger.warning(f"Gave up flushing LangSmith traces after {timeout:.0f}s, the rest are dropped")
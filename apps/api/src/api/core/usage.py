@@ -0,0 +1,191 @@
+import threading
+from contextvars import ContextVar
+
+from api.core.db import get_checkpointer_pool
+from api.core.metrics import LLM_TOKENS, LLM_COST, AGENT_TURN_TOKENS, AGENT_TURN_COST
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+TOKEN_KINDS = ("prompt", "cached", "completion")
+
+
+#### Queries
+
+CREATE_THREAD_USAGE_QUERY = """
+    CREATE TABLE IF NOT EXISTS agent_thread_usage (
+        thread_id TEXT PRIMARY KEY,
+        turns INTEGER NOT NULL DEFAULT 0,
+        prompt_tokens BIGINT NOT NULL DEFAULT 0,
+        cached_tokens BIGINT NOT NULL DEFAULT 0,
+        completion_tokens BIGINT NOT NULL DEFAULT 0,
+        cost_usd DOUBLE PRECISION NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+ADD_THREAD_USAGE_QUERY = """
+    INSERT INTO agent_thread_usage AS u (thread_id, turns, prompt_tokens, cached_tokens, completion_tokens, cost_usd)
+    VALUES (%(thread_id)s, 1, %(prompt_tokens)s, %(cached_tokens)s, %(completion_tokens)s, %(cost_usd)s)
+    ON CONFLICT (thread_id) DO UPDATE SET
+        turns = u.turns + 1,
+        prompt_tokens = u.prompt_tokens + EXCLUDED.prompt_tokens,
+        cached_tokens = u.cached_tokens + EXCLUDED.cached_tokens,
+        completion_tokens = u.completion_tokens + EXCLUDED.completion_tokens,
+        cost_usd = u.cost_usd + EXCLUDED.cost_usd,
+        updated_at = now()
+    RETURNING turns, prompt_tokens, cached_tokens, completion_tokens, cost_usd
+"""
+
+
+#### Ledger
+
+def _empty_entry() -> dict:
+    return {"calls": 0, "failed_calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+
+def _rounded(entry: dict) -> dict:
+    # Sums of per-token prices, the float noise past a millionth of a cent means nothing
+    return {**entry, "cost_usd": round(entry["cost_usd"], 8)}
+
+
+class UsageLedger:
+    """Tokens and estimated cost of one /agent turn, by model and by agent.
+
+    Shared by every copy of the context, like the deadline, so calls made
+    from graph nodes, tool threads and fallbacks all add to the turn that
+    started them. Failed attempts count when the provider reported usage.
+    """
+
+    def __init__(self):
+        self.models = {}
+        self.agents = {}
+        self._lock = threading.Lock()
+
+    def add(self, agent: str, model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int, cost_usd: float, failed: bool) -> None:
+        with self._lock:
+            for entries, key in ((self.models, model), (self.agents, agent)):
+                entry = entries.setdefault(key, _empty_entry())
+                entry["calls"] += 1
+                entry["failed_calls"] += int(failed)
+                entry["prompt_tokens"] += prompt_tokens
+                entry["cached_tokens"] += cached_tokens
+                entry["completion_tokens"] += completion_tokens
+                entry["cost_usd"] += cost_usd
+
+    def totals(self) -> dict:
+        totals = _empty_entry()
+        with self._lock:
+            for entry in self.models.values():
+                for key in totals:
+                    totals[key] += entry[key]
+        return totals
+
+    def summary(self) -> dict:
+        with self._lock:
+            models = {model: _rounded(entry) for model, entry in self.models.items()}
+            agents = {agent: _rounded(entry) for agent, entry in self.agents.items()}
+        return {**_rounded(self.totals()), "models": models, "agents": agents}
+
+
+# Ledger of the /agent turn being served, set by the endpoints next to the deadline
+ledger_var: ContextVar[UsageLedger | None] = ContextVar("usage_ledger", default=None)
+
+
+def start_ledger() -> UsageLedger:
+    ledger = UsageLedger()
+    ledger_var.set(ledger)
+    return ledger
+
+
+#### Recording
+
+_unpriced_models = set()
+
+
+def _cost(model: str, **kwargs) -> float:
+    """Estimated cost in USD from litellm's model prices, 0 for a model it has no price for."""
+
+    import litellm
+
+    try:
+        prompt_cost, completion_cost = litellm.cost_per_token(model=model, **kwargs)
+    except Exception as e:
+        if model not in _unpriced_models:
+            _unpriced_models.add(model)
+            logger.warning(f"No price for model {model}, its cost is counted as 0: {e}")
+        return 0.0
+    return prompt_cost + completion_cost
+
+
+def _record(agent: str, model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int, cost_usd: float, failed: bool = False) -> None:
+    for kind, tokens in zip(TOKEN_KINDS, (prompt_tokens, cached_tokens, completion_tokens)):
+        if tokens:
+            LLM_TOKENS.labels(agent=agent, model=model, kind=kind).inc(tokens)
+    LLM_COST.labels(agent=agent, model=model).inc(cost_usd)
+
+    ledger = ledger_var.get()
+    if ledger is not None:
+        ledger.add(agent, model, prompt_tokens, cached_tokens, completion_tokens, cost_usd, failed)
+
+
+def record_completion(agent: str, model: str, usage, failed: bool = False) -> None:
+    """Add a completion's usage (OpenAI format, as litellm returns it) to the metrics and the current ledger."""
+
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+    cost_usd = _cost(model, usage_object=usage)
+    _record(agent, model, usage.prompt_tokens or 0, cached_tokens, usage.completion_tokens or 0, cost_usd, failed)
+
+
+def record_embedding(model: str, usage) -> None:
+    """Add an embedding call's usage to the metrics and the current ledger."""
+
+    if usage is None:
+        return
+    cost_usd = _cost(model, prompt_tokens=usage.prompt_tokens, call_type="embedding")
+    _record("embedding", model, usage.prompt_tokens or 0, 0, 0, cost_usd)
+
+
+#### Turn Summary
+
+_table_ready = False
+
+
+def finish_turn() -> dict | None:
+    """Usage of the current turn for the final_result event, None outside a turn with a ledger.
+
+    Also observes the turn into the per-turn histograms.
+    """
+
+    ledger = ledger_var.get()
+    if ledger is None:
+        return None
+
+    summary = ledger.summary()
+    for kind in TOKEN_KINDS:
+        AGENT_TURN_TOKENS.labels(kind=kind).observe(summary[f"{kind}_tokens"])
+    AGENT_TURN_COST.observe(summary["cost_usd"])
+    return summary
+
+
+def add_thread_usage(thread_id: str, summary: dict) -> dict:
+    """Add a turn's usage (finish_turn) to the running total of its thread in Postgres, returns the new total."""
+
+    global _table_ready
+
+    totals = {key: summary[key] for key in ("prompt_tokens", "cached_tokens", "completion_tokens", "cost_usd")}
+    with get_checkpointer_pool().connection() as conn:
+        if not _table_ready:
+            conn.execute(CREATE_THREAD_USAGE_QUERY)
+            _table_ready = True
+        # Rows come as dicts from the checkpointer pool
+        row = conn.execute(ADD_THREAD_USAGE_QUERY, {"thread_id": thread_id, **totals}).fetchone()
+    return {**row, "cost_usd": round(row["cost_usd"], 8)}
@@ -0,0 +1,60 @@
+import glob
+import os
+import tempfile
+
+import uvicorn
+
+from api.core.config import config
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _prepare_prometheus_multiproc_dir(workers: int) -> None:
+    """Point every worker at one metrics directory, emptied of samples from previous runs.
+
+    Has to happen before the workers import api.core.metrics, they inherit
+    the environment variable from this process.
+    """
+
+    if workers < 2 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return
+
+    path = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus_multiproc"))
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+
+
+def main():
+    workers = 1 if config.API_RELOAD else config.API_WORKERS
+    _prepare_prometheus_multiproc_dir(workers)
+
+    logger.info(
+        f"Serving api.app:app on {config.API_HOST}:{config.API_PORT} with {workers} worker(s), "
+        f"loop={config.API_LOOP}, http={config.API_HTTP}, ws={config.API_WS}, reload={config.API_RELOAD}"
+    )
+
+    # Each worker runs the app lifespan on its own, which starts its caches and pool
+    uvicorn.run(
+        "api.app:app",
+        host=config.API_HOST,
+        port=config.API_PORT,
+        workers=workers,
+        reload=config.API_RELOAD,
+        loop=config.API_LOOP,
+        http=config.API_HTTP,
+        ws=config.API_WS,
+        ws_ping_interval=config.API_WS_PING_INTERVAL_SECONDS,
+        timeout_keep_alive=config.API_KEEPALIVE_TIMEOUT_SECONDS,
+        timeout_graceful_shutdown=config.API_GRACEFUL_SHUTDOWN_TIMEOUT_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -83,6 +83,47 @@ def api_call_stream(method, url, **kwargs):
         return False, {"message": str(e)}
         
 
+def stream_agent_lines(prompt, max_resumes=3):
+    """Stream the /agent response lines, resuming from the last event ID when the connection drops."""
+
+    lines = api_call_stream(
+        "post", 
+        f"{config.API_URL}/agent", 
+        json={"query": prompt, "thread_id": session_id},
+        stream=True,
+        headers={"Accept": "text/event-stream"}
+    )
+    last_event_id = None
+    resumes = 0
+
+    while True:
+        # api_call_stream already showed the error popup
+        if isinstance(lines, tuple):
+            return
+        try:
+            for line in lines:
+                line_text = line.decode("utf-8")
+                if line_text.startswith("id: "):
+                    last_event_id = line_text[4:]
+                yield line
+            return
+        except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError) as e:
+            # The run keeps going on the API, pick it up where the stream stopped
+            if resumes >= max_resumes:
+                raise
+            resumes += 1
+            logger.warning(f"Agent stream dropped ({e}), resuming after event {last_event_id}")
+            headers = {"Accept": "text/event-stream"}
+            if last_event_id:
+                headers["Last-Event-ID"] = last_event_id
+            lines = api_call_stream(
+                "get",
+                f"{config.API_URL}/agent/{session_id}/stream",
+                stream=True,
+                headers=headers
+            )
+
+
 def submit_feedback(feedback_type=None, feedback_text=""):
     """Submit feedback to the API endpoint"""
 
@@ -117,6 +158,9 @@ if "used_context" not in st.session_state:
 if "shopping_cart" not in st.session_state:
     st.session_state.shopping_cart = []
 
+if "thread_usage" not in st.session_state:
+    st.session_state.thread_usage = None
+
 # Initialize feedback states (simplified)
 if "latest_feedback" not in st.session_state:
     st.session_state.latest_feedback = None
@@ -161,6 +205,12 @@ with st.sidebar:
         else:
             st.info("Your cart is empty")
 
+    # Running total of the conversation, as the API adds each turn to it
+    if st.session_state.thread_usage:
+        usage = st.session_state.thread_usage
+        tokens = usage["prompt_tokens"] + usage["completion_tokens"]
+        st.caption(f"This conversation: {usage['turns']} turns, {tokens} tokens, about {usage['cost_usd']:.4f} USD")
+
 for idx, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
@@ -172,7 +222,8 @@ for idx, message in enumerate(st.session_state.messages):
             idx > 0
         )
         
-        if is_latest_assistant:
+        # No trace id when the API did not keep the turn's trace, feedback on it would be lost
+        if is_latest_assistant and st.session_state.trace_id:
             # Use Streamlit's built-in feedback component
             feedback_key = f"feedback_{len(st.session_state.messages)}"
             feedback_result = st.feedback("thumbs", key=feedback_key)
@@ -247,13 +298,7 @@ if prompt := st.chat_input("Hello! How can I assist today?"):
         status_placeholder = st.empty()
         message_placeholder = st.empty()
 
-        for line in api_call_stream(
-            "post", 
-            f"{config.API_URL}/agent", 
-            json={"query": prompt, "thread_id": session_id},
-            stream=True,
-            headers={"Accept": "text/event-stream"}
-        ):
+        for line in stream_agent_lines(prompt):
             line_text = line.decode("utf-8")
             if line_text.startswith("data: "):
                 data = line_text[6:]
@@ -263,14 +308,10 @@ if prompt := st.chat_input("Hello! How can I assist today?"):
 
                     if output["type"] == "final_result":
                         answer = output["data"]["answer"]
-                        used_context = output["data"]["used_context"]
                         trace_id = output["data"]["trace_id"]
-                        shopping_cart = output["data"]["shopping_cart"]
                         
-                        st.session_state.used_context = used_context
                         st.session_state.messages.append({"role": "assistant", "content": answer})
                         st.session_state.trace_id = trace_id
-                        st.session_state.shopping_cart = shopping_cart
 
                         st.session_state.latest_feedback = None
                         st.session_state.show_feedback_box = False
@@ -279,7 +320,26 @@ if prompt := st.chat_input("Hello! How can I assist today?"):
                         
                         status_placeholder.empty()
                         message_placeholder.markdown(answer)
-                        break
+
+                    # The run failed on the API, no answer is coming
+                    elif output["type"] == "error":
+                        error = output["data"]["detail"]
+
+                        st.session_state.messages.append({"role": "assistant", "content": f"⚠️ {error}"})
+                        st.session_state.trace_id = None
+
+                        status_placeholder.empty()
+                        message_placeholder.error(error)
+
+                    # Follow-up events, sent by the API after the answer
+                    elif output["type"] == "used_context":
+                        st.session_state.used_context = output["data"]
+
+                    elif output["type"] == "shopping_cart":
+                        st.session_state.shopping_cart = output["data"]
+
+                    elif output["type"] == "thread_usage":
+                        st.session_state.thread_usage = output["data"]
                 
                 except json.JSONDecodeError:
                     status_placeholder.markdown(f"*{data}*")
@@ -1,9 +1,10 @@
-import openai
-from qdrant_client.models import Prefetch, FusionQuery
-from qdrant_client import QdrantClient
+# openai and qdrant_client are imported on the first call, so the server
+# starts listening without paying for them
 
 
 def get_embedding(text, model="text-embedding-3-small"):
+    import openai
+
     response = openai.embeddings.create(
         input=text,
         model=model,
@@ -12,6 +13,9 @@ def get_embedding(text, model="text-embedding-3-small"):
 
 
 def retrieve_reviews_data(query, item_list, k=5):
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Prefetch, FusionQuery
+
     query_embedding = get_embedding(query)
 
     qdrant_client = QdrantClient(url="http://qdrant:6333")
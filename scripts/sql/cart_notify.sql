@@ -0,0 +1,31 @@
+-- Publish the cart touched by every shopping cart row change on the
+-- cart_changes channel, API workers invalidate their cart cache from it.
+-- Safe to re-run on an existing database.
+
+CREATE OR REPLACE FUNCTION notify_cart_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed shopping_carts.shopping_cart_items%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+
+    -- Identical payloads within one transaction are delivered once
+    PERFORM pg_notify('cart_changes', json_build_object(
+        'user_id', changed.user_id,
+        'shopping_cart_id', changed.shopping_cart_id
+    )::text);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS shopping_cart_notify_change ON shopping_carts.shopping_cart_items;
+
+CREATE TRIGGER shopping_cart_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON shopping_carts.shopping_cart_items
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_cart_change();
@@ -0,0 +1,34 @@
+-- Publish every inventory row change on the inventory_changes channel,
+-- the API keeps its in-memory inventory snapshot up to date from it.
+-- Safe to re-run on an existing database.
+
+CREATE OR REPLACE FUNCTION notify_inventory_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed warehouses.inventory%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+
+    PERFORM pg_notify('inventory_changes', json_build_object(
+        'op', TG_OP,
+        'warehouse_id', changed.warehouse_id,
+        'product_id', changed.product_id,
+        'available_quantity', changed.available_quantity,
+        'warehouse_name', changed.warehouse_name,
+        'warehouse_location', changed.warehouse_location
+    )::text);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS inventory_notify_change ON warehouses.inventory;
+
+CREATE TRIGGER inventory_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON warehouses.inventory
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_inventory_change();